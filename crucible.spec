@@ -71,6 +71,13 @@ for use by an Operating system.
 # Build a source distribution.
 %{buildroot}%{install_dir}/bin/python -m pip install --disable-pip-version-check --no-cache ./dist/*.whl
 
+# Precompile the Jinja templates, the installed image may be read-only.
+%{buildroot}%{install_dir}/bin/python -m crucible.network.render
+
+# Precompile crucible and its dependencies as unchecked-hash bytecode. The installed image may be read-only, where a
+# missing or stale (e.g. by mtime) .pyc would be recompiled on every invocation; unchecked-hash bytecode is used as-is.
+%{buildroot}%{install_dir}/bin/python -m compileall -f -q -j 0 --invalidation-mode unchecked-hash -s %{buildroot} -p / %{buildroot}%{install_dir}/lib
+
 # Remove build tools to decrease the virtualenv size.
 %{buildroot}%{install_dir}/bin/python -m pip uninstall -y pip setuptools wheel
 
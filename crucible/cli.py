@@ -25,32 +25,124 @@
 The crucible.
 """
 
+import importlib.util
 import sys
+import types
 
 import click
 from click_option_group import optgroup
 from click_option_group import MutuallyExclusiveOptionGroup
-from crucible import vms
-
-from crucible.install import install_to_disk
-from crucible.network import config
-from crucible.network import ifname
-from crucible.storage import disk
+from crucible import trace
 from crucible.logger import Logger
+from crucible.logger import LOG_FORMATS
+from crucible.logger import set_format
+from crucible.logger import set_level
+
+
+def _lazy(name: str) -> types.ModuleType:
+    """
+    Returns a module that is only executed once one of its attributes is
+    used, so each sub-command only pays for importing what it runs.
+
+    :param name: The name of the module.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    setattr(sys.modules[parent], child, module)
+    return module
+
+
+config = _lazy('crucible.network.config')
+disk = _lazy('crucible.storage.disk')
+ifname = _lazy('crucible.network.ifname')
+installer = _lazy('crucible.install')
+inventory = _lazy('crucible.network.inventory')
+vms = _lazy('crucible.vms')
 
 CONTEXT_SETTINGS = {'help_option_names': ['-h', '--help']}
 LOG = Logger(__name__)
 
 
-@click.group(context_settings=CONTEXT_SETTINGS)
+class TracedCommand(click.Command):
+    """
+    A command that records a trace span around its invocation.
+    """
+
+    def invoke(self, ctx: click.Context):
+        """
+        Invokes the command inside a span named after its command path
+        (e.g. ``network interface``).
+
+        :param ctx: The command's context.
+        """
+        name = ctx.command_path.partition(' ')[2] or ctx.command_path
+        with trace.span(name, 'cli'):
+            return super().invoke(ctx)
+
+
+class TracedGroup(click.Group):
+    """
+    A group whose commands, and subgroups' commands, are traced.
+    """
+
+    command_class = TracedCommand
+    group_class = type
+
+
+@click.group(cls=TracedGroup, context_settings=CONTEXT_SETTINGS)
 @click.version_option()
-def crucible() -> None:
+@click.option(
+    '--trace',
+    'trace_file',
+    metavar='<file path>',
+    help='Write a Chrome trace of every phase and sub-command of the run to '
+         'a file (open it with chrome://tracing or Perfetto).'
+)
+@click.option(
+    '--log-level',
+    type=click.Choice(
+        ['debug', 'info', 'warning', 'error', 'critical'],
+        case_sensitive=False
+    ),
+    help='Level to log at (default: CRUCIBLE_LOG_LEVEL, or info).'
+)
+@click.option(
+    '--log-format',
+    type=click.Choice(LOG_FORMATS, case_sensitive=False),
+    help='Format of the log (default: CRUCIBLE_LOG_FORMAT, or text). A json '
+         'log only has a summary, unless an error was logged.'
+)
+@click.pass_context
+def crucible(
+        ctx: click.Context,
+        trace_file: str,
+        log_level: str,
+        log_format: str,
+) -> None:
     """
     The crucible, paving the way for new machines.
 
     \f
+    :param ctx: The click context.
+    :param trace_file: Where to write a trace of the run (if anywhere).
+    :param log_level: Level to log at (if set).
+    :param log_format: Format of the log (if set).
     """
+    if log_format:
+        set_format(log_format)
+    if log_level:
+        set_level(log_level)
     LOG.info('Invoked.')
+    if trace_file:
+        trace.enable()
+        ctx.call_on_close(lambda: trace.export(trace_file))
 
 
 @crucible.group()
@@ -72,6 +164,49 @@ def network() -> None:
 @click.option(
     '--skip-rename', is_flag=True, help='Skip renaming interfaces.'
 )
+@click.option(
+    '--plan',
+    'dry_run',
+    is_flag=True,
+    help='Print the renames and udev rule changes as JSON, without applying '
+         'them.'
+)
+@click.option(
+    '--watch',
+    'watch_nics',
+    is_flag=True,
+    help='Keep running, and name NICs as the kernel adds them (e.g. late '
+         'driver binds, SR-IOV VFs, or hot-added cards).'
+)
+@click.option(
+    '--debounce',
+    type=float,
+    default=2.0,
+    metavar='<seconds>',
+    help='With --watch, how long to wait for more NICs to appear before '
+         'naming a burst of new NICs (default: 2).'
+)
+@click.option(
+    '--from-inventory',
+    metavar='<directory path>',
+    type=click.Path(exists=True, file_okay=False),
+    help='Generate udev rules offline for every node inventory (JSON or CSV '
+         'NIC dumps) in a directory, instead of naming this node\'s NICs.'
+)
+@click.option(
+    '--output',
+    metavar='<directory path>',
+    default='udev-rules',
+    help='With --from-inventory, where to write one <node>.rules file per '
+         'node (default: udev-rules).'
+)
+@click.option(
+    '--workers',
+    type=click.IntRange(min=1),
+    metavar='<count>',
+    help='With --from-inventory, number of worker processes (default: one '
+         'per CPU).'
+)
 @click.option(
     '--install-location',
     metavar='<directory path>',
@@ -101,8 +236,16 @@ def udev(**kwargs) -> None:
 
     \f
     """
+    from_inventory = kwargs.pop('from_inventory')
+    output = kwargs.pop('output')
+    workers = kwargs.pop('workers')
     try:
-        ifname.run(**kwargs)
+        if from_inventory:
+            inventory.run(from_inventory, output, workers=workers)
+        else:
+            ifname.run(**kwargs)
+    except KeyboardInterrupt:
+        LOG.info('Stopped watching for NICs.')
     except IOError as error:
         sys.exit(f'Root permission needed: {error}')
     except ifname.UdevError as udev_error:
@@ -215,13 +358,125 @@ def interface(**kwargs) -> None:
     default='',
     help='Comma delimited list of one or more IP addresses for DNS.'
 )
+@click.option(
+    '--set',
+    'settings',
+    metavar='KEY=VALUE',
+    multiple=True,
+    help='Sets another key of the network manager\'s settings, e.g. '
+         'NETCONFIG_DNS_POLICY=auto (can be repeated).'
+)
 def system(**kwargs) -> None:
     # pylint: disable=invalid-name
     """
     Configures global network settings.
     """
     LOG.info('Calling network config with: %s', kwargs)
-    config.system(**kwargs)
+    settings = {}
+    for setting in kwargs.pop('settings'):
+        key, separator, value = setting.partition('=')
+        if not separator:
+            sys.exit(f'Settings must be given as KEY=VALUE: {setting}')
+        settings[key] = value
+    try:
+        config.system(settings=settings, **kwargs)
+    except (NotImplementedError, ValueError) as error:
+        sys.exit(str(error))
+
+
+@network.command()
+@click.option(
+    '-f',
+    '--file',
+    'plan',
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help='A YAML plan of the interfaces, DNS servers, and search domains '
+         'to configure.'
+)
+@click.option(
+    '--defer',
+    is_flag=True,
+    default=False,
+    help='Defers updating the network manager, and only write config files.'
+)
+def apply(**kwargs) -> None:
+    """
+    Configures every interface in a plan at once, then reloads them together.
+    Each interface in the plan takes the options of ``network interface``.
+
+    \b
+    e.g.
+        dns: [10.92.100.225]
+        search: [nmn, hmn]
+        interfaces:
+          - interface: bond0
+            members: [mgmt0, mgmt1]
+            noip: true
+          - interface: bond0.nmn0
+            members: [bond0]
+            vlan_id: 2
+            cidr: 10.252.1.4/17
+            default: true
+    \f
+    """
+    LOG.info('Calling network apply with: %s', kwargs)
+    try:
+        config.apply(kwargs['plan'], defer=kwargs['defer'])
+    except config.NetworkError as error:
+        LOG.error(error.message)
+        sys.exit(error.message)
+
+
+@network.command()
+@click.argument('names', nargs=-1)
+@click.option(
+    '--parent',
+    type=str,
+    default=None,
+    help='Only show interfaces built on this interface, e.g. the VLANs of '
+         'a bond.'
+)
+@click.option(
+    '--vlan-id',
+    type=int,
+    default=None,
+    help='Only show interfaces with this VLAN ID.'
+)
+@click.option(
+    '--ip',
+    type=str,
+    default=None,
+    help='Only show interfaces with this IP address.'
+)
+@click.option(
+    '--json',
+    'as_json',
+    is_flag=True,
+    default=False,
+    help='Prints JSON instead of a table.'
+)
+@click.option(
+    '--directory',
+    type=click.Path(file_okay=False),
+    default=None,
+    help='The directory of the ifcfg and ifroute files '
+         '(default: /etc/sysconfig/network).'
+)
+def show(**kwargs) -> None:
+    """
+    Shows the interfaces configured by the ifcfg and ifroute files.
+
+    \b
+    NAMES of the interfaces to show (default: all).
+    \f
+    """
+    LOG.info('Calling network show with: %s', kwargs)
+    try:
+        config.show(**kwargs)
+    except config.NetworkError as error:
+        LOG.error(error.message)
+        sys.exit(error.message)
 
 
 @crucible.group()
@@ -334,7 +589,7 @@ def install(**kwargs) -> None:
     \f
     """
     LOG.info('Calling install with: %s', kwargs)
-    install_to_disk(**kwargs)
+    installer.install_to_disk(**kwargs)
 
 
 @crucible.group()
@@ -28,6 +28,7 @@ import os
 import sys
 
 import click
+from crucible.os import CapturePolicy
 from crucible.os import run_command
 from crucible.logger import Logger
 
@@ -71,14 +72,13 @@ def install_to_disk(
             '-l', raid_level,
             '-s', ssh_key_path,
         ],
+        capture=CapturePolicy(),
     )
     if result.return_code != 0:
         LOG.critical('Install failed!')
         click.echo('Install to disk failed. Check logfile.')
-
-        # FIXME: Not very clean printing this to crucible.log..
-        LOG.critical(result.stdout)
-        LOG.critical(result.stderr)
+        LOG.critical('Install output (head and tail):\n%s', result.stdout)
+        LOG.critical('Install errors (head and tail):\n%s', result.stderr)
     else:
         LOG.info('Install succeeded!')
         click.echo('Install to disk succeeded.')
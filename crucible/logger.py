@@ -23,10 +23,405 @@
 #
 """
 Logging module.
+
+Every ``Logger`` hands its records to one shared queue; a single listener
+thread formats them and writes them to one rotating log file, so logging
+does not block on file I/O. The listener is started by the first record a
+process logs, so importing crucible does not start a thread; a forked child
+starts its own listener, and worker processes should call ``init_worker``
+(e.g. as the ``initializer`` of a process pool) so that their last records
+are written when they exit.
+
+The log is written to ``/var/log/crucible/crucible.log`` (or the
+``CRUCIBLE_LOG_DIRECTORY`` environment variable), falling back to the
+working directory when that is not writable. The level is ``INFO`` unless
+set by the ``CRUCIBLE_LOG_LEVEL`` environment variable or ``set_level``
+(e.g. ``crucible --log-level debug``).
+
+With ``CRUCIBLE_LOG_FORMAT=json`` (or ``crucible --log-format json``) the log
+is written as JSON lines to ``crucible.json.log`` instead, and records are
+held in a bounded ring rather than written. The ring is written when an
+``ERROR`` or ``CRITICAL`` record arrives, so failures keep the records
+leading up to them; a healthy run only writes a summary when it exits.
+Context given with ``extra`` (see ``CONTEXT_FIELDS``) is kept on each JSON
+record, e.g.:
+
+.. code-block:: python
+
+    LOG.error('NIC [%s] does not exist!', name, extra={'nic': name})
 """
+import atexit
+import collections
+import json
 import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
 from logging.handlers import RotatingFileHandler
 
+LOG_DIRECTORY = '/var/log/crucible'
+LOG_FILE = 'crucible.log'
+JSON_LOG_FILE = 'crucible.json.log'
+MAX_BYTES = 10 * 1024 * 1024
+MAX_AGE = 7 * 24 * 60 * 60
+BACKUP_COUNT = 5
+LOG_FORMATS = ('text', 'json')
+RING_SIZE = 1000
+CONTEXT_FIELDS = (
+    'command',
+    'duration',
+    'return_code',
+    'nic',
+    'interface',
+    'counts',
+)
+
+_LOGGERS = []
+_PIPELINE = {}
+_LOCK = threading.Lock()
+
+
+class _RotatingHandler(RotatingFileHandler):
+    """
+    A ``RotatingFileHandler`` that also rotates once the log is older than
+    ``max_age`` seconds.
+    """
+
+    def __init__(self, filename: str, max_age: float, **kwargs) -> None:
+        """
+        :param filename: The log file.
+        :param max_age: Seconds after which the log is rotated.
+        :param kwargs: Arguments for ``RotatingFileHandler``.
+        """
+        super().__init__(filename, **kwargs)
+        self.max_age = max_age
+        try:
+            started = os.stat(filename).st_mtime
+        except OSError:
+            started = time.time()
+        self.rollover_at = started + max_age
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        """
+        Whether the log is too big or too old.
+
+        :param record: The record about to be written.
+        """
+        if time.time() >= self.rollover_at:
+            return 1
+        return super().shouldRollover(record)
+
+    def doRollover(self) -> None:
+        """
+        Rotates the log, and starts its age over.
+        """
+        super().doRollover()
+        self.rollover_at = time.time() + self.max_age
+
+
+class _JSONFormatter(logging.Formatter):
+    """
+    Formats records as JSON objects.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Returns the record as a JSON object, with any of its
+        ``CONTEXT_FIELDS``.
+
+        :param record: The record to format.
+        """
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S%z'),
+            'level': record.levelname,
+            'name': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _RingHandler(logging.Handler):
+    """
+    Holds the last ``capacity`` records, and hands them to ``target`` when
+    an ``ERROR`` or ``CRITICAL`` record arrives. A summary of every record
+    is handed to ``target`` on close.
+    """
+
+    def __init__(self, target: logging.Handler, capacity: int) -> None:
+        """
+        :param target: The handler to write records with.
+        :param capacity: How many records to hold.
+        """
+        super().__init__()
+        self.target = target
+        self.ring = collections.deque(maxlen=capacity)
+        self.counts = collections.Counter()
+        self.started = time.time()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Holds the record, writing the ring if it is an error.
+
+        :param record: The record to hold.
+        """
+        self.counts[record.levelname] += 1
+        self.ring.append(record)
+        if record.levelno >= logging.ERROR:
+            self.dump()
+
+    def dump(self) -> None:
+        """
+        Writes and empties the ring.
+        """
+        while self.ring:
+            self.target.handle(self.ring.popleft())
+        self.target.flush()
+
+    def summary(self) -> logging.LogRecord:
+        """
+        Returns a record with the number of records at each level, and how
+        long the handler was open.
+        """
+        return logging.makeLogRecord({
+            'name': __name__,
+            'levelno': logging.INFO,
+            'levelname': 'INFO',
+            'msg': 'Summary',
+            'counts': dict(self.counts),
+            'duration': round(time.time() - self.started, 6),
+        })
+
+    def close(self) -> None:
+        """
+        Writes the summary, and closes ``target``.
+        """
+        if self.target is not None:
+            self.ring.clear()
+            self.target.handle(self.summary())
+            self.target.close()
+            self.target = None
+        super().close()
+
+
+class _QueueHandler(QueueHandler):
+    """
+    A ``QueueHandler`` that leaves formatting to the listener thread.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Enqueues the record, starting the listener if this process has not
+        logged anything yet.
+
+        :param record: The record to enqueue.
+        """
+        _start()
+        super().enqueue(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Enqueues the record as-is, its message is formatted when it is
+        written.
+
+        :param record: The record to enqueue.
+        """
+        return record
+
+
+def _log_file(name: str = LOG_FILE) -> str:
+    """
+    Returns the path of a log file, creating its directory if needed.
+
+    :param name: The name of the log file.
+    """
+    directory = os.environ.get('CRUCIBLE_LOG_DIRECTORY', LOG_DIRECTORY)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        return name
+    if not os.access(directory, os.W_OK):
+        return name
+    return os.path.join(directory, name)
+
+
+def _level(level: [int, str]) -> int:
+    """
+    Returns a level number for a level name or number.
+
+    :param level: A level, e.g. ``debug`` or ``logging.DEBUG``.
+    :raises ValueError: When the level is unknown.
+    """
+    if isinstance(level, int):
+        return level
+    number = logging.getLevelName(level.upper())
+    if not isinstance(number, int):
+        raise ValueError(f'Unknown log level [{level}]')
+    return number
+
+
+def _sink(log_format: str) -> logging.Handler:
+    """
+    Returns the handler the listener writes records with.
+
+    :param log_format: One of ``LOG_FORMATS``.
+    :raises ValueError: When the format is unknown.
+    """
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f'Unknown log format [{log_format}]')
+    log_file = _RotatingHandler(
+        _log_file(JSON_LOG_FILE if log_format == 'json' else LOG_FILE),
+        MAX_AGE,
+        maxBytes=MAX_BYTES,
+        backupCount=BACKUP_COUNT,
+        delay=True,
+    )
+    if log_format == 'json':
+        log_file.setFormatter(_JSONFormatter())
+        return _RingHandler(log_file, RING_SIZE)
+    formatter = logging.Formatter(
+        '%(asctime)s %(levelname)-8s | %(name)-50s | %(message)s'
+    )
+    formatter.datefmt = '%b %d %H:%M:%S'
+    log_file.setFormatter(formatter)
+    return log_file
+
+
+def _start() -> None:
+    """
+    Starts the listener that writes the log file, if it is not running in
+    this process.
+    """
+    if 'listener' in _PIPELINE:
+        return
+    with _LOCK:
+        if 'listener' in _PIPELINE:
+            return
+        sink = _sink(_PIPELINE['format'])
+        listener = QueueListener(_PIPELINE['handler'].queue, sink)
+        listener.start()
+        if 'pid' not in _PIPELINE:
+            atexit.register(_shutdown)
+        _PIPELINE.update(listener=listener, sink=sink, pid=os.getpid())
+
+
+def _shutdown() -> None:
+    """
+    Writes every queued record, and closes the log. Does nothing if this
+    process never logged, e.g. a forked child that inherited the parent's
+    ``atexit`` handlers.
+    """
+    with _LOCK:
+        listener = _PIPELINE.pop('listener', None)
+        sink = _PIPELINE.pop('sink', None)
+    if listener is None or _PIPELINE.get('pid') != os.getpid():
+        return
+    listener.stop()
+    sink.close()
+
+
+def _after_fork() -> None:
+    """
+    Forgets the parent's listener in a forked child. Its thread does not
+    exist in the child, and the records in the parent's queue are the
+    parent's to write, so the child gets an empty queue and starts its own
+    listener when it logs.
+    """
+    global _LOCK  # pylint: disable=global-statement
+    _LOCK = threading.Lock()
+    _PIPELINE.pop('listener', None)
+    _PIPELINE.pop('sink', None)
+    if 'handler' in _PIPELINE:
+        _PIPELINE['handler'].queue = queue.SimpleQueue()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _handler() -> QueueHandler:
+    """
+    Returns the shared queue handler. The listener is started by the first
+    record, see ``_start``.
+    """
+    if 'handler' not in _PIPELINE:
+        _PIPELINE.update(
+            handler=_QueueHandler(queue.SimpleQueue()),
+            format=os.environ.get('CRUCIBLE_LOG_FORMAT', 'text').lower(),
+            level=_level(os.environ.get('CRUCIBLE_LOG_LEVEL', 'INFO')),
+        )
+    return _PIPELINE['handler']
+
+
+def init_worker() -> None:
+    """
+    Sets up logging in a worker process, e.g. as the ``initializer`` of a
+    ``ProcessPoolExecutor``. Workers exit without running ``atexit``
+    handlers, so the worker's listener is stopped (writing its queued
+    records) by a ``multiprocessing`` finalizer instead.
+    """
+    # pylint: disable=import-outside-toplevel
+    from multiprocessing import util
+    _handler()
+    util.Finalize(None, _shutdown, exitpriority=10)
+
+
+def set_format(log_format: str) -> None:
+    """
+    Sets the format of the log.
+
+    :param log_format: One of ``LOG_FORMATS``.
+    :raises ValueError: When the format is unknown.
+    """
+    _handler()
+    log_format = log_format.lower()
+    if log_format == _PIPELINE['format']:
+        return
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f'Unknown log format [{log_format}]')
+    with _LOCK:
+        _PIPELINE['format'] = log_format
+        listener = _PIPELINE.get('listener')
+        if listener is None:
+            return
+        sink = _sink(log_format)
+        listener.stop()
+        _PIPELINE['sink'].close()
+        listener.handlers = (sink,)
+        listener.start()
+        _PIPELINE['sink'] = sink
+
+
+def set_level(level: [int, str]) -> None:
+    """
+    Sets the level of every ``Logger``.
+
+    :param level: A level, e.g. ``debug`` or ``logging.DEBUG``.
+    :raises ValueError: When the level is unknown.
+    """
+    _handler()
+    _PIPELINE['level'] = _level(level)
+    for logger in _LOGGERS:
+        logger.setLevel(_PIPELINE['level'])
+        # These loggers are not registered with the logging manager, so
+        # setLevel does not reset their isEnabledFor cache.
+        logger._cache.clear()  # pylint: disable=protected-access
+
+
+def flush() -> None:
+    """
+    Waits until every queued record has been written.
+    """
+    if 'listener' in _PIPELINE:
+        _PIPELINE['listener'].stop()
+        _PIPELINE['listener'].start()
+
 
 class Logger(logging.Logger):
     """
@@ -37,19 +432,17 @@ class Logger(logging.Logger):
     def __init__(
             self,
             module_name: str,
-            log_level: int = logging.INFO
+            log_level: int = None
     ) -> None:
         """
         :param module_name: Pass __name__ here or whatever name you want to
                             define the Logger as.
-        :param log_level: Level of logging (default: INFO).
+        :param log_level: Level of logging (default: the level set by
+                          ``CRUCIBLE_LOG_LEVEL`` or ``set_level``, or INFO).
         """
+        handler = _handler()
+        if log_level is None:
+            log_level = _PIPELINE['level']
         super().__init__(module_name, log_level)
-        formatter = logging.Formatter(
-            '%(asctime)s %(levelname)-8s | %(name)-50s | %(message)s'
-        )
-        formatter.datefmt = '%b %d %H:%M:%S'
-        # TODO: Write to a system path other than the working directory.
-        handler = RotatingFileHandler('crucible.log')
-        handler.setFormatter(formatter)
         self.addHandler(handler)
+        _LOGGERS.append(self)
@@ -0,0 +1,255 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Compiled NIC classification index.
+
+``ifname.yml`` is compiled into a hash table keyed by PCI IDs, so that
+classifying a NIC costs a few dictionary lookups regardless of how many IDs
+the database holds. The compiled table is persisted to a binary cache file
+in ``crucible.os.RUN_DIRECTORY``, which is used for as long as the YAML is
+unchanged.
+
+Each category in ``ifname.yml`` (e.g. ``hsn_ids``) is a list of rules. A
+rule must have a ``vendor_id``, and may narrow it with a ``device_id``
+(omitted or ``'*'`` matches any device of the vendor) and with a
+``subsystem_vendor_id`` and ``subsystem_device_id``. When several rules
+match a NIC, the rule with the highest ``priority`` (default: ``0``) wins,
+followed by the most specific rule.
+
+Rules in ``VENDOR_CATEGORIES`` (``mgmt_ids``) only ever match on their
+vendor, as they always have; their ``device_id`` and subsystem IDs are
+ignored.
+"""
+import hashlib
+import marshal
+import os
+
+import yaml
+
+from crucible.logger import Logger
+from crucible.os import cache_file_path
+from crucible.os import read_cache_file
+from crucible.os import write_cache_file
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+LOG = Logger(__name__)
+
+CACHE_VERSION = 2
+VENDOR_CATEGORIES = ('mgmt_ids',)
+DEFAULT_YAML_PATH = '/etc/crucible/ifname'
+WILDCARD = '*'
+
+_indexes = {}
+
+
+class ClassifyError(Exception):
+
+    """
+    An exception for NIC classification database problems.
+    """
+
+    def __init__(self, message) -> None:
+        self.message = message
+        super().__init__(self.message)
+
+
+def _normalize(pci_id: str) -> str:
+    """
+    Normalizes a PCI ID for use as a key.
+
+    :param pci_id: A vendor, device, or subsystem ID.
+    """
+    return str(pci_id or '').strip().lower()
+
+
+class ClassifyIndex:
+    """
+    A hash table of PCI IDs to NIC classifications.
+
+    Keys are ``(vendor,)`` for vendor wildcards, ``(vendor, device)``, and
+    ``(vendor, device, subsystem vendor, subsystem device)``. Values are
+    ``(priority, classification)``.
+    """
+
+    def __init__(self, rules: dict) -> None:
+        """
+        :param rules: The compiled rules.
+        """
+        self.rules = rules
+
+    @classmethod
+    def compile(cls, meta: dict) -> 'ClassifyIndex':
+        """
+        Compiles the contents of ``ifname.yml``.
+
+        :param meta: The loaded YAML.
+        :raises ClassifyError: When a rule is missing its vendor ID.
+        """
+        rules = {}
+        for category, entries in (meta or {}).items():
+            classification = category.removesuffix('_ids')
+            for entry in entries or []:
+                vendor_id = _normalize(entry.get('vendor_id'))
+                if not vendor_id:
+                    raise ClassifyError(
+                        f'A rule in {category} is missing a vendor_id: '
+                        f'{entry}'
+                    )
+                device_id = _normalize(entry.get('device_id', WILDCARD))
+                subsystem = (
+                    _normalize(entry.get('subsystem_vendor_id')),
+                    _normalize(entry.get('subsystem_device_id')),
+                )
+                if category in VENDOR_CATEGORIES \
+                        or device_id in ('', WILDCARD):
+                    key = (vendor_id,)
+                elif any(subsystem):
+                    key = (vendor_id, device_id) + subsystem
+                else:
+                    key = (vendor_id, device_id)
+                priority = int(entry.get('priority', 0))
+                if key in rules and rules[key][0] >= priority:
+                    LOG.warning(
+                        'Ignoring %s rule %s, already classified as %s.',
+                        category,
+                        entry,
+                        rules[key][1],
+                    )
+                    continue
+                rules[key] = (priority, classification)
+        return cls(rules)
+
+    def classify(
+            self,
+            vendor_id: str,
+            device_id: str,
+            subsystem_vendor_id: str = '',
+            subsystem_device_id: str = '',
+    ) -> str:
+        """
+        Returns the classification of a NIC, or an empty string if no rule
+        matches it.
+
+        :param vendor_id: The PCI vendor ID.
+        :param device_id: The PCI device ID.
+        :param subsystem_vendor_id: The PCI subsystem vendor ID.
+        :param subsystem_device_id: The PCI subsystem device ID.
+        """
+        vendor_id = _normalize(vendor_id)
+        device_id = _normalize(device_id)
+        keys = (
+            (vendor_id, device_id, _normalize(subsystem_vendor_id),
+             _normalize(subsystem_device_id)),
+            (vendor_id, device_id),
+            (vendor_id,),
+        )
+        classification = ''
+        best_priority = None
+        for key in keys:
+            priority, match = self.rules.get(key, (None, ''))
+            if match and (best_priority is None or priority > best_priority):
+                classification = match
+                best_priority = priority
+        return classification
+
+
+def database_path() -> str:
+    """
+    Returns the path of the NIC database in use; ``/etc/crucible/ifname.yml``
+    (or ``.yaml``) if it exists, otherwise the copy shipped with crucible.
+    """
+    for extension in ('yml', 'yaml'):
+        path = f'{DEFAULT_YAML_PATH}.{extension}'
+        if os.path.exists(path):
+            return path
+    return os.path.join(os.path.dirname(__file__), 'ifname.yml')
+
+
+def _read_cache(cache_path: str) -> tuple:
+    """
+    Reads a cache file, returning ``None`` if it is missing, unreadable, or
+    of another version.
+
+    :param cache_path: Path of the cache file.
+    """
+    content = read_cache_file(cache_path)
+    if content is None:
+        return None
+    try:
+        cache = marshal.loads(content)
+    except (EOFError, ValueError, TypeError) as error:
+        LOG.info('Could not read NIC database cache %s: %s', cache_path, error)
+        return None
+    if not isinstance(cache, tuple) or len(cache) != 5 \
+            or cache[0] != CACHE_VERSION:
+        LOG.info('Ignoring NIC database cache %s of another version.',
+                 cache_path)
+        return None
+    return cache
+
+
+def load_index(path: str = None) -> ClassifyIndex:
+    """
+    Returns the compiled classification index for a NIC database.
+
+    The index is loaded from the database's cache file in
+    ``crucible.os.RUN_DIRECTORY`` when the cache was built from the same
+    file; the cache is trusted outright when the database's modification
+    time and size are unchanged, otherwise its content hash is compared
+    before parsing the YAML again.
+
+    :param path: Path to the NIC database (default: ``database_path()``).
+    """
+    if path is None:
+        path = database_path()
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if _indexes.get(path, (None,))[0] == signature:
+        return _indexes[path][1]
+    cache_path = cache_file_path('ifname', path, '.cache')
+    cache = _read_cache(cache_path)
+    if cache is not None and cache[1:3] == signature:
+        index = ClassifyIndex(cache[4])
+    else:
+        with open(path, 'rb') as database:
+            content = database.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if cache is not None and cache[3] == digest:
+            index = ClassifyIndex(cache[4])
+        else:
+            LOG.info('Compiling NIC database file: %s', path)
+            index = ClassifyIndex.compile(
+                yaml.load(content, Loader=SafeLoader)
+            )
+        write_cache_file(
+            cache_path,
+            marshal.dumps((CACHE_VERSION, *signature, digest, index.rules)),
+        )
+    LOG.info('Using NIC database file: %s', path)
+    _indexes[path] = (signature, index)
+    return index
@@ -24,19 +24,37 @@
 """
 Handles network interface configuration files.
 """
+import json
 import re
 import sys
 
 import click
+import yaml
 
+from crucible import trace
 from crucible.logger import Logger
 from crucible.network import manager
 from crucible.network import sysconfig
 from crucible.network import networkmanager
+from crucible.os import PROBE_CACHE_TTL
 from crucible.os import run_command
 
 LOG = Logger(__name__)
 
+# The options of ``crucible network interface`` that a plan's interfaces take.
+PLAN_INTERFACE_KEYS = (
+    'interface',
+    'cidr',
+    'dhcp',
+    'noip',
+    'gateway',
+    'vlan_id',
+    'mtu',
+    'members',
+    'default',
+    'dns',
+)
+
 
 class NetworkError(Exception):
 
@@ -56,7 +74,11 @@ def interface(**kwargs) -> None:
     """
     name = kwargs.get('interface', None)
     if name:
-        LOG.info('Working on interface [%s] ... ', name)
+        LOG.info(
+            'Working on interface [%s] ... ',
+            name,
+            extra={'interface': name},
+        )
 
     reload = True
 
@@ -70,49 +92,259 @@ def interface(**kwargs) -> None:
             click.echo(
                 'Interface is a bond or bridge but no members were given.'
                 )
-            LOG.critical('No members were given for bond/bridge.')
+            LOG.critical(
+                'No members were given for bond/bridge.',
+                extra={'interface': name},
+            )
             sys.exit(1)
     if kwargs.get('defer', False):
         click.echo('Deferring reloading of network handlers.')
         reload = False
     elif kwargs.get('remove'):
         click.echo(f'Removing interface: {name} ... ')
-        network_manager.remove_config()
+        with trace.span('remove_config', interface=name):
+            network_manager.remove_config()
         click.echo('Done.')
         sys.exit(0)
     else:
-        network_manager.write_config()
+        with trace.span('write_config', interface=name):
+            status = network_manager.write_config()
+        click.echo(f'{name}: {status}')
+        if status == manager.UNCHANGED:
+            click.echo('Configuration is unchanged, not reloading.')
+            reload = False
     if reload:
         click.echo('Loading interface configuration ...')
-        network_manager.reload_interface()
+        with trace.span('reload_interface', interface=name):
+            network_manager.reload_interface()
         click.echo('Done.')
 
 
-def system(**kwargs) -> None:
+def system(settings: dict = None, **kwargs) -> None:
     """
     Configures the system with the given network options.
+    :param settings: Other settings of the network manager, e.g.
+                     ``{'NETCONFIG_DNS_POLICY': 'auto'}``.
     :param kwargs: NetworkManager parameters.
     """
     network_manager = resolve_network_manager(**kwargs)
 
     LOG.info('Detected network manager: %s', network_manager.name)
 
-    if network_manager.dns:
+    _update_system(network_manager, settings or {})
+
+
+def _update_system(
+        network_manager: manager.SystemNetwork,
+        settings: dict,
+) -> None:
+    """
+    Updates the system's DNS servers, search domains, and other settings at
+    once.
+    :param network_manager: The network manager, with the DNS servers and
+                            search domains to set (if any).
+    :param settings: Other settings of the network manager.
+    """
+    if not any(network_manager.dns) and not any(network_manager.search) \
+            and not settings:
+        return
+    if any(network_manager.dns):
         click.echo(f'Writing DNS {network_manager.dns}')
-        network_manager.update_dns()
-    if network_manager.search:
+    if any(network_manager.search):
         click.echo(f'Writing Search domains {network_manager.search}')
-        network_manager.update_search()
+    for key, value in settings.items():
+        click.echo(f'Writing {key}={value}')
+    with trace.span('update_system'):
+        changed = network_manager.update_system(**settings)
+    if not changed:
+        click.echo('System network settings are unchanged.')
 
 
-def resolve_network_manager(**kwargs) -> [manager.SystemNetwork]:
+def read_plan(path: str) -> dict:
     """
-    Resolves the running network manager.
+    Reads a plan, a YAML (or JSON) file with the interfaces to configure and
+    the system's DNS servers, search domains, and other settings.
+
+    .. code-block:: yaml
+
+        dns: [10.92.100.225]
+        search: [nmn, hmn]
+        settings:
+          NETCONFIG_DNS_POLICY: auto
+        interfaces:
+          - interface: bond0
+            members: [mgmt0, mgmt1]
+            noip: true
+          - interface: bond0.nmn0
+            members: [bond0]
+            vlan_id: 2
+            cidr: 10.252.1.4/17
+            default: true
+
+    Each interface takes the options of ``crucible network interface`` (see
+    ``PLAN_INTERFACE_KEYS``), ``members`` as a list or a comma delimited
+    string.
+
+    :param path: Path to the plan.
+    :raises NetworkError: When the plan can not be read or is invalid.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as plan_file:
+            plan = yaml.safe_load(plan_file)
+    except (OSError, yaml.YAMLError) as error:
+        raise NetworkError(f'Could not read plan {path}: {error}') from error
+    if not isinstance(plan, dict) \
+            or not isinstance(plan.get('interfaces', []), list) \
+            or not isinstance(plan.get('settings', {}), dict):
+        raise NetworkError(
+            f'Plan {path} must be a mapping with a list of interfaces (and a '
+            f'mapping of settings).'
+        )
+    for options in plan.get('interfaces', []):
+        if not isinstance(options, dict) or not options.get('interface'):
+            raise NetworkError(f'Interface without a name in {path}.')
+        unknown = sorted(set(options) - set(PLAN_INTERFACE_KEYS))
+        if unknown:
+            raise NetworkError(
+                f'Interface {options["interface"]} has unknown options '
+                f'{", ".join(map(str, unknown))}, use any of: '
+                f'{", ".join(PLAN_INTERFACE_KEYS)}.'
+            )
+        if 'members' in options \
+                and not isinstance(options['members'], (list, str)):
+            raise NetworkError(
+                f'Interface {options["interface"]} needs its members as a '
+                f'list or a comma delimited string.'
+            )
+        if not options.get('cidr') and not options.get('dhcp') \
+                and not options.get('noip'):
+            raise NetworkError(
+                f'Interface {options["interface"]} needs a cidr, dhcp, or '
+                f'noip.'
+            )
+        if isinstance(options.get('members'), list):
+            options['members'] = ','.join(options['members'])
+    return plan
+
+
+def apply(path: str, defer: bool = False) -> None:
+    """
+    Configures every interface of a plan (see ``read_plan``), then reloads
+    them all at once and updates the system's DNS servers and search
+    domains.
+
+    :param path: Path to the plan.
+    :param defer: Only write the configuration, without reloading.
+    :raises NetworkError: When the plan is invalid.
     """
-    result = run_command(['systemctl', 'show', '-p', 'FragmentPath', 'network'])
+    plan = read_plan(path)
+    network_manager_type = resolve_network_manager_type()
+    LOG.info('Detected network manager: %s', network_manager_type.name)
+    network_managers = []
+    for options in plan.get('interfaces', []):
+        options.setdefault('dns', plan.get('dns'))
+        network_manager = network_manager_type(**options)
+        if (network_manager.interface.is_bond()
+                or network_manager.interface.is_bridge()) \
+                and not any(network_manager.interface.members):
+            raise NetworkError(
+                f'Interface {options["interface"]} is a bond or bridge but '
+                f'no members were given.'
+            )
+        network_managers.append(network_manager)
+    try:
+        manager.dependency_order([
+            network_manager.interface for network_manager in network_managers
+        ])
+    except manager.InterfaceError as error:
+        raise NetworkError(error.message) from error
+    system_manager = network_manager_type(
+        dns=plan.get('dns'),
+        search=plan.get('search'),
+    )
+    reloader = manager.Reloader(system_manager)
+    for network_manager in network_managers:
+        name = network_manager.interface.name
+        with trace.span('write_config', interface=name):
+            status = network_manager.write_config(overwrite=True)
+        click.echo(f'{name}: {status}')
+        if status != manager.UNCHANGED:
+            reloader.add(network_manager.interface)
+    if reloader.interfaces and not defer:
+        click.echo('Loading interface configuration ...')
+        with trace.span('reload_interfaces'):
+            reloader.reload()
+    try:
+        _update_system(system_manager, plan.get('settings', {}))
+    except NotImplementedError as error:
+        LOG.info('Not updating the system: %s', error)
+    click.echo('Done.')
+
+
+def show(
+        as_json: bool = False,
+        directory: str = None,
+        **filters,
+) -> None:
+    """
+    Prints the interfaces configured by the ``ifcfg-*`` and ``ifroute-*``
+    files, as a table or as JSON.
+
+    :param as_json: Print JSON instead of a table.
+    :param directory: The directory of the files
+                      (default: ``Sysconfig.install_location``).
+    :param filters: Only show the interfaces matching ``names``, ``parent``,
+                    ``vlan_id``, and ``ip`` (see ``InterfaceIndex.find``).
+    :raises NetworkError: When the directory can not be read.
+    """
+    directory = directory or sysconfig.Sysconfig.install_location
+    try:
+        index = sysconfig.read_interfaces(directory)
+    except OSError as error:
+        raise NetworkError(
+            f'Could not read interfaces in {directory}: {error}'
+        ) from error
+    interfaces = [
+        sysconfig.describe(found) for found in index.find(**filters)
+    ]
+    if as_json:
+        click.echo(json.dumps(interfaces, indent=2))
+        return
+    row = '{:<16} {:<9} {:<7} {:<20} {:>4} {:>5}  {}'
+    click.echo(row.format(
+        'NAME', 'KIND', 'PROTO', 'IP', 'VLAN', 'MTU', 'MEMBERS',
+    ))
+    for described in interfaces:
+        click.echo(row.format(
+            described['name'],
+            described['kind'],
+            described['bootproto'],
+            described['ip'] or '-',
+            described['vlan_id'] or '-',
+            described['mtu'] or '-',
+            ','.join(described['members']) or '-',
+        ))
+
+
+@trace.traced
+def resolve_network_manager_type() -> type:
+    """
+    Resolves the type of the running network manager.
+    """
+    result = run_command(
+        ['systemctl', 'show', '-p', 'FragmentPath', 'network'],
+        cache_ttl=PROBE_CACHE_TTL,
+    )
     result.decode('utf-8')
     if re.search(r'NetworkManager', result.stdout):
-        return networkmanager.NetworkManager(**kwargs)
+        return networkmanager.NetworkManager
     if re.search(r'wicked', result.stdout):
-        return sysconfig.Wicked(**kwargs)
+        return sysconfig.Wicked
     raise NetworkError('Unknown network manager')
+
+
+def resolve_network_manager(**kwargs) -> [manager.SystemNetwork]:
+    """
+    Resolves the running network manager.
+    """
+    return resolve_network_manager_type()(**kwargs)
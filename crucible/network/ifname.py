@@ -24,6 +24,7 @@
 """
 Interface naming module.
 """
+import json
 import os
 import re
 import sys
@@ -31,16 +32,23 @@ from glob import glob
 
 import itertools
 import click
-from jinja2 import Environment
-from jinja2 import FileSystemLoader
-from yaml import safe_load
 
+from crucible import trace
 from crucible.logger import Logger
+from crucible.network import classify
+from crucible.network import netlink
+from crucible.network import render
+from crucible.network import udev
+from crucible.os import atomic_write
+from crucible.os import invalidate_cache
 from crucible.os import run_command
+from crucible.os import run_commands
 from crucible.os import supported_platforms
 
 LOG = Logger(__name__)
 
+PCI_NICS = 'bus/pci/drivers/*/0000:*/net/*'
+
 
 class UdevError(Exception):
 
@@ -63,45 +71,61 @@ class PrefixIndexes:
     prefix_hsn = 'hsn'
     prefix_sun = 'sun'
 
-    def __init__(self) -> None:
+    def __init__(self, reserved: set[str] = None) -> None:
         """
         Sets the indexes to 0.
+
+        :param reserved: Names that are already taken, these are skipped.
         """
+        self._reserved = set(reserved or ())
         self._lan_idx = itertools.count()
         self._mgmt_idx = itertools.count()
         self._hsn_idx = itertools.count()
         self._sun_idx = itertools.count()
 
+    def _next(self, prefix: str, index: itertools.count) -> str:
+        """
+        Returns the next name for a prefix that is not reserved.
+
+        :param prefix: The name prefix.
+        :param index: The prefix's counter.
+        """
+        name = f'{prefix}{next(index)}'
+        while name in self._reserved:
+            name = f'{prefix}{next(index)}'
+        return name
+
     @property
     def lan(self) -> str:
         """
         Prints an index number for the local area network interface(s).
         """
-        return f'{self.prefix_lan}{next(self._lan_idx)}'
+        return self._next(self.prefix_lan, self._lan_idx)
 
     @property
     def mgmt(self) -> str:
         """
         Prints an index number for the management network interface(s).
         """
-        return f'{self.prefix_mgmt}{next(self._mgmt_idx)}'
+        return self._next(self.prefix_mgmt, self._mgmt_idx)
 
     @property
     def hsn(self) -> str:
         """
         Prints an index number for the high-speed network interface(s).
         """
-        return f'{self.prefix_hsn}{next(self._hsn_idx)}'
+        return self._next(self.prefix_hsn, self._hsn_idx)
 
     @property
     def sun(self) -> str:
         """
         Prints an index number for the storage utility network interface(s).
         """
-        return f'{self.prefix_sun}{next(self._sun_idx)}'
+        return self._next(self.prefix_sun, self._sun_idx)
 
 
 class NIC:
+    # pylint: disable=too-many-instance-attributes
     """
     Abstraction for a network interface.
     """
@@ -110,6 +134,10 @@ class NIC:
     _mac = ''
     device_id = ''
     vendor_id = ''
+    subsystem_device_id = ''
+    subsystem_vendor_id = ''
+    index = 0
+    operstate = ''
 
     def __init__(
             self,
@@ -155,10 +183,12 @@ class NIC:
     @name.setter
     def name(self, new_name: str) -> None:
         """
-        Setter for the name property.
+        Setter for the name property, ``old_name`` keeps the name the NIC
+        had before it was first renamed.
         :param new_name:
         """
-        self.old_name = self._name
+        if not self.old_name:
+            self.old_name = self._name
         self._name = new_name
 
     @property
@@ -175,32 +205,110 @@ class NIC:
         return f'{self._name}:{self._mac.upper()}'
 
 
+def _ethtool_macs(nics: list[str]) -> dict[str, str]:
+    """
+    Returns the permanent MAC addresses of NICs by asking ``ethtool``, the
+    NICs are queried concurrently.
+
+    :param nics: Names of the NICs.
+    """
+    if not nics:
+        return {}
+    results = run_commands(
+        [['ethtool', '-P', nic] for nic in nics],
+        silence=True,
+    )
+    macs = {}
+    for nic, mac_cmd in zip(nics, results):
+        mac_cmd.decode('utf-8')
+        macs[nic] = mac_cmd.stdout.rsplit(' ', maxsplit=1)[-1]
+    return macs
+
+
+def _pci_ids(nic_file: str) -> (str, str, str, str):
+    """
+    Returns the PCI vendor, device, subsystem vendor, and subsystem device IDs
+    of a NIC from its device's ``uevent`` file.
+
+    :param nic_file: The sysfs path of the NIC under its PCI device.
+    """
+    pci_id = ''
+    subsys_id = ':'
+    nic_kernel_files = os.path.dirname(os.path.dirname(nic_file))
+    nic_uevent_file = os.path.join(nic_kernel_files, 'uevent')
+    with open(nic_uevent_file, 'r', encoding='utf-8') as uevent:
+        for line in uevent:
+            if re.search(r'^PCI_ID=', line):
+                LOG.info('Found PCI_ID in line: %s', line)
+                pci_id = line.split('=')[-1]
+            elif re.search(r'^PCI_SUBSYS_ID=', line):
+                subsys_id = line.split('=')[-1]
+    vendor_id, device_id = pci_id.split(':')
+    subsystem_vendor_id, subsystem_device_id = subsys_id.split(':')
+    return vendor_id, device_id, subsystem_vendor_id, subsystem_device_id
+
+
+def _permanent_macs(
+        nics: list[str],
+        links: dict[str, netlink.Link],
+) -> dict[str, str]:
+    """
+    Returns the permanent MAC address of each NIC, from its netlink link or
+    from ``ethtool`` when netlink does not have it.
+
+    :param nics: Names of the NICs.
+    :param links: Links from a netlink dump, by name.
+    """
+    macs = {}
+    missing = []
+    for nic in nics:
+        link = links.get(nic)
+        if link and link.perm_address:
+            macs[nic] = link.perm_address
+        else:
+            LOG.info('No permanent address over netlink for %s', nic)
+            missing.append(nic)
+    macs.update(_ethtool_macs(missing))
+    return macs
+
+
+@trace.traced
 def map_nics() -> list[NIC]:
     """
     Returns a map of all the network interfaces that the kernel is aware of.
+
+    The permanent MAC address and link state of every NIC are read from a
+    single netlink dump, NICs that the dump does not have a permanent address
+    for (e.g. older kernels) fall back to ``ethtool``.
+
+    When ``CRUCIBLE_SYSFS_ROOT`` points at a copy of ``/sys`` (e.g. to
+    profile against a recorded transcript, see ``crucible.os.replay``), the
+    NICs are read from it and every MAC address comes from ``ethtool``.
     """
     nics = []
     supported, platform = supported_platforms()
     if not supported:
         click.echo(f'Mapping NICs is not supported on {platform}')
         return nics
-    nic_files = glob('/sys/bus/pci/drivers/*/0000:*/net/*')
+    if os.environ.get('CRUCIBLE_SYSFS_ROOT'):
+        links = {}
+        nic_files = glob(
+            os.path.join(os.environ['CRUCIBLE_SYSFS_ROOT'], PCI_NICS)
+        )
+    else:
+        links = netlink.dump_links()
+        nic_files = glob(os.path.join('/sys', PCI_NICS))
+    macs = _permanent_macs(
+        [os.path.basename(nic_file) for nic_file in nic_files],
+        links,
+    )
     for nic_file in nic_files:
         nic = os.path.basename(nic_file)
-        mac_cmd = run_command(['ethtool', '-P', nic], silence=True)
-        mac_cmd.decode('utf-8')
-        mac = mac_cmd.stdout.rsplit(' ', maxsplit=1)[-1]
-
-        pci_id = ''
-        nic_kernel_files = os.path.dirname(os.path.dirname(nic_file))
-        nic_uevent_file = os.path.join(nic_kernel_files, 'uevent')
-        with open(nic_uevent_file, 'r', encoding='utf-8') as uevent:
-            for line in uevent:
-                if re.search(r'^PCI_ID', line):
-                    LOG.info('Found PCI_ID in line: %s', line)
-                    pci_id = line.split('=')[-1]
-                    break
-        vendor_id, device_id = pci_id.split(':')
+        link = links.get(nic)
+        mac = macs[nic]
+
+        vendor_id, device_id, subsystem_vendor_id, subsystem_device_id = \
+            _pci_ids(nic_file)
         LOG.info(
             'Found NIC name: %s, MAC: %s, device ID: %s, vendor ID: %s',
             nic,
@@ -208,92 +316,262 @@ def map_nics() -> list[NIC]:
             device_id,
             vendor_id,
         )
-        nics.append(
-            NIC(
-                name=nic,
-                mac=mac,
-                device_id=device_id,
-                vendor_id=vendor_id,
-            )
+        new_nic = NIC(
+            name=nic,
+            mac=mac,
+            device_id=device_id,
+            vendor_id=vendor_id,
         )
+        new_nic.subsystem_vendor_id = subsystem_vendor_id.strip()
+        new_nic.subsystem_device_id = subsystem_device_id.strip()
+        if link:
+            new_nic.index = link.index
+            new_nic.operstate = link.operstate
+        nics.append(new_nic)
     return nics
 
 
-def _rename(nics: list[NIC]) -> None:
+def _rename_steps(
+        existing: set[str],
+        renames: list[tuple[str, str]],
+) -> list[tuple[str, str]]:
     """
-    Renames the NIC to NIC.
+    Orders renames so that no NIC is renamed to a name that is still in use.
+
+    Chains (e.g. ``eth1 -> eth2``, ``eth0 -> eth1``) are ordered, and cycles
+    (e.g. ``eth0 <-> eth1``) are broken by moving one NIC to a temporary name
+    first.
+
+    :param existing: Every link name currently on the system.
+    :param renames: ``(old, new)`` name pairs.
+    :returns: ``(old, new)`` name pairs in the order they can be applied.
+    """
+    pending = dict(sorted(renames))
+    taken = set(existing)
+    temporary = itertools.count()
+    steps = []
+
+    def step(old: str, new: str) -> None:
+        steps.append((old, new))
+        taken.discard(old)
+        taken.add(new)
+        del pending[old]
+
+    while pending:
+        ready = [old for old, new in pending.items() if new not in taken]
+        for old in ready:
+            step(old, pending[old])
+        if ready:
+            continue
+        # A rename waiting on a name held outside of the renames can never
+        # run, nor can the renames waiting on it; drop the whole chain
+        # before breaking what remains, which are real cycles.
+        blocked = [
+            old for old, new in pending.items() if new not in pending
+        ]
+        while blocked:
+            for old in blocked:
+                LOG.error(
+                    'Can not rename %s to %s, the name is used by another '
+                    'NIC.',
+                    old,
+                    pending.pop(old),
+                )
+            blocked = [
+                old for old, new in pending.items() if new not in pending
+            ]
+        if pending:
+            old, new = next(iter(pending.items()))
+            temp_name = f'crutmp{next(temporary)}'
+            while temp_name in taken:
+                temp_name = f'crutmp{next(temporary)}'
+            step(old, temp_name)
+            pending[temp_name] = new
+    return steps
+
+
+def _rename_netlink(nics: list[NIC]) -> None:
+    """
+    Renames NICs over a single netlink socket.
+
+    The renames are planned first (see ``_rename_steps``), and only the links
+    that will be renamed are brought down; each is brought back up (by
+    index, regardless of its new name) if it was up before.
+
     :param nics: List of ``NIC`` objects to rename.
+    :raises OSError: When a netlink socket can not be opened.
     """
-    for nic in nics:
-        click.echo(f'Renaming {nic.old_name} to {nic.name}')
-        if nic.name == nic.old_name:
-            LOG.info('%s was already renamed.', nic.old_name)
-        LOG.info('Renaming %s to %s', nic.old_name, nic.name)
-        was_up = False
-        current_state = run_command(['ip', 'link', 'show', nic.old_name])
-        current_state.decode('utf-8')
-        if current_state.return_code == 0:
-            if 'UP' in current_state.stdout:
-                LOG.info(
-                    '%s is UP and will be shutdown for renaming.',
-                    nic.old_name
+    with netlink.Netlink() as sock:
+        links = {link.name: link for link in sock.links()}
+        renames = _existing_renames(nics, links)
+        steps = _rename_steps(set(links), renames)
+        moving = {old for old, _ in steps}
+        was_up = []
+        failed = set()
+        for old, _ in renames:
+            link = links[old]
+            if old not in moving or not link.is_up:
+                continue
+            LOG.info('%s is UP and will be shutdown for renaming.', old)
+            try:
+                sock.set_link(link.index, up=False)
+            except netlink.NetlinkError as error:
+                LOG.error(
+                    '%s could not be shut down, rename will fail '
+                    '- skipping: %s',
+                    old,
+                    error,
+                    extra={'nic': old},
                 )
-                down_result = run_command(
-                    [
-                        'ip',
-                        'link',
-                        'set',
-                        nic.old_name,
-                        'down',
-                    ]
+                failed.add(old)
+                continue
+            was_up.append(link.index)
+        if failed:
+            steps = _rename_steps(
+                set(links),
+                [(old, new) for old, new in renames if old not in failed],
+            )
+        indexes = {name: link.index for name, link in links.items()}
+        for old, new in steps:
+            index = indexes.pop(old, None)
+            if index is None:
+                continue
+            try:
+                sock.set_link(index, name=new)
+            except netlink.NetlinkError as error:
+                LOG.error(
+                    'Failed to rename %s to %s for reason: %s',
+                    old,
+                    new,
+                    error,
+                    extra={'nic': old},
                 )
-                if down_result.return_code == 0:
-                    LOG.info('%s is now DOWN.', nic.old_name)
-                    was_up = True
-                else:
-                    LOG.error(
-                        '%s could not be shut down, rename will fail '
-                        '- skipping.'
-                    )
-                    continue
-        else:
-            LOG.error('NIC [%s] does not exist!', nic.old_name)
-        rename_result = run_command(
-            [
-                'ip',
-                'link',
-                'set',
+                continue
+            indexes[new] = index
+            LOG.info('Successfully renamed %s to %s', old, new)
+        for index in was_up:
+            try:
+                sock.set_link(index, up=True)
+            except netlink.NetlinkError as error:
+                LOG.warning('Link %i could not be UPed: %s', index, error)
+
+
+def _existing_renames(nics: list[NIC], links) -> list[tuple[str, str]]:
+    """
+    Returns the ``(old, new)`` name pairs of the NICs whose link exists,
+    logging the others.
+
+    :param nics: List of ``NIC`` objects to rename.
+    :param links: The current links, by name.
+    """
+    renames = []
+    for nic in nics:
+        if nic.old_name not in links:
+            LOG.error(
+                'NIC [%s] does not exist!',
                 nic.old_name,
-                'name',
-                nic.name,
-            ]
+                extra={'nic': nic.old_name},
+            )
+            continue
+        renames.append((nic.old_name, nic.name))
+    return renames
+
+
+def _set_links(names: list[str], state: str) -> list[str]:
+    """
+    Sets links ``up`` or ``down`` with ``ip link``, concurrently.
+
+    :param names: Names of the links.
+    :param state: ``up`` or ``down``.
+    :returns: The names of the links that could not be set.
+    """
+    results = run_commands(
+        [['ip', 'link', 'set', name, state] for name in names]
+    )
+    return [
+        name for name, result in zip(names, results) if result.return_code != 0
+    ]
+
+
+def _rename_ip(nics: list[NIC]) -> None:
+    """
+    Renames NICs by calling ``ip link``.
+
+    :param nics: List of ``NIC`` objects to rename.
+    """
+    # Not cached: the current link names and states are what the renames
+    # are planned against.
+    result = run_command(['ip', '-o', 'link', 'show'])
+    result.decode('utf-8')
+    links = {}
+    for line in result.stdout.splitlines():
+        match = re.match(r'^\d+:\s+([^:@]+)[^<]*<([^>]*)>', line)
+        if match:
+            links[match.group(1)] = 'UP' in match.group(2).split(',')
+    renames = _existing_renames(nics, links)
+    steps = _rename_steps(set(links), renames)
+    moving = {old for old, _ in steps}
+    shutdown = [old for old, _ in renames if old in moving and links[old]]
+    for old in shutdown:
+        LOG.info('%s is UP and will be shutdown for renaming.', old)
+    failed = _set_links(shutdown, 'down')
+    for old in failed:
+        LOG.error(
+            '%s could not be shut down, rename will fail - skipping.',
+            old,
+            extra={'nic': old},
         )
+    if failed:
+        steps = _rename_steps(
+            set(links),
+            [(old, new) for old, new in renames if old not in failed],
+        )
+    # The links that were brought down, by their current name.
+    was_up = [old for old in shutdown if old not in failed]
+    for old, new in steps:
+        rename_result = run_command(['ip', 'link', 'set', old, 'name', new])
         if rename_result.return_code == 0:
-            if was_up:
-                LOG.info('Attempting to UP %s', nic.name)
-                down_result = run_command(
-                    [
-                        'ip',
-                        'link',
-                        'set',
-                        nic.old_name,
-                        'up',
-                    ]
-                )
-                if down_result.return_code == 0:
-                    LOG.info('%s is now UP.', nic.name)
-                else:
-                    LOG.warning('%s could not be UPed!', nic.name)
-            LOG.info('Successfully renamed %s to %s', nic.old_name, nic.name)
+            LOG.info('Successfully renamed %s to %s', old, new)
+            if old in was_up:
+                was_up[was_up.index(old)] = new
         else:
             LOG.error(
                 'Failed to rename %s to %s for reason (stdout: %s)'
                 ' (stderr: %s)',
-                nic.old_name,
-                nic.name,
+                old,
+                new,
                 rename_result.stdout,
                 rename_result.stderr,
+                extra={'nic': old},
             )
+    for name in _set_links(was_up, 'up'):
+        LOG.warning('%s could not be UPed!', name)
+
+
+@trace.traced
+def _rename(nics: list[NIC]) -> None:
+    """
+    Renames the NIC to NIC.
+
+    NICs that already have their new name are left alone.
+
+    :param nics: List of ``NIC`` objects to rename.
+    """
+    renames = []
+    for nic in nics:
+        if nic.name == nic.old_name:
+            LOG.info('%s was already renamed.', nic.old_name)
+            continue
+        click.echo(f'Renaming {nic.old_name} to {nic.name}')
+        LOG.info('Renaming %s to %s', nic.old_name, nic.name)
+        renames.append(nic)
+    if renames:
+        try:
+            _rename_netlink(renames)
+        except OSError as error:
+            LOG.warning('Netlink is unavailable, using ip: %s', error)
+            _rename_ip(renames)
+        invalidate_cache()
     click.echo('Finished renaming NICs')
 
 
@@ -302,15 +580,11 @@ def _rendor_udev_rules(nics: list[NIC]) -> str:
     Renders the udev rule template based on a list of NICs.
     :param nics: A list of NICs, or a single NIC
     """
-    directory = os.path.dirname(__file__)
-    template_directory = os.path.join(directory, 'templates')
-    loader = FileSystemLoader(template_directory)
-    env = Environment(loader=loader)
-    template = env.get_template('ifname.udev.rules.j2')
-    render = sorted(template.render(nics=nics).split('\n'))
-    return '\n'.join(render)
+    rules = render.render('ifname.udev.rules.j2', nics=nics)
+    return '\n'.join(sorted(rules.removesuffix('\n').split('\n')))
 
 
+@trace.traced
 def write_udev_rules(
         rules: str,
         install_location: str,
@@ -320,64 +594,58 @@ def write_udev_rules(
     """
     Writes the udev rule file.
 
+    The file is left untouched when it already holds the given rules. When
+    merging, rules for the same MAC or the same name as a new rule are
+    replaced by the new rule. The file is written atomically.
+
     :param rules: udev rules to write
     :param install_location: String
     :param merge: String
     :param overwrite: String
     """
-    open_mode = 'w'
-    udev_rules = os.path.join(install_location, '80-ifname.rules')
-    if os.path.exists(udev_rules) and not overwrite:
-        LOG.warning('File [%s] already exists!', udev_rules)
-        choice = click.prompt(
-            f'An existing udev file exists at {udev_rules}; overwrite, '
-            f'merge, or quit?',
-            show_choices=True,
-            type=click.Choice(
-                ['o', 'm', 'q'],
-                case_sensitive=False,
+    udev_rules = os.path.join(install_location, udev.RULES_FILE)
+    new_rules = udev.RuleSet.parse(rules)
+    if os.path.exists(udev_rules):
+        with open(udev_rules, 'r', encoding='utf-8') as old_udev_rules:
+            old_rules = udev.RuleSet.parse(old_udev_rules.read())
+        if old_rules == new_rules or \
+                (merge and old_rules.issuperset(new_rules)):
+            LOG.info('%s already has every rule, not writing.', udev_rules)
+            click.echo(f'{udev_rules} is already up to date.')
+            return
+        if not overwrite and not merge:
+            LOG.warning('File [%s] already exists!', udev_rules)
+            choice = click.prompt(
+                f'An existing udev file exists at {udev_rules}; overwrite, '
+                f'merge, or quit?',
+                show_choices=True,
+                type=click.Choice(
+                    ['o', 'm', 'q'],
+                    case_sensitive=False,
+                )
             )
-        )
-        if choice == 'm':
-            merge = True
-        elif choice == 'q':
-            LOG.info('User chose to exit.')
-            click.echo('Exiting ... ')
-            sys.exit(0)
+            if choice == 'm':
+                merge = True
+            elif choice == 'q':
+                LOG.info('User chose to exit.')
+                click.echo('Exiting ... ')
+                sys.exit(0)
         if merge:
-            LOG.info('Merging old and new rules; sorting uniquely.')
-            with open(udev_rules, 'r', encoding='utf-8') as old_udev_rules:
-                unique = set()
-                old_rules = old_udev_rules.read().split('\n')
-                for rule in old_rules:
-                    unique.add(rule)
-                for rule in rules.split('\n'):
-                    unique.add(rule)
-                unique = sorted(unique)
-                rules = '\n'.join(unique)
-        LOG.info('Writing udev rules to: %s', install_location)
-    with open(udev_rules, open_mode, encoding='utf-8') as udev_file:
-        udev_file.write(rules)
+            LOG.info('Merging old and new rules.')
+            for replaced, rule in old_rules.merge(new_rules):
+                click.echo(f'Replacing conflicting rule: {replaced}')
+                LOG.info('Replaced [%s] with [%s]', replaced, rule)
+            new_rules = old_rules
+    LOG.info('Writing udev rules to: %s', install_location)
+    atomic_write(udev_rules, new_rules.render())
     click.echo(f'Wrote {udev_rules}.')
 
 
-def _ifname_meta() -> dict:
-    """
-    Opens the ifname.yml datafile.
-    """
-    default_yaml_path = '/etc/crucible/ifname'
-    if os.path.exists(f'{default_yaml_path}.yml'):
-        ifname_yml_path = os.path.join(f'{default_yaml_path}.yml')
-    elif os.path.exists(f'{default_yaml_path}.yaml'):
-        ifname_yml_path = os.path.join(f'{default_yaml_path}.yaml')
-    else:
-        ifname_yml_path = os.path.join(os.path.dirname(__file__), 'ifname.yml')
-    LOG.info('Using NIC database file: %s',ifname_yml_path)
-    with open(ifname_yml_path, 'r', encoding='utf-8') as ifname_yml:
-        return safe_load(ifname_yml.read())
-
-
-def get_new_names(nics: list[NIC]) -> list[NIC]:
+@trace.traced
+def get_new_names(
+        nics: list[NIC],
+        reserved: set[str] = None,
+) -> list[NIC]:
     """
     Given a list of ``NIC`` objects, resolve new names using the official
     prefixes.
@@ -385,25 +653,33 @@ def get_new_names(nics: list[NIC]) -> list[NIC]:
     Requires ``ifname.yml``.
 
     :param nics: List of ``NIC``s to resolve new classifications for.
+    :param reserved: Names already given to other NICs, these are skipped.
     """
     sorted_nics = sorted(nics, key=lambda x: x.mac)
-    ifname = _ifname_meta()
-    prefixes = PrefixIndexes()
-    hsn_ids = [f'{v["vendor_id"]}:{v["device_id"]}'.lower() for v in
-               ifname.get('hsn_ids')]
-    mgmt_ids = [v["vendor_id"].lower() for v in ifname.get('mgmt_ids')]
+    index = classify.load_index()
+    prefixes = PrefixIndexes(reserved)
     for nic in sorted_nics:
-        pci_id = f'{nic.vendor_id}:{nic.device_id}'.lower().strip()
-        if pci_id in hsn_ids:
+        classification = index.classify(
+            nic.vendor_id,
+            nic.device_id,
+            nic.subsystem_vendor_id,
+            nic.subsystem_device_id,
+        )
+        if classification == prefixes.prefix_hsn:
             nic.name = prefixes.hsn
-        elif nic.vendor_id.lower() in mgmt_ids:
+        elif classification == prefixes.prefix_mgmt:
             nic.name = prefixes.mgmt
+        elif classification == prefixes.prefix_sun:
+            nic.name = prefixes.sun
         else:
             nic.name = prefixes.lan
-    return pcie_redundancy_indexing(sorted_nics)
+    return pcie_redundancy_indexing(sorted_nics, reserved)
 
 
-def pcie_redundancy_indexing(nics: list[NIC]) -> list[NIC]:
+def pcie_redundancy_indexing(
+        nics: list[NIC],
+        reserved: set[str] = None,
+) -> list[NIC]:
     """
     Reindex network interface names to promote PCIe fail-over redundancy
     where the network is distributed across two switches each connected to
@@ -454,8 +730,9 @@ def pcie_redundancy_indexing(nics: list[NIC]) -> list[NIC]:
 
 
     :param nics: List of ``NIC`` devices to check for PCIe redundancy.
+    :param reserved: Names already given to other NICs, these are skipped.
     """
-    prefixes = PrefixIndexes()
+    prefixes = PrefixIndexes(reserved)
     main_nics = [nic for nic in nics if prefixes.prefix_mgmt in nic.name]
     if len(main_nics) <= 0:
         LOG.info('No NICs.')
@@ -478,16 +755,118 @@ def pcie_redundancy_indexing(nics: list[NIC]) -> list[NIC]:
     return nics
 
 
+@trace.traced
+def plan(
+        nics: list[NIC],
+        install_location: str,
+        overwrite: bool = False,
+) -> udev.Plan:
+    """
+    Diffs the current NIC names and udev rules against the desired names.
+
+    :param nics: List of ``NIC`` objects with their new names resolved.
+    :param install_location: Where the udev rules are installed.
+    :param overwrite: Whether the udev rules will be overwritten rather
+                      than merged.
+    """
+    changes = udev.Plan()
+    for nic in nics:
+        if nic.old_name and nic.name != nic.old_name:
+            changes.renames.append((nic.mac.lower(), nic.old_name, nic.name))
+    existing = udev.RuleSet()
+    udev_rules = os.path.join(install_location, udev.RULES_FILE)
+    if os.path.exists(udev_rules):
+        with open(udev_rules, 'r', encoding='utf-8') as old_udev_rules:
+            existing = udev.RuleSet.parse(old_udev_rules.read())
+    desired = udev.RuleSet.parse(_rendor_udev_rules(nics))
+    return udev.plan_rules(changes, desired, existing, overwrite=overwrite)
+
+
+def name_new_nics(install_location: str, skip_rename: bool = False) -> None:
+    """
+    Names NICs that have no udev rule yet, and appends rules for them.
+
+    NICs that already have a rule keep their name, and their names (and every
+    name with a rule) are reserved so that new NICs continue the indexes.
+
+    :param install_location: Where the udev rules are installed.
+    :param skip_rename: When true, interfaces will not be renamed.
+    """
+    existing = udev.RuleSet()
+    udev_rules = os.path.join(install_location, udev.RULES_FILE)
+    if os.path.exists(udev_rules):
+        with open(udev_rules, 'r', encoding='utf-8') as old_udev_rules:
+            existing = udev.RuleSet.parse(old_udev_rules.read())
+    new_nics = []
+    reserved = set(existing.by_name)
+    for nic in map_nics():
+        if nic.mac.lower() in existing.by_mac:
+            reserved.add(nic.name)
+        else:
+            new_nics.append(nic)
+    if not new_nics:
+        LOG.info('No new NICs.')
+        return
+    new_nics = get_new_names(new_nics, reserved)
+    for nic in new_nics:
+        click.echo(f'Found new NIC {nic.old_name} ({nic.mac}) -> {nic.name}')
+    if not skip_rename:
+        _rename(new_nics)
+    write_udev_rules(
+        _rendor_udev_rules(new_nics),
+        install_location=install_location,
+        merge=True,
+    )
+
+
+def watch(
+        install_location: str,
+        debounce: float = 2.0,
+        skip_rename: bool = False,
+) -> None:
+    """
+    Names NICs as the kernel adds them, until interrupted.
+
+    Subscribes to kernel uevents and, after each burst of ``net`` ``add``
+    events, names the NICs that have no udev rule yet.
+
+    :param install_location: Where the udev rules are installed.
+    :param debounce: Seconds without a new NIC that end a burst.
+    :param skip_rename: When true, interfaces will not be renamed.
+    """
+    with netlink.UeventMonitor() as monitor:
+        click.echo('Watching for new NICs ... ')
+        name_new_nics(install_location, skip_rename=skip_rename)
+        while True:
+            events = monitor.collect(
+                lambda event: event.get('SUBSYSTEM') == 'net'
+                and event.get('ACTION') == 'add',
+                debounce,
+            )
+            LOG.info(
+                'NICs added: %s',
+                ', '.join(event.get('INTERFACE', '?') for event in events),
+            )
+            name_new_nics(install_location, skip_rename=skip_rename)
+
+
 def run(
         skip_rename: bool,
         skip_udev: bool,
         merge: bool,
         overwrite: bool,
         install_location: str = '/etc/udev/rules.d/',
+        dry_run: bool = False,
+        watch_nics: bool = False,
+        debounce: float = 2.0,
 ) -> None:
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
     """
     Renames interfaces on the machine and creates udev rules for them.
 
+    Only NICs whose name changes are renamed, and the udev rules are only
+    written if they change; a node that is already converged is left alone.
+
     :param skip_rename: When true, interfaces will not be renamed but only
         previewed.
     :param skip_udev: When true, udev rules will not be saved but only
@@ -497,27 +876,45 @@ def run(
     :param overwrite: When true, new udev rules will overwrite the old udev
         rules without prompting.
     :param install_location: Where to install udev rules to.
+    :param dry_run: When true, the planned changes are printed as JSON and
+        nothing is changed.
+    :param watch_nics: When true, keep running and name NICs as the kernel
+        adds them (see ``watch``).
+    :param debounce: Seconds without a new NIC that end a burst of NICs
+        being added when watching.
     :raises UdevError: When udev rules can not be resolved.
     """
     nics = map_nics()
     nics = get_new_names(nics)
     if not nics:
+        if watch_nics and not dry_run:
+            watch(install_location, debounce, skip_rename=skip_rename)
         raise UdevError('Nothing to do')
-    if not skip_rename:
-        click.echo('Renaming NICs ... ')
-        _rename(nics)
-    else:
-        LOG.info('skip-rename was set, not renaming interfaces.')
-    if not skip_udev:
-        click.echo('Creating udev rules for persistence ... ')
-        rules = _rendor_udev_rules(nics)
-        write_udev_rules(
-            rules,
-            install_location=install_location,
-            merge=merge,
-            overwrite=overwrite,
-        )
+    changes = plan(nics, install_location, overwrite=overwrite)
+    if dry_run:
+        click.echo(json.dumps(changes.to_dict(), indent=2))
+        return
+    if not changes:
+        LOG.info('NIC names and udev rules are already converged.')
+        click.echo('NIC names and udev rules are already up to date.')
     else:
-        udev = _rendor_udev_rules(nics)
-        LOG.info('skip-udev was present; not writing udev rules')
-        click.echo(f'udev rule preview:\n{udev}')
+        if skip_rename:
+            LOG.info('skip-rename was set, not renaming interfaces.')
+        elif changes.renames:
+            click.echo('Renaming NICs ... ')
+            _rename(nics)
+        if skip_udev:
+            preview = _rendor_udev_rules(nics)
+            LOG.info('skip-udev was present; not writing udev rules')
+            click.echo(f'udev rule preview:\n{preview}')
+        elif changes.rules_changed:
+            click.echo('Creating udev rules for persistence ... ')
+            rules = _rendor_udev_rules(nics)
+            write_udev_rules(
+                rules,
+                install_location=install_location,
+                merge=merge,
+                overwrite=overwrite,
+            )
+    if watch_nics:
+        watch(install_location, debounce, skip_rename=skip_rename)
@@ -0,0 +1,282 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Offline udev rule generation from NIC inventories.
+
+Each node's inventory is one file in a directory, named after the node:
+
+- ``<node>.json``: A list of NICs (or ``{"nics": [...]}``).
+- ``<node>.csv``: One NIC per row, with a header row.
+
+Each NIC has a ``name``, ``mac``, ``vendor_id`` and ``device_id`` (or a
+``pci_id`` of the form ``vendor:device``), and optionally
+``subsystem_vendor_id`` and ``subsystem_device_id``; other fields (e.g.
+``pci_path``) are ignored.
+
+Inventories are read lazily and handed to a pool of worker processes a few
+at a time, so memory use does not grow with the number of nodes.
+"""
+import concurrent.futures
+import csv
+import json
+import os
+import time
+
+import click
+
+from crucible.logger import Logger
+from crucible.logger import init_worker
+from crucible.network import ifname
+from crucible.network import render
+from crucible.network import udev
+from crucible.os import atomic_write
+
+LOG = Logger(__name__)
+
+EXTENSIONS = ('.json', '.csv')
+SUMMARY_FILE = 'summary.json'
+NIC_FIELDS = (
+    'name',
+    'mac',
+    'pci_id',
+    'vendor_id',
+    'device_id',
+    'subsystem_vendor_id',
+    'subsystem_device_id',
+)
+
+
+class InventoryError(Exception):
+
+    """
+    An exception for unreadable inventories.
+    """
+
+    def __init__(self, message) -> None:
+        self.message = message
+        super().__init__(self.message)
+
+
+def _nic(entry: dict) -> ifname.NIC:
+    """
+    Creates a ``NIC`` from an inventory entry.
+
+    :param entry: A NIC from an inventory.
+    :raises InventoryError: When the NIC is not an object, is missing a
+                            field, or has a field that is not a string.
+    """
+    if not isinstance(entry, dict):
+        raise InventoryError(f'NIC is not an object: {entry}')
+    fields = {}
+    for field in NIC_FIELDS:
+        # A short CSV row leaves its missing columns as None.
+        value = entry.get(field)
+        if value is None:
+            value = ''
+        if not isinstance(value, str):
+            raise InventoryError(f'NIC has a non-string {field}: {entry}')
+        fields[field] = value
+    if fields['pci_id']:
+        fields['vendor_id'], _, fields['device_id'] = \
+            fields['pci_id'].partition(':')
+    if not fields['name'] or not fields['mac'] or not fields['vendor_id']:
+        raise InventoryError(f'NIC is missing a name, mac or PCI ID: {entry}')
+    nic = ifname.NIC(
+        name=fields['name'],
+        mac=fields['mac'],
+        device_id=fields['device_id'],
+        vendor_id=fields['vendor_id'],
+    )
+    nic.subsystem_vendor_id = fields['subsystem_vendor_id']
+    nic.subsystem_device_id = fields['subsystem_device_id']
+    return nic
+
+
+def read_inventory(path: str) -> list[ifname.NIC]:
+    """
+    Reads the NICs of a node's inventory file.
+
+    :param path: Path to a ``.json`` or ``.csv`` inventory.
+    :raises InventoryError: When the file can not be parsed.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as inventory:
+            if path.endswith('.csv'):
+                entries = list(csv.DictReader(inventory))
+            else:
+                entries = json.load(inventory)
+    except (OSError, ValueError, csv.Error) as error:
+        raise InventoryError(f'Could not read {path}: {error}') from error
+    if isinstance(entries, dict):
+        entries = entries.get('nics', [])
+    if not isinstance(entries, list):
+        raise InventoryError(f'{path} does not hold a list of NICs.')
+    return [_nic(entry) for entry in entries]
+
+
+def generate(path: str, output: str) -> dict:
+    """
+    Names the NICs of one node's inventory and writes its udev rules to
+    ``<output>/<node>.rules``.
+
+    :param path: Path to the node's inventory.
+    :param output: Directory to write the rules to.
+    :returns: A summary with the node's name, NIC count, classification
+              collisions (NICs whose rule would replace another NIC's rule),
+              and any error.
+    """
+    node = os.path.splitext(os.path.basename(path))[0]
+    summary = {'node': node, 'nics': 0, 'collisions': [], 'error': ''}
+    try:
+        _generate(path, output, summary)
+    except InventoryError as error:
+        summary['error'] = error.message
+    # One malformed inventory must not abort the rest of the fleet.
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        summary['error'] = f'Could not generate rules for {path}: {error!r}'
+    return summary
+
+
+def _generate(path: str, output: str, summary: dict) -> None:
+    """
+    Names the NICs of one node's inventory and writes its udev rules,
+    recording the NIC count and collisions in the node's summary.
+
+    :param path: Path to the node's inventory.
+    :param output: Directory to write the rules to.
+    :param summary: The node's summary.
+    :raises InventoryError: When the inventory can not be read, or the rules
+                            can not be written.
+    """
+    nics = ifname.get_new_names(read_inventory(path))
+    summary['nics'] = len(nics)
+    rules = udev.RuleSet()
+    for line in render.render('ifname.udev.rules.j2', nics=nics).splitlines():
+        rule = udev.Rule(line)
+        if not rule.mac or not rule.name:
+            continue
+        for replaced in rules.add(rule):
+            summary['collisions'].append(f'{replaced} <> {rule}')
+    _write_rules(os.path.join(output, f'{summary["node"]}.rules'), rules)
+
+
+def _write_rules(path: str, rules: udev.RuleSet) -> None:
+    """
+    Writes a node's udev rules.
+
+    :param path: The rules file.
+    :param rules: The node's rules.
+    :raises InventoryError: When the file can not be written.
+    """
+    try:
+        atomic_write(path, rules.render())
+    except OSError as error:
+        raise InventoryError(f'Could not write {path}: {error}') from error
+
+
+def _inventories(directory: str):
+    """
+    Yields the inventory files in a directory, without listing the whole
+    directory up front.
+
+    :param directory: Directory of inventories.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(EXTENSIONS) and entry.is_file():
+                yield entry.path
+
+
+def run(directory: str, output: str, workers: int = None) -> dict:
+    """
+    Generates udev rules for every inventory in a directory.
+
+    A summary of the nodes with collisions or errors is written to
+    ``<output>/summary.json``.
+
+    :param directory: Directory of inventories.
+    :param output: Directory to write one rules file per node to.
+    :param workers: Number of worker processes (default: one per CPU).
+    :returns: The summary.
+    """
+    os.makedirs(output, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    summary = {'nodes': 0, 'nics': 0, 'collisions': {}, 'errors': {}}
+    start_time = time.monotonic()
+    paths = _inventories(directory)
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+    ) as pool:
+        pending = set()
+        for path in paths:
+            pending.add(pool.submit(generate, path, output))
+            if len(pending) < workers * 4:
+                continue
+            done, pending = concurrent.futures.wait(
+                pending,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            _tally(summary, done)
+        _tally(summary, concurrent.futures.as_completed(pending))
+    duration = time.monotonic() - start_time
+    summary['seconds'] = round(duration, 3)
+    summary['nodes_per_second'] = round(summary['nodes'] / duration, 1) \
+        if duration else 0.0
+    atomic_write(
+        os.path.join(output, SUMMARY_FILE),
+        json.dumps(summary, indent=2) + '\n',
+    )
+    click.echo(
+        f'Generated udev rules for {summary["nodes"]} nodes '
+        f'({summary["nics"]} NICs) in {duration:.2f}s '
+        f'({summary["nodes_per_second"]} nodes/second).'
+    )
+    if summary['collisions']:
+        click.echo(
+            f'{len(summary["collisions"])} nodes have classification '
+            f'collisions, see {os.path.join(output, SUMMARY_FILE)}.'
+        )
+    if summary['errors']:
+        click.echo(f'{len(summary["errors"])} inventories could not be read.')
+    return summary
+
+
+def _tally(summary: dict, futures) -> None:
+    """
+    Adds the results of finished nodes to the summary.
+
+    :param summary: The running summary.
+    :param futures: Finished futures of ``generate``.
+    """
+    for future in futures:
+        result = future.result()
+        if result['error']:
+            LOG.error('%s: %s', result['node'], result['error'])
+            summary['errors'][result['node']] = result['error']
+            continue
+        summary['nodes'] += 1
+        summary['nics'] += result['nics']
+        if result['collisions']:
+            summary['collisions'][result['node']] = result['collisions']
@@ -28,18 +28,21 @@ Base object for network managers, their configuration, and an interface.
 
 import re
 import dataclasses
-import os
+import heapq
 
 import netaddr
-import jinja2
-from j2ipaddr import filters
 
 from crucible.logger import Logger
-
-jinja2.filters.FILTERS.update(filters.load_all())
+from crucible.network import render
 
 LOG = Logger(__name__)
 
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+
+KINDS = ('ethernet', 'bond', 'vlan', 'bridge')
+
 
 class InterfaceError(Exception):
 
@@ -136,6 +139,8 @@ class Interface(IPAddr):
         self.vlan_id = kwargs.get('vlan_id', 0)
         self.mtu = kwargs.get('mtu', 9000)
         self.is_default_route = kwargs.get('default', False)
+        if kwargs.get('gateway'):
+            self.gateway = netaddr.IPAddress(kwargs['gateway'])
 
     @property
     def vlan_id(self) -> int:
@@ -164,6 +169,123 @@ class Interface(IPAddr):
         self._vlan_id = 0
 
 
+def _kind(interface: Interface) -> int:
+    """
+    Returns the rank of an interface's kind; physical NICs are loaded before
+    bonds, bonds before VLANs, and VLANs before bridges.
+
+    :param interface: The interface.
+    """
+    if interface.vlan_id:
+        return 2
+    if interface.is_bridge():
+        return 3
+    if interface.is_bond():
+        return 1
+    return 0
+
+
+def kind(interface: Interface) -> str:
+    """
+    Returns the name of an interface's kind, one of ``KINDS``.
+
+    :param interface: The interface.
+    """
+    return KINDS[_kind(interface)]
+
+
+def dependency_order(interfaces: list[Interface]) -> list[Interface]:
+    """
+    Orders interfaces so that each one comes after its members (e.g. the NICs
+    of a bond, the bond of a VLAN, or the ports of a bridge). Otherwise
+    physical NICs come first, then bonds, VLANs, and bridges, each in the
+    given order.
+
+    :param interfaces: The interfaces to order.
+    """
+    names = {interface.name for interface in interfaces}
+    waiting_on = {}
+    dependents = {}
+    for interface in interfaces:
+        members = {
+            member for member in interface.members
+            if member in names and member != interface.name
+        }
+        waiting_on[interface.name] = len(members)
+        for member in members:
+            dependents.setdefault(member, []).append(interface)
+    ready = [
+        (_kind(interface), index, interface)
+        for index, interface in enumerate(interfaces)
+        if not waiting_on[interface.name]
+    ]
+    heapq.heapify(ready)
+    indexes = {
+        interface.name: index for index, interface in enumerate(interfaces)
+    }
+    ordered = []
+    while ready:
+        _, _, interface = heapq.heappop(ready)
+        ordered.append(interface)
+        for dependent in dependents.get(interface.name, []):
+            waiting_on[dependent.name] -= 1
+            if not waiting_on[dependent.name]:
+                heapq.heappush(
+                    ready,
+                    (_kind(dependent), indexes[dependent.name], dependent),
+                )
+    if len(ordered) != len(interfaces):
+        cycle = [
+            interface.name for interface in interfaces
+            if interface not in ordered
+        ]
+        raise InterfaceError(f'Interfaces depend on each other: {cycle}')
+    return ordered
+
+
+class Reloader:
+    """
+    Collects the interfaces changed during an invocation, and reloads them
+    together with one call to the network manager, in dependency order.
+    """
+
+    def __init__(self, network_manager: 'SystemNetwork') -> None:
+        """
+        :param network_manager: The network manager to reload with.
+        """
+        self.network_manager = network_manager
+        self.interfaces = []
+
+    def add(self, interface: Interface) -> None:
+        """
+        Adds an interface to reload.
+
+        :param interface: The changed interface.
+        """
+        if all(added.name != interface.name for added in self.interfaces):
+            self.interfaces.append(interface)
+
+    def names(self) -> list[str]:
+        """
+        Returns the names of the interfaces to reload, in dependency order.
+        """
+        return [
+            interface.name for interface in dependency_order(self.interfaces)
+        ]
+
+    def reload(self) -> list[str]:
+        """
+        Reloads every added interface at once, and forgets them.
+
+        :returns: The names of the reloaded interfaces, in order.
+        """
+        names = self.names()
+        if names:
+            self.network_manager.reload_interfaces(names)
+        self.interfaces = []
+        return names
+
+
 class SystemNetwork:
 
     """
@@ -226,19 +348,22 @@ class SystemNetwork:
         """
         Renders a template file from ``templates/``
         """
-
-        directory = os.path.dirname(__file__)
-        template_directory = os.path.join(directory, 'templates', self.name)
-        loader = jinja2.FileSystemLoader(template_directory)
-        env = jinja2.Environment(loader=loader, keep_trailing_newline=True)
-        template = env.get_template(f'{template_name}.j2')
-        return template.render(interface=self.interface)
+        return render.render(
+            f'{self.name}/{template_name}.j2',
+            interface=self.interface,
+        )
 
     def reload_interface(self) -> None:
         """
         Reloads/loads an interface.
         """
 
+    def reload_interfaces(self, names: list) -> None:
+        """
+        Reloads/loads several interfaces at once.
+        :param names: Names of the interfaces, in the order to load them.
+        """
+
     def remove_config(self) -> None:
         """
         Removes an interface configuration.
@@ -254,7 +379,29 @@ class SystemNetwork:
         Updates the system's static DNS list.
         """
 
-    def write_config(self) -> None:
+    def update_system(self, **values) -> bool:
+        """
+        Updates the system's DNS servers and search domains (if any were
+        given), and any other settings, at once.
+        :param values: Other settings of the network manager.
+        :returns: Whether anything changed.
+        :raises NotImplementedError: When the network manager has no such
+                                     settings.
+        """
+        if values:
+            raise NotImplementedError(
+                f'{self.name} settings can not be set: {values}'
+            )
+        if any(self._dns):
+            self.update_dns()
+        if any(self._search):
+            self.update_search()
+        return any(self._dns) or any(self._search)
+
+    def write_config(self, overwrite: bool = False) -> [str, None]:
         """
         Writes a configuration to a file.
+        :param overwrite: Overwrite an existing configuration without asking.
+        :returns: Whether the configuration was ``CREATED``, ``UPDATED``, or
+                  ``UNCHANGED``.
         """
@@ -0,0 +1,459 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Minimal ``rtnetlink`` client for reading and changing network links
+in-process, and a listener for kernel uevents.
+
+This talks to the kernel directly over an ``AF_NETLINK`` socket so that
+every link on the system can be described by a single dump request, instead
+of forking ``ip`` or ``ethtool`` once per interface.
+"""
+import dataclasses
+import errno
+import select
+import socket
+import struct
+import time
+from itertools import count
+
+from crucible.logger import Logger
+
+LOG = Logger(__name__)
+
+NETLINK_ROUTE = 0
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x1
+NLM_F_MULTI = 0x2
+NLM_F_ACK = 0x4
+NLM_F_DUMP = 0x300
+
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+RTM_SETLINK = 19
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_OPERSTATE = 16
+IFLA_PERM_ADDRESS = 54
+
+IFF_UP = 0x1
+
+OPERSTATES = (
+    'unknown',
+    'notpresent',
+    'down',
+    'lowerlayerdown',
+    'testing',
+    'dormant',
+    'up',
+)
+
+_NLMSGHDR = struct.Struct('=LHHLL')
+_IFINFOMSG = struct.Struct('=BxHiII')
+_RTATTR = struct.Struct('=HH')
+_NLMSGERR = struct.Struct('=i')
+
+_RECV_SIZE = 65536
+
+
+class NetlinkError(Exception):
+
+    """
+    An exception for netlink problems.
+    """
+
+    def __init__(self, message) -> None:
+        self.message = message
+        super().__init__(self.message)
+
+
+@dataclasses.dataclass
+class Link:
+    """
+    A network link as reported by ``RTM_NEWLINK``.
+
+    :param index: The kernel's interface index.
+    :param name: The current name of the link.
+    :param flags: The ``IFF_*`` flags of the link.
+    :param address: The current hardware address.
+    :param perm_address: The permanent hardware address (if the kernel and
+                         driver report one).
+    :param operstate: The RFC2863 operational state.
+    """
+
+    index: int
+    name: str
+    flags: int = 0
+    address: str = ''
+    perm_address: str = ''
+    operstate: str = 'unknown'
+
+    @property
+    def is_up(self) -> bool:
+        """
+        Whether the link is administratively up.
+        """
+        return bool(self.flags & IFF_UP)
+
+
+def _align(length: int) -> int:
+    """
+    Rounds a length up to the netlink 4 byte alignment.
+
+    :param length: Length to align.
+    """
+    return (length + 3) & ~3
+
+
+def _format_mac(raw: bytes) -> str:
+    """
+    Formats a raw hardware address as colon delimited hex.
+
+    :param raw: The address bytes.
+    """
+    return ':'.join(f'{octet:02x}' for octet in raw)
+
+
+def parse_attributes(data: bytes, offset: int = 0) -> dict:
+    """
+    Parses a run of ``rtattr`` structures.
+
+    :param data: Buffer holding the attributes.
+    :param offset: Where the first attribute starts in ``data``.
+    :returns: A dictionary of attribute type to raw payload.
+    """
+    attributes = {}
+    while offset + _RTATTR.size <= len(data):
+        length, attr_type = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        attributes[attr_type] = data[offset + _RTATTR.size:offset + length]
+        offset += _align(length)
+    return attributes
+
+
+def parse_messages(data: bytes) -> list:
+    """
+    Splits a buffer into its netlink messages.
+
+    :param data: Buffer received from a netlink socket.
+    :returns: A list of ``(type, flags, sequence, payload)`` tuples.
+    """
+    messages = []
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, msg_type, flags, seq, _ = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size:
+            break
+        payload = data[offset + _NLMSGHDR.size:offset + length]
+        messages.append((msg_type, flags, seq, payload))
+        offset += _align(length)
+    return messages
+
+
+def parse_link(payload: bytes) -> Link:
+    """
+    Builds a ``Link`` from the payload of a ``RTM_NEWLINK`` message.
+
+    :param payload: The message payload (``ifinfomsg`` and attributes).
+    """
+    _, _, index, flags, _ = _IFINFOMSG.unpack_from(payload)
+    attributes = parse_attributes(payload, _IFINFOMSG.size)
+    name = attributes.get(IFLA_IFNAME, b'').split(b'\0', 1)[0].decode()
+    operstate = attributes.get(IFLA_OPERSTATE, b'\0')[0]
+    return Link(
+        index=index,
+        name=name,
+        flags=flags,
+        address=_format_mac(attributes.get(IFLA_ADDRESS, b'')),
+        perm_address=_format_mac(attributes.get(IFLA_PERM_ADDRESS, b'')),
+        operstate=OPERSTATES[operstate] if operstate < len(OPERSTATES)
+        else 'unknown',
+    )
+
+
+class Netlink:
+    """
+    A ``NETLINK_ROUTE`` socket.
+
+    .. code-block:: python
+
+        from crucible.network.netlink import Netlink
+
+        with Netlink() as netlink:
+            for link in netlink.links():
+                print(link.name, link.perm_address)
+    """
+
+    def __init__(self) -> None:
+        """
+        Opens the netlink socket.
+
+        :raises OSError: When the platform does not support netlink.
+        """
+        self._socket = socket.socket(
+            socket.AF_NETLINK,
+            socket.SOCK_RAW | socket.SOCK_CLOEXEC,
+            NETLINK_ROUTE,
+        )
+        self._socket.bind((0, 0))
+        self._seq = count(1)
+
+    def __enter__(self) -> 'Netlink':
+        """
+        Context manager entry.
+        """
+        return self
+
+    def __exit__(self, *_) -> None:
+        """
+        Context manager exit, closes the socket.
+        """
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the netlink socket.
+        """
+        self._socket.close()
+
+    def _send(self, msg_type: int, flags: int, payload: bytes) -> int:
+        """
+        Sends a single request.
+
+        :param msg_type: The ``RTM_*`` message type.
+        :param flags: The ``NLM_F_*`` flags.
+        :param payload: The message body.
+        :returns: The sequence number of the request.
+        """
+        seq = next(self._seq)
+        header = _NLMSGHDR.pack(
+            _NLMSGHDR.size + len(payload),
+            msg_type,
+            flags | NLM_F_REQUEST,
+            seq,
+            0,
+        )
+        self._socket.send(header + payload)
+        return seq
+
+    def _receive(self, seq: int) -> list:
+        """
+        Collects every reply to a request.
+
+        Reads until the kernel signals the end of a dump, or until a single
+        (non-multipart) reply or acknowledgement arrives.
+
+        :param seq: Sequence number of the request.
+        :raises NetlinkError: When the kernel answers with an error.
+        :returns: A list of ``(type, payload)`` tuples.
+        """
+        replies = []
+        while True:
+            data = self._socket.recv(_RECV_SIZE)
+            for msg_type, flags, msg_seq, payload in parse_messages(data):
+                if msg_seq != seq:
+                    continue
+                if msg_type == NLMSG_DONE:
+                    return replies
+                if msg_type == NLMSG_ERROR:
+                    error, = _NLMSGERR.unpack_from(payload)
+                    if error:
+                        raise NetlinkError(
+                            f'Netlink request {seq} failed: '
+                            f'{errno.errorcode.get(-error, -error)}'
+                        )
+                    return replies
+                replies.append((msg_type, payload))
+                if not flags & NLM_F_MULTI:
+                    return replies
+
+    def links(self) -> list[Link]:
+        """
+        Dumps every link known to the kernel.
+        """
+        payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        seq = self._send(RTM_GETLINK, NLM_F_DUMP, payload)
+        links = []
+        for msg_type, reply in self._receive(seq):
+            if msg_type == RTM_NEWLINK:
+                links.append(parse_link(reply))
+        return links
+
+    def set_link(
+            self,
+            index: int,
+            name: str = None,
+            up: bool = None,
+    ) -> None:
+        # pylint: disable=invalid-name
+        """
+        Renames a link and/or sets it up or down, waiting for the kernel to
+        acknowledge the change.
+
+        :param index: Index of the link to change.
+        :param name: New name for the link.
+        :param up: ``True`` to set the link up, ``False`` to set it down.
+        :raises NetlinkError: When the kernel rejects the change.
+        """
+        flags = 0
+        change = 0
+        if up is not None:
+            change = IFF_UP
+            flags = IFF_UP if up else 0
+        payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, index, flags, change)
+        if name is not None:
+            attribute = name.encode() + b'\0'
+            length = _RTATTR.size + len(attribute)
+            payload += _RTATTR.pack(length, IFLA_IFNAME) + attribute
+            payload += b'\0' * (_align(length) - length)
+        seq = self._send(RTM_SETLINK, NLM_F_ACK, payload)
+        self._receive(seq)
+
+
+def dump_links() -> dict:
+    """
+    Returns every link on the system, keyed by name.
+
+    Returns an empty dictionary if netlink is not available, callers are
+    expected to fall back to another means of discovery.
+    """
+    try:
+        with Netlink() as netlink:
+            links = netlink.links()
+    except (OSError, AttributeError, NetlinkError) as error:
+        LOG.warning('Could not dump links over netlink: %s', error)
+        return {}
+    return {link.name: link for link in links}
+
+
+def parse_uevent(data: bytes) -> dict:
+    """
+    Parses a kernel uevent.
+
+    Kernel uevents are a ``ACTION@DEVPATH`` header followed by ``KEY=VALUE``
+    pairs, all NUL terminated. Messages re-broadcast by ``udevd`` (which
+    start with ``libudev``) are ignored.
+
+    :param data: The raw uevent.
+    :returns: The uevent's keys and values, or an empty dictionary.
+    """
+    if data.startswith(b'libudev'):
+        return {}
+    event = {}
+    for field in data.split(b'\0')[1:]:
+        key, separator, value = field.partition(b'=')
+        if separator:
+            event[key.decode(errors='replace')] = \
+                value.decode(errors='replace')
+    return event
+
+
+class UeventMonitor:
+    """
+    Listens to the kernel's uevent multicast group.
+
+    .. code-block:: python
+
+        from crucible.network.netlink import UeventMonitor
+
+        with UeventMonitor() as monitor:
+            events = monitor.collect(
+                lambda event: event.get('SUBSYSTEM') == 'net',
+                debounce=2,
+            )
+    """
+
+    def __init__(self) -> None:
+        """
+        Opens the uevent socket.
+
+        :raises OSError: When the platform does not support netlink.
+        """
+        self._socket = socket.socket(
+            socket.AF_NETLINK,
+            socket.SOCK_DGRAM | socket.SOCK_CLOEXEC,
+            NETLINK_KOBJECT_UEVENT,
+        )
+        self._socket.bind((0, UEVENT_KERNEL_GROUP))
+
+    def __enter__(self) -> 'UeventMonitor':
+        """
+        Context manager entry.
+        """
+        return self
+
+    def __exit__(self, *_) -> None:
+        """
+        Context manager exit, closes the socket.
+        """
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the uevent socket.
+        """
+        self._socket.close()
+
+    def receive(self, timeout: float = None) -> [dict, None]:
+        """
+        Waits for the next uevent.
+
+        :param timeout: Seconds to wait, or ``None`` to wait forever.
+        :returns: The parsed uevent, or ``None`` if none arrived in time.
+        """
+        readable, _, _ = select.select([self._socket], [], [], timeout)
+        if not readable:
+            return None
+        return parse_uevent(self._socket.recv(_RECV_SIZE))
+
+    def collect(self, predicate, debounce: float) -> list[dict]:
+        """
+        Waits for a matching uevent, then keeps collecting matching uevents
+        until none arrived for ``debounce`` seconds, so that a burst (e.g. a
+        card with several ports, or SR-IOV VFs being created) is handled at
+        once.
+
+        :param predicate: Callable returning whether an event is wanted.
+        :param debounce: Seconds of quiet that end a burst.
+        :returns: The matching uevents.
+        """
+        events = []
+        deadline = None
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0)
+            event = self.receive(timeout)
+            if event is not None and predicate(event):
+                LOG.info('Received uevent: %s', event)
+                events.append(event)
+                deadline = time.monotonic() + debounce
+            elif deadline is not None and time.monotonic() >= deadline:
+                return events
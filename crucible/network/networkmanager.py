@@ -24,11 +24,15 @@
 """
 Module for handling ``sysconfig`` based network managers.
 """
+import os
+
 import click
 
+from crucible.network.manager import CREATED
 from crucible.network.manager import SystemNetwork
 
 from crucible.os import run_command
+from crucible.os import run_commands
 from crucible.logger import Logger
 
 LOG = Logger(__name__)
@@ -65,16 +69,47 @@ class NetworkManager(SystemNetwork):
         """
         Loads new network interface configuration.
         """
-        result = run_command(['nmcli', 'connection', 'reload', self.interface.name])
-        LOG.debug(vars(result))
-        result = run_command(['nmcli', 'connection', 'up', self.interface.name])
-        LOG.debug(vars(result))
-        result = run_command(['ip', 'l', 'show', self.interface.name])
-        if result.return_code != 0:
-            LOG.error('Failed to reload %s', self.interface.name)
-            LOG.warning(vars(result))
-        else:
+        self.reload_interfaces([self.interface.name])
+
+    def connection_file(self, name: str) -> str:
+        """
+        Returns the path of a connection's keyfile.
+        :param name: Name of the connection.
+        """
+        return os.path.join(self.install_location, f'{name}.nmconnection')
+
+    def reload_interfaces(self, names: list) -> None:
+        """
+        Loads new configuration for several interfaces, loading the
+        interfaces' connection files (and no other connection on the host)
+        with one ``nmcli connection load``, then bringing each connection up
+        in order.
+        :param names: Names of the interfaces, in the order to load them.
+        """
+        files = [
+            self.connection_file(name) for name in names
+            if os.path.exists(self.connection_file(name))
+        ]
+        if files:
+            result = run_command(['nmcli', 'connection', 'load'] + files)
             LOG.debug(vars(result))
+        for name in names:
+            result = run_command(['nmcli', 'connection', 'up', name])
+            LOG.debug(vars(result))
+        results = run_commands([['ip', 'l', 'show', name] for name in names])
+        for name, result in zip(names, results):
+            if result.return_code != 0:
+                LOG.warning(vars(result))
+                LOG.error(
+                    'Failed to reload %s',
+                    name,
+                    extra={
+                        'interface': name,
+                        'return_code': result.return_code,
+                    },
+                )
+            else:
+                LOG.debug(vars(result))
 
     def remove_config(self) -> None:
         """
@@ -84,10 +119,16 @@ class NetworkManager(SystemNetwork):
         LOG.debug(vars(result))
         self.reload_interface()
 
-    def write_config(self) -> None:
+    def write_config(self, overwrite: bool = False) -> str:
         """
-        Write a string to file, prompting the user to overwrite if the file
-        already exists.
+        Adds the interface's connection (and a connection for each member of
+        a bond) with ``nmcli connection add``.
+
+        Unlike ``Wicked.write_config``, the new connection is not compared
+        with an existing one, so this never returns ``UNCHANGED`` or
+        ``UPDATED`` and the interface is always reloaded.
+        :param overwrite: Unused, nothing is prompted for.
+        :returns: ``CREATED``, connections are always added.
         """
         args = ['nmcli', 'connection', 'add', 'con-name']
         if self.interface.dhcp:
@@ -132,16 +173,19 @@ class NetworkManager(SystemNetwork):
             ] + ip_args
             result = run_command(interface_args)
             LOG.debug(vars(result))
-            for member in self.interface.members:
-                interface_args = args + [
+            member_results = run_commands([
+                args + [
                     member,
                     'type', 'ethernet',
                     'ifname', member,
                     'master', self.interface.name,
                     'ethernet.mtu', self.interface.mtu,
-                ]
-                result = run_command(interface_args)
-                LOG.debug(vars(result))
+                ] for member in self.interface.members
+            ])
+            for member_result in member_results:
+                LOG.debug(vars(member_result))
+                if member_result.return_code != 0:
+                    result = member_result
         else:
             interface_args = args + [
                 self.interface.name,
@@ -157,3 +201,4 @@ class NetworkManager(SystemNetwork):
             LOG.debug(vars(result))
             click.echo(f'Created connection for: {self.interface.name}')
         click.echo('See `nmcli connection` for status.')
+        return CREATED
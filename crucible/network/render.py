@@ -0,0 +1,149 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Shared registry for the Jinja templates in ``templates/``.
+
+Every template is loaded through one process-wide ``jinja2.Environment``,
+so each template is parsed and compiled at most once per process no matter
+how many interfaces are rendered. Compiled templates are also cached as
+bytecode under ``/var/cache/crucible`` (when writable) for the next process.
+
+Templates may also be precompiled into Python modules at build time (see
+``compile_templates``), these are preferred when present so that a read-only
+image never compiles a template.
+
+.. note::
+   Precompiled templates take precedence over the ``.j2`` files; re-run
+   ``make templates`` (or remove ``templates/compiled``) after editing a
+   template.
+"""
+import functools
+import os
+import sys
+
+import jinja2
+from j2ipaddr import filters
+
+from crucible.logger import Logger
+
+LOG = Logger(__name__)
+
+TEMPLATE_DIRECTORY = os.path.join(os.path.dirname(__file__), 'templates')
+COMPILED_DIRECTORY = os.path.join(TEMPLATE_DIRECTORY, 'compiled')
+BYTECODE_CACHE_DIRECTORY = '/var/cache/crucible/jinja'
+
+
+def _bytecode_cache() -> [jinja2.FileSystemBytecodeCache, None]:
+    """
+    Returns a bytecode cache in ``BYTECODE_CACHE_DIRECTORY``, or ``None`` if
+    the directory can not be created or written to.
+    """
+    try:
+        os.makedirs(BYTECODE_CACHE_DIRECTORY, mode=0o700, exist_ok=True)
+    except OSError as error:
+        LOG.info('Not caching template bytecode: %s', error)
+        return None
+    if not os.access(BYTECODE_CACHE_DIRECTORY, os.W_OK | os.X_OK):
+        LOG.info('Not caching template bytecode, %s is not writable.',
+                 BYTECODE_CACHE_DIRECTORY)
+        return None
+    return jinja2.FileSystemBytecodeCache(BYTECODE_CACHE_DIRECTORY)
+
+
+def _new_environment(
+        loader: jinja2.BaseLoader,
+        bytecode_cache: jinja2.BytecodeCache = None,
+) -> jinja2.Environment:
+    """
+    Creates an environment with crucible's settings and filters.
+
+    Templates are compiled against these settings, so the environment used
+    to precompile templates must match the one that renders them.
+
+    :param loader: The template loader.
+    :param bytecode_cache: An optional bytecode cache.
+    """
+    env = jinja2.Environment(
+        loader=loader,
+        keep_trailing_newline=True,
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+    )
+    env.filters.update(filters.load_all())
+    return env
+
+
+@functools.lru_cache(maxsize=None)
+def environment() -> jinja2.Environment:
+    """
+    Returns the process-wide template environment.
+    """
+    loaders = []
+    if os.path.isdir(COMPILED_DIRECTORY):
+        LOG.info('Using precompiled templates from %s', COMPILED_DIRECTORY)
+        loaders.append(jinja2.ModuleLoader(COMPILED_DIRECTORY))
+    loaders.append(jinja2.FileSystemLoader(TEMPLATE_DIRECTORY))
+    return _new_environment(
+        jinja2.ChoiceLoader(loaders),
+        bytecode_cache=_bytecode_cache(),
+    )
+
+
+def get_template(name: str) -> jinja2.Template:
+    """
+    Returns a loaded template.
+
+    :param name: Path of the template, relative to ``templates/``.
+    """
+    return environment().get_template(name)
+
+
+def render(name: str, **context) -> str:
+    """
+    Renders a template.
+
+    :param name: Path of the template, relative to ``templates/``.
+    :param context: Variables for the template.
+    """
+    return get_template(name).render(**context)
+
+
+def compile_templates(target: str = COMPILED_DIRECTORY) -> None:
+    """
+    Precompiles every template into Python modules.
+
+    :param target: Directory to write the compiled templates to.
+    """
+    env = _new_environment(jinja2.FileSystemLoader(TEMPLATE_DIRECTORY))
+    env.compile_templates(
+        target,
+        extensions=['j2'],
+        zip=None,
+        ignore_errors=False,
+        log_function=LOG.info,
+    )
+
+
+if __name__ == '__main__':
+    compile_templates(*sys.argv[1:2])
@@ -24,19 +24,446 @@
 """
 Module for handling ``sysconfig`` based network managers.
 """
+import hashlib
+import json
 import re
 import os
 import sys
 
 import click
 
+from crucible.network.manager import CREATED
+from crucible.network.manager import Interface
+from crucible.network.manager import InterfaceError
+from crucible.network.manager import kind
 from crucible.network.manager import SystemNetwork
+from crucible.network.manager import UNCHANGED
+from crucible.network.manager import UPDATED
 
+from crucible.os import atomic_write
+from crucible.os import cache_file_path
+from crucible.os import read_cache_file
 from crucible.os import run_command
+from crucible.os import run_commands
+from crucible.os import write_cache_file
 from crucible.logger import Logger
 
 LOG = Logger(__name__)
 
+ASSIGNMENT = re.compile(r'^(?P<key>[A-Za-z_][A-Za-z0-9_]*)=(?P<value>.*)$')
+VALUE = re.compile(
+    r'^(?P<value>"(?:[^"\\]|\\.)*"|\'[^\']*\'|\S*)(?P<trailer>.*)$'
+)
+BONDING_SLAVE = re.compile(r'^BONDING_SLAVE_?(?P<index>\d+)$')
+BACKUP_SUFFIXES = ('~', '.bak', '.old', '.orig', '.rpmnew', '.rpmsave')
+
+CACHE_VERSION = 2
+
+_indexes = {}
+
+
+def _unquote(value: str) -> str:
+    """
+    Returns a value without its surrounding quotes.
+
+    :param value: A value as written in a sysconfig file.
+    """
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'':
+        if value[0] == "'":
+            return value[1:-1]
+        return re.sub(r'\\(["\\$`])', r'\1', value[1:-1])
+    return value
+
+
+def _quote(value: str) -> str:
+    """
+    Returns a value in double quotes, as written in a sysconfig file.
+
+    :param value: The value.
+    """
+    return '"' + re.sub(r'(["\\$`])', r'\\\1', value) + '"'
+
+
+def _status(path: str, content: str) -> str:
+    """
+    Returns whether writing content to a file would create, update, or leave
+    the file unchanged, by comparing the hashes of their content.
+
+    :param path: The file to compare to.
+    :param content: The content that would be written.
+    """
+    try:
+        with open(path, 'rb') as current_file:
+            current = hashlib.sha256(current_file.read()).digest()
+    except FileNotFoundError:
+        return CREATED
+    if current == hashlib.sha256(content.encode('utf-8')).digest():
+        return UNCHANGED
+    return UPDATED
+
+
+class SysconfigFile:
+
+    """
+    A sysconfig file of ``KEY="value"`` lines, e.g.
+    ``/etc/sysconfig/network/config``. Keys are read and set in place;
+    comments, blank lines, and the order of the keys are kept as they are.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Path to the file.
+        """
+        self.path = path
+        self.changed = False
+        with open(path, 'r', encoding='utf-8') as sysconfig_file:
+            self.lines = sysconfig_file.readlines()
+        self.keys = {}
+        for index, line in enumerate(self.lines):
+            match = ASSIGNMENT.match(line.strip())
+            if match:
+                self.keys[match.group('key')] = index
+
+    def _value(self, key: str) -> re.Match:
+        """
+        Returns the value of a key as written, and whatever follows it on its
+        line (e.g. a ``# comment``).
+        :param key: The key.
+        :raises KeyError: When the key is not set in the file.
+        """
+        match = ASSIGNMENT.match(self.lines[self.keys[key]].strip())
+        return VALUE.match(match.group('value'))
+
+    def __getitem__(self, key: str) -> str:
+        """
+        Returns the (unquoted) value of a key.
+        :param key: The key.
+        :raises KeyError: When the key is not set in the file.
+        """
+        return _unquote(self._value(key).group('value'))
+
+    def items(self) -> dict:
+        """
+        Returns every key of the file with its (unquoted) value.
+        """
+        return {key: self[key] for key in self.keys}
+
+    def update(self, values: dict) -> bool:
+        """
+        Sets keys, appending those that are not in the file yet. A comment
+        after a key's value is kept.
+        :param values: The keys and their new values.
+        :returns: Whether any value changed.
+        :raises ValueError: When a key is not a valid name.
+        """
+        changed = False
+        for key, value in values.items():
+            if not ASSIGNMENT.match(f'{key}='):
+                raise ValueError(f'Invalid sysconfig key [{key}]')
+            value = str(value)
+            line = f'{key}={_quote(value)}\n'
+            if key in self.keys:
+                if self[key] == value:
+                    continue
+                trailer = self._value(key).group('trailer')
+                self.lines[self.keys[key]] = \
+                    f'{key}={_quote(value)}{trailer}\n'
+            else:
+                if self.lines and not self.lines[-1].endswith('\n'):
+                    self.lines[-1] += '\n'
+                self.keys[key] = len(self.lines)
+                self.lines.append(line)
+            changed = True
+        self.changed = self.changed or changed
+        return changed
+
+    def write(self) -> None:
+        """
+        Writes the file atomically, if anything changed.
+        """
+        if self.changed:
+            atomic_write(self.path, ''.join(self.lines))
+            self.changed = False
+
+
+def _members(ifcfg: dict) -> str:
+    """
+    Returns the comma delimited members of an interface: the parent of a
+    VLAN, the NICs of a bond, or the ports of a bridge.
+
+    :param ifcfg: The keys and values of the ``ifcfg`` file.
+    """
+    members = []
+    if ifcfg.get('ETHERDEVICE'):
+        members.append(ifcfg['ETHERDEVICE'])
+    slaves = sorted(
+        (int(match.group('index')), value) for match, value in (
+            (BONDING_SLAVE.match(key), value) for key, value in ifcfg.items()
+        ) if match and value
+    )
+    members.extend(value for _, value in slaves)
+    members.extend(ifcfg.get('BRIDGE_PORTS', '').split())
+    return ','.join(members)
+
+
+def _interface(name: str, ifcfg: dict, routes: list) -> Interface:
+    """
+    Returns the interface described by an ``ifcfg`` file and the lines of its
+    ``ifroute`` file.
+
+    :param name: Name of the interface.
+    :param ifcfg: The keys and values of the ``ifcfg`` file.
+    :param routes: The route lines of the ``ifroute`` file.
+    :raises InterfaceError: When the interface is illegal.
+    """
+    # An unset MTU stays unset, rather than taking Interface's default.
+    options = {'interface': name, 'cidr': None, 'mtu': None}
+    if ifcfg.get('BOOTPROTO', 'static').startswith('dhcp'):
+        options['dhcp'] = True
+    elif ifcfg.get('IPADDR'):
+        cidr = ifcfg['IPADDR']
+        prefix = ifcfg.get('PREFIXLEN') or ifcfg.get('NETMASK')
+        if '/' not in cidr and prefix:
+            cidr = f'{cidr}/{prefix}'
+        options['cidr'] = cidr
+    else:
+        options['noip'] = True
+    options['members'] = _members(ifcfg)
+    if ifcfg.get('BONDING_MODULE_OPTS'):
+        options['bond_opts'] = {}
+        for option in ifcfg['BONDING_MODULE_OPTS'].split():
+            key, _, value = option.partition('=')
+            options['bond_opts'][key] = int(value) if value.isdigit() \
+                else value
+    try:
+        if ifcfg.get('VLAN_ID'):
+            options['vlan_id'] = int(ifcfg['VLAN_ID'])
+        if ifcfg.get('MTU'):
+            options['mtu'] = int(ifcfg['MTU'])
+    except ValueError as error:
+        raise InterfaceError(f'Invalid number in ifcfg-{name}: {error}') \
+            from error
+    for route in routes:
+        fields = route.split()
+        if fields[0] == 'default':
+            options['default'] = True
+            if len(fields) > 1 and fields[1] != '-':
+                options['gateway'] = fields[1]
+    return Interface(**options)
+
+
+def _signature(directory: str) -> list:
+    """
+    Returns the state of a directory's ``ifcfg-*`` and ``ifroute-*`` files:
+    the directory's modification time, and the name, modification time, and
+    size of each file. Backup files (e.g. ``ifcfg-em1.rpmsave``) and ``lo``
+    are skipped.
+
+    :param directory: The directory, e.g. ``/etc/sysconfig/network``.
+    :raises OSError: When the directory can not be read.
+    """
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            prefix, _, name = entry.name.partition('-')
+            if prefix not in ('ifcfg', 'ifroute') or not name \
+                    or name == 'lo' or name.endswith(BACKUP_SUFFIXES) \
+                    or not entry.is_file():
+                continue
+            stat = entry.stat()
+            files.append([entry.name, stat.st_mtime_ns, stat.st_size])
+    return [os.stat(directory).st_mtime_ns, sorted(files)]
+
+
+def _read_directory(directory: str, signature: list) -> dict:
+    """
+    Reads the ``ifcfg-*`` and ``ifroute-*`` files of a directory, returning
+    the keys of each ``ifcfg`` file and the route lines of its ``ifroute``
+    file by interface name.
+
+    :param directory: The directory, e.g. ``/etc/sysconfig/network``.
+    :param signature: The state of the files to read, see ``_signature``.
+    """
+    configurations = {}
+    routes = {}
+    for file_name, _, _ in signature[1]:
+        prefix, _, name = file_name.partition('-')
+        path = os.path.join(directory, file_name)
+        if prefix == 'ifcfg':
+            configurations[name] = SysconfigFile(path).items()
+            continue
+        with open(path, 'r', encoding='utf-8') as ifroute_file:
+            routes[name] = [
+                line.strip() for line in ifroute_file
+                if line.strip() and not line.lstrip().startswith('#')
+            ]
+    return {
+        name: (ifcfg, routes.get(name, []))
+        for name, ifcfg in configurations.items()
+    }
+
+
+def _read_cache(directory: str, signature: list) -> [dict, None]:
+    """
+    Returns the cached files of a directory, or ``None`` if the cache is
+    missing, unreadable, or was made for another state of the directory.
+
+    :param directory: The directory.
+    :param signature: The state of the directory, see ``_signature``.
+    """
+    content = read_cache_file(cache_file_path('ifcfg', directory, '.json'))
+    if content is None:
+        return None
+    try:
+        cache = json.loads(content)
+    except ValueError as error:
+        LOG.info('Could not read ifcfg cache of %s: %s', directory, error)
+        return None
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION \
+            or cache.get('directory') != directory \
+            or cache.get('signature') != signature:
+        return None
+    return cache.get('files')
+
+
+class InterfaceIndex:
+
+    """
+    The interfaces configured in a directory of ``ifcfg-*`` and
+    ``ifroute-*`` files, indexed by name, parent, VLAN ID, and IP address.
+    """
+
+    def __init__(self, interfaces: list[Interface]) -> None:
+        """
+        :param interfaces: The interfaces, in the order to list them.
+        """
+        self.interfaces = interfaces
+        self.by_name = {}
+        self.by_parent = {}
+        self.by_vlan_id = {}
+        self.by_ip = {}
+        for interface in interfaces:
+            self.by_name[interface.name] = interface
+            for member in filter(None, interface.members):
+                self.by_parent.setdefault(member, []).append(interface)
+            if interface.vlan_id:
+                self.by_vlan_id.setdefault(
+                    interface.vlan_id, []
+                ).append(interface)
+            if interface.ipaddr is not None:
+                self.by_ip.setdefault(
+                    str(interface.ipaddr.ip), []
+                ).append(interface)
+
+    def __iter__(self):
+        """
+        Iterates over the interfaces.
+        """
+        return iter(self.interfaces)
+
+    def __len__(self) -> int:
+        """
+        The number of interfaces.
+        """
+        return len(self.interfaces)
+
+    def find(
+            self,
+            names: list = None,
+            parent: str = None,
+            vlan_id: int = None,
+            ip: str = None,
+    ) -> list[Interface]:
+        """
+        Returns the interfaces matching every given filter, in order.
+
+        :param names: Names of the interfaces.
+        :param parent: Name of an interface that the interfaces are built on,
+                       e.g. the NIC of a bond or the bond of a VLAN.
+        :param vlan_id: A VLAN ID.
+        :param ip: An IP address (without a prefix).
+        """
+        matches = [set(map(id, self.interfaces))]
+        if names:
+            matches.append(
+                {id(self.by_name[name]) for name in names
+                 if name in self.by_name}
+            )
+        if parent is not None:
+            matches.append(set(map(id, self.by_parent.get(parent, []))))
+        if vlan_id is not None:
+            matches.append(set(map(id, self.by_vlan_id.get(vlan_id, []))))
+        if ip is not None:
+            matches.append(set(map(id, self.by_ip.get(ip, []))))
+        found = set.intersection(*matches)
+        return [
+            interface for interface in self.interfaces
+            if id(interface) in found
+        ]
+
+
+def read_interfaces(directory: str) -> InterfaceIndex:
+    """
+    Returns the indexed interfaces of a directory of ``ifcfg-*`` and
+    ``ifroute-*`` files.
+
+    The files are parsed once per state of the directory; the result is
+    kept in memory and in a cache file in ``crucible.os.RUN_DIRECTORY`` for
+    as long as the directory's modification time, and the modification time
+    and size of each file, are unchanged (see ``_signature``). Only the
+    files are stat'ed to check this, not read.
+
+    :param directory: The directory, e.g. ``/etc/sysconfig/network``.
+    :raises OSError: When the directory can not be read.
+    """
+    signature = _signature(directory)
+    if _indexes.get(directory, (None,))[0] == signature:
+        return _indexes[directory][1]
+    files = _read_cache(directory, signature)
+    if files is None:
+        LOG.info('Reading ifcfg files in: %s', directory)
+        files = _read_directory(directory, signature)
+        write_cache_file(
+            cache_file_path('ifcfg', directory, '.json'),
+            json.dumps({
+                'version': CACHE_VERSION,
+                'directory': directory,
+                'signature': signature,
+                'files': files,
+            }),
+        )
+    interfaces = []
+    for name in sorted(files):
+        try:
+            interfaces.append(_interface(name, *files[name]))
+        except (InterfaceError, ValueError) as error:
+            LOG.warning('Skipping ifcfg-%s: %s', name, error)
+    index = InterfaceIndex(interfaces)
+    _indexes[directory] = (signature, index)
+    return index
+
+
+def describe(interface: Interface) -> dict:
+    """
+    Returns an interface as a dictionary of plain values, e.g. for JSON.
+
+    :param interface: The interface.
+    """
+    return {
+        'name': interface.name,
+        'kind': kind(interface),
+        'bootproto': 'dhcp' if interface.dhcp else 'static',
+        'ip': str(interface.ipaddr) if interface.ipaddr is not None else None,
+        'members': [member for member in interface.members if member],
+        'vlan_id': interface.vlan_id,
+        'mtu': interface.mtu,
+        'default': interface.is_default_route,
+        'gateway': str(interface.gateway)
+        if interface.is_default_route and hasattr(interface, 'gateway')
+        else None,
+    }
+
 
 class Sysconfig(SystemNetwork):
 
@@ -64,43 +491,52 @@ class Sysconfig(SystemNetwork):
         """
         Updates the DNS of the running system.
         """
-        config_path = os.path.join(self.install_location, 'config')
-        dns_regex = re.compile(r'(^NETCONFIG_DNS_STATIC_SERVERS=)["\'].*["\']')
-        with open(config_path, 'r', encoding='utf-8') as config:
-            content = config.readlines()
-        new_content = []
-        new_dns = " ".join(self._dns)
-        for line in content:
-            try:
-                new_content.append(dns_regex.sub(fr'\g<1>"{new_dns}"', line))
-            except re.error:
-                new_content.append(line)
-        with open(config_path, 'w', encoding='utf-8') as config:
-            config.writelines(new_content)
-        self._update_resolv()
+        self._write_system({
+            'NETCONFIG_DNS_STATIC_SERVERS': ' '.join(self._dns),
+        })
 
     def update_search(self) -> None:
         """
         Updates the search domains of the running system.
         """
-        config_path = os.path.join(self.install_location, 'config')
-        search_regex = re.compile(
-            r'(^NETCONFIG_DNS_STATIC_SEARCHLIST=)["\'].*["\']'
-        )
-        with open(config_path, 'r', encoding='utf-8') as config:
-            content = config.readlines()
-        new_content = []
-        new_search = " ".join(self._search)
-        for line in content:
-            try:
-                new_content.append(
-                    search_regex.sub(fr'\g<1>"{new_search}"', line)
-                )
-            except re.error:
-                new_content.append(line)
-        with open(config_path, 'w', encoding='utf-8') as config:
-            config.writelines(new_content)
+        self._write_system({
+            'NETCONFIG_DNS_STATIC_SEARCHLIST': ' '.join(self._search),
+        })
+
+    def update_system(self, **values) -> bool:
+        """
+        Sets keys of the ``config`` file in one pass, along with the DNS
+        servers and search domains (if any were given), and updates
+        ``/etc/resolv.conf`` once if anything changed.
+        :param values: Keys to set, e.g. ``NETCONFIG_DNS_POLICY='auto'``.
+        :returns: Whether anything changed.
+        """
+        if any(self._dns):
+            values.setdefault(
+                'NETCONFIG_DNS_STATIC_SERVERS',
+                ' '.join(self._dns),
+            )
+        if any(self._search):
+            values.setdefault(
+                'NETCONFIG_DNS_STATIC_SEARCHLIST',
+                ' '.join(self._search),
+            )
+        return self._write_system(values)
+
+    def _write_system(self, values: dict) -> bool:
+        """
+        Sets only the given keys of the ``config`` file, and updates
+        ``/etc/resolv.conf`` if anything changed.
+        :param values: Keys to set.
+        :returns: Whether anything changed.
+        """
+        config = SysconfigFile(os.path.join(self.install_location, 'config'))
+        if not config.update(values):
+            LOG.info('%s is unchanged, not writing.', config.path)
+            return False
+        config.write()
         self._update_resolv()
+        return True
 
 
 class Wicked(Sysconfig):
@@ -124,9 +560,18 @@ class Wicked(Sysconfig):
         Loads new network interface configuration.
         :param force: Whether to also reload wickedd-nanny.
         """
-        run_command(['wicked', 'ifreload', self.interface.name])
-        result = run_command(['ip', 'l', 'show', self.interface.name])
-        if result.return_code != 0 or force:
+        self.reload_interfaces([self.interface.name], force=force)
+
+    def reload_interfaces(self, names: list, force: bool = False) -> None:
+        """
+        Loads new configuration for several interfaces with one
+        ``wicked ifreload``.
+        :param names: Names of the interfaces.
+        :param force: Whether to also reload wickedd-nanny.
+        """
+        run_command(['wicked', 'ifreload'] + names)
+        results = run_commands([['ip', 'l', 'show', name] for name in names])
+        if force or any(result.return_code != 0 for result in results):
             self._reload_nanny()
 
     def remove_config(self) -> None:
@@ -147,17 +592,27 @@ class Wicked(Sysconfig):
             LOG.info('%s not found, nothing to remove.', ifroute_file)
         self.reload_interface(self.interface.name)
 
-    def write_config(self) -> None:
+    def write_config(self, overwrite: bool = False) -> str:
         """
         Write a string to file, prompting the user to overwrite if the file
-        already exists.
+        already exists with other content. Files that would not change are
+        not written.
+        :param overwrite: Overwrite existing files without asking.
+        :returns: ``CREATED`` if there was no ``ifcfg`` file, ``UNCHANGED`` if
+                  no file changed, otherwise ``UPDATED``.
         """
+        statuses = []
         for config in ['ifcfg', 'ifroute']:
-            open_mode = 'w'
             config_path = os.path.join(
                 self.install_location, f'{config}-{self.interface.name}'
             )
-            if os.path.exists(config_path):
+            content = self._render_template(config)
+            status = _status(config_path, content)
+            statuses.append(status)
+            if status == UNCHANGED:
+                LOG.info('%s is unchanged, not writing.', config_path)
+                continue
+            if status == UPDATED and not overwrite:
                 LOG.warning('File [%s] already exists!', config_path)
                 choice = click.prompt(
                     f'An existing config file exists at {config_path}; '
@@ -170,7 +625,10 @@ class Wicked(Sysconfig):
                     click.echo('Exiting ... ')
                     sys.exit(0)
                 LOG.info('Writing %s-%s', config, self.interface.name)
-            content = self._render_template(config)
-            with open(config_path, open_mode, encoding='utf-8') as config_file:
-                config_file.write(content)
+            atomic_write(config_path, content)
             click.echo(f'Wrote {config_path}')
+        if statuses[0] == CREATED:
+            return CREATED
+        if all(status == UNCHANGED for status in statuses):
+            return UNCHANGED
+        return UPDATED
@@ -0,0 +1,274 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Model of the ``80-ifname.rules`` udev rule file.
+
+Rules are indexed by their ``ATTR{address}`` (MAC) and ``NAME``, so that
+rule files can be merged in linear time and conflicting rules (the same MAC
+with two names, or the same name for two MACs) are detected instead of both
+being written.
+"""
+import re
+
+from crucible.logger import Logger
+
+LOG = Logger(__name__)
+
+RULES_FILE = '80-ifname.rules'
+
+_ADDRESS = re.compile(r'ATTR\{address\}=="([^"]+)"')
+_NAME = re.compile(r'(?<![\w{])NAME:?="([^"]+)"')
+
+
+class Rule:
+    """
+    A single udev rule line.
+    """
+
+    def __init__(self, line: str) -> None:
+        """
+        :param line: The rule as written in the rules file.
+        """
+        self.line = line.strip()
+        address = _ADDRESS.search(self.line)
+        name = _NAME.search(self.line)
+        self.mac = address.group(1).lower() if address else ''
+        self.name = name.group(1) if name else ''
+
+    def __eq__(self, other: object) -> bool:
+        """
+        Rules are equal when their lines are.
+
+        :param other: The object being compared to.
+        """
+        return isinstance(other, Rule) and self.line == other.line
+
+    def __hash__(self) -> int:
+        """
+        Hash of the rule line.
+        """
+        return hash(self.line)
+
+    def __str__(self) -> str:
+        """
+        The rule line.
+        """
+        return self.line
+
+
+class RuleSet:
+    """
+    The rules of a udev rule file, indexed by MAC and by interface name.
+
+    Lines that are not naming rules (comments, other rules) are kept as-is
+    and written before the naming rules.
+    """
+
+    def __init__(self) -> None:
+        """
+        Creates an empty rule set.
+        """
+        self.by_mac = {}
+        self.by_name = {}
+        self.other = {}
+
+    @classmethod
+    def parse(cls, text: str) -> 'RuleSet':
+        """
+        Parses the content of a rule file.
+
+        :param text: The rule file's content.
+        """
+        rule_set = cls()
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            rule = Rule(line)
+            if rule.mac and rule.name:
+                rule_set.add(rule)
+            else:
+                rule_set.other[line] = None
+        return rule_set
+
+    def __len__(self) -> int:
+        """
+        Number of naming rules.
+        """
+        return len(self.by_mac)
+
+    def __iter__(self):
+        """
+        Iterates over the naming rules.
+        """
+        return iter(self.by_mac.values())
+
+    def __contains__(self, rule: Rule) -> bool:
+        """
+        Whether exactly this rule is present.
+
+        :param rule: The rule to look for.
+        """
+        return self.by_mac.get(rule.mac) == rule
+
+    def __eq__(self, other: object) -> bool:
+        """
+        Rule sets are equal when they hold the same rules and other lines.
+
+        :param other: The object being compared to.
+        """
+        return isinstance(other, RuleSet) \
+            and self.by_mac == other.by_mac \
+            and list(self.other) == list(other.other)
+
+    def issuperset(self, other: 'RuleSet') -> bool:
+        """
+        Whether every naming rule of ``other`` is already present.
+
+        :param other: The rules to look for.
+        """
+        return all(rule in self for rule in other)
+
+    def add(self, rule: Rule) -> list[Rule]:
+        """
+        Adds a naming rule, replacing any rule for the same MAC or the same
+        name.
+
+        :param rule: The rule to add.
+        :returns: The rules that were replaced because they collided.
+        """
+        collisions = []
+        for existing in (self.by_mac.get(rule.mac),
+                         self.by_name.get(rule.name)):
+            if existing is None or existing == rule \
+                    or existing in collisions:
+                continue
+            collisions.append(existing)
+            del self.by_mac[existing.mac]
+            del self.by_name[existing.name]
+        self.by_mac[rule.mac] = rule
+        self.by_name[rule.name] = rule
+        return collisions
+
+    def merge(self, other: 'RuleSet') -> list[tuple[Rule, Rule]]:
+        """
+        Merges another rule set into this one; rules from ``other`` win when
+        they collide with a rule in this set.
+
+        :param other: The rules to merge in.
+        :returns: ``(replaced, replacement)`` pairs for every collision.
+        """
+        collisions = []
+        for line in other.other:
+            self.other[line] = None
+        for rule in other:
+            for replaced in self.add(rule):
+                LOG.warning(
+                    'udev rule collision, replacing [%s] with [%s]',
+                    replaced,
+                    rule,
+                )
+                collisions.append((replaced, rule))
+        return collisions
+
+    def render(self) -> str:
+        """
+        Renders the rule file.
+        """
+        lines = list(self.other)
+        lines.extend(sorted(rule.line for rule in self))
+        return '\n'.join(lines) + '\n'
+
+
+class Plan:
+    """
+    The changes needed to converge a node's NIC names and udev rules.
+    """
+
+    def __init__(self) -> None:
+        """
+        Creates an empty plan.
+        """
+        self.renames = []
+        self.add_rules = []
+        self.delete_rules = []
+
+    def __bool__(self) -> bool:
+        """
+        Whether the plan has any changes.
+        """
+        return bool(self.renames or self.add_rules or self.delete_rules)
+
+    @property
+    def rules_changed(self) -> bool:
+        """
+        Whether the plan changes the udev rule file.
+        """
+        return bool(self.add_rules or self.delete_rules)
+
+    def to_dict(self) -> dict:
+        """
+        The plan as a JSON serializable dictionary.
+        """
+        return {
+            'renames': [
+                {'mac': mac, 'from': old, 'to': new}
+                for mac, old, new in self.renames
+            ],
+            'add_rules': [str(rule) for rule in self.add_rules],
+            'delete_rules': [str(rule) for rule in self.delete_rules],
+        }
+
+
+def plan_rules(
+        plan: Plan,
+        desired: RuleSet,
+        existing: RuleSet,
+        overwrite: bool = False,
+) -> Plan:
+    """
+    Adds the rule changes needed to turn ``existing`` into ``desired`` to a
+    plan.
+
+    :param plan: The plan to add to.
+    :param desired: The rules the node should have.
+    :param existing: The rules the node has.
+    :param overwrite: Whether existing rules that are not desired are deleted,
+                      otherwise only rules colliding with a desired rule are.
+    """
+    deleted = {}
+    for rule in desired:
+        if rule in existing:
+            continue
+        plan.add_rules.append(rule)
+        for old in (existing.by_mac.get(rule.mac),
+                    existing.by_name.get(rule.name)):
+            if old is not None:
+                deleted[old] = None
+    if overwrite:
+        for rule in existing:
+            if desired.by_mac.get(rule.mac) != rule:
+                deleted[rule] = None
+    plan.delete_rules.extend(deleted)
+    return plan
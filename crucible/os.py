@@ -29,21 +29,158 @@ Module for handling command line calls.
    ``run_command``.
 
 """
+# pylint: disable=too-many-lines
+import asyncio
+import atexit
+import base64
+import dataclasses
+import hashlib
+import json
+import selectors
+import shlex
+import shutil
 import sys
+import threading
 
 from contextlib import contextmanager
+from time import sleep
 from time import time
+from subprocess import DEVNULL
 from subprocess import PIPE
 from subprocess import Popen
 import os
 import platform
+import tempfile
 
+from crucible import trace
 from crucible.logger import Logger
 
 LOG = Logger(__file__)
 
+DEFAULT_CONCURRENCY = 8
+TIMEOUT_RETURN_CODE = 124
+RUN_DIRECTORY = '/run/crucible'
+CACHE_DIRECTORY = os.path.join(RUN_DIRECTORY, 'commands')
+PROBE_CACHE_TTL = 60.0
+MUTATING_COMMANDS = (
+    ('nmcli',),
+    ('wicked',),
+    ('ip', 'link', 'set'),
+    ('ip', 'l', 'set'),
+    ('systemctl', 'restart'),
+)
+_CACHE = {}
+EXECUTORS = ('popen', 'coprocess', 'spawn')
+SPAWN_ENVIRONMENT = ('PATH', 'HOME', 'LANG', 'LC_ALL', 'TZ')
+_STATE = {
+    'executor': os.environ.get('CRUCIBLE_EXECUTOR', 'popen'),
+    'coprocess': None,
+    'recorder': None,
+    'replayer': None,
+}
+
+# The coprocess reads the working directory and the command, each terminated
+# by a NUL byte, runs the command in a subshell with its output in files in
+# the directory given as $1, and answers with the return code and a NUL byte.
+_COPROCESS_SCRIPT = r'''
+while IFS= read -r -d '' cwd && IFS= read -r -d '' command; do
+    ( cd -- "$cwd" && eval "$command" ) </dev/null \
+        >"$1/stdout" 2>"$1/stderr"
+    printf '%d\0' "$?"
+done
+'''
+
+
+@dataclasses.dataclass(frozen=True)
+class CapturePolicy:
+    """
+    How much of a command's output ``run_command`` keeps in memory.
+
+    The first ``head`` and the last ``tail`` bytes of each stream are kept in
+    memory, the whole stream is kept in a temporary file that moves to disk
+    once it is larger than ``spill`` bytes.
+    """
+
+    head: int = 64 * 1024
+    tail: int = 64 * 1024
+    spill: int = 1024 * 1024
+
+
+class _Capture:
+    """
+    A command's output stream, captured according to a ``CapturePolicy``.
+    """
+
+    def __init__(self, policy: CapturePolicy) -> None:
+        """
+        Creates an empty capture.
+
+        :param policy: How much of the stream to keep in memory.
+        """
+        self.policy = policy
+        self.size = 0
+        self.head = b''
+        self._tail = bytearray()
+        # The file lives as long as the result, it is closed with it.
+        # pylint: disable=consider-using-with
+        self._file = tempfile.SpooledTemporaryFile(max_size=policy.spill)
+
+    def __repr__(self) -> str:
+        """
+        Size of the captured stream.
+        """
+        return f'<captured {self.size} bytes>'
+
+    def write(self, data: bytes) -> None:
+        """
+        Adds output to the capture.
+
+        :param data: The output read from the command.
+        """
+        self._file.write(data)
+        self.size += len(data)
+        if len(self.head) < self.policy.head:
+            self.head += data[:self.policy.head - len(self.head)]
+        self._tail += data
+        if len(self._tail) > self.policy.tail:
+            del self._tail[:len(self._tail) - self.policy.tail]
+
+    @property
+    def tail(self) -> bytes:
+        """
+        The last bytes of the stream.
+        """
+        return bytes(self._tail)
+
+    def summary(self) -> bytes:
+        """
+        The whole stream if it fits in the head and tail, otherwise the head
+        and the tail with a note of how much was left out.
+        """
+        if self.size <= self.policy.head + self.policy.tail:
+            return self.read()
+        skipped = self.size - len(self.head) - len(self._tail)
+        return self.head + f'\n[... {skipped} bytes ...]\n'.encode() \
+            + self.tail
+
+    def read(self) -> bytes:
+        """
+        The whole stream, read back from the temporary file.
+        """
+        self._file.seek(0)
+        return self._file.read()
+
+    def __iter__(self):
+        """
+        Iterates over the lines of the whole stream without reading it into
+        memory.
+        """
+        self._file.seek(0)
+        return iter(self._file)
+
 
 class _CLI:
+    # pylint: disable=too-many-instance-attributes
     """
     An object to abstract the return result from ``run_command``.
     """
@@ -52,9 +189,12 @@ class _CLI:
     _stderr = b''
     _return_code = None
     _duration = None
+    _charset = None
+    capture = None
 
     def __init__(self, args: [str, list], shell: bool = False,
-                 verbose: bool = False) -> None:
+                 verbose: bool = False,
+                 capture: CapturePolicy = None) -> None:
         """
         Create a ``Popen`` object.
 
@@ -65,9 +205,16 @@ class _CLI:
 
         :param args: The arguments (as a list or string) to run with Popen.
         :param shell: Whether to run Popen in a shell (default: False)
-        :param verbose: Whether to print stdout to the terminal.
+        :param verbose: Whether to stream stdout and stderr to the terminal
+                        and the log as the command runs.
+        :param capture: Capture the output with bounded memory according to
+                        this policy (default: keep all output in memory,
+                        or the default policy when ``verbose``).
         """
         self.verbose = verbose
+        if verbose and capture is None:
+            capture = CapturePolicy()
+        self.capture = capture
         if shell and isinstance(args, list):
             self.args = ' '.join(args)
         else:
@@ -90,21 +237,18 @@ class _CLI:
                     stderr=PIPE,
                     shell=self.shell,
             ) as process:
-                if self.verbose:
-                    while True:
-                        output = process.stdout.readline()
-                        if output == b'' and process.poll() is not None:
-                            break
-                        if output:
-                            print(output.strip().decode(sys.stdout.encoding))
-                    stdout = process.stdout
-                    stderr = process.stderr
+                if self.capture:
+                    stdout, stderr = self._stream(process)
                 else:
                     stdout, stderr = process.communicate()
         except IOError as error:
             self._stderr = error.strerror
             self._return_code = error.errno
-            LOG.error('Could not find command for given args: %s', self.args)
+            LOG.error(
+                'Could not find command for given args: %s',
+                self.args,
+                extra={'command': self.args},
+            )
         else:
             try:
                 self._stdout = stdout
@@ -115,28 +259,142 @@ class _CLI:
                 self._return_code = 1
                 LOG.error('Could not decode stdout or stderr recieved from given args: %s. \
 stdout: %s, stderr %s', self.args, stdout, stderr)
+        self._finish(start_time)
+
+    def _stream(self, process: Popen) -> (_Capture, _Capture):
+        """
+        Captures the output of a running command, and when ``verbose``
+        streams it to the console and the log.
+
+        Both pipes are drained as data arrives, so a command writing a lot to
+        ``stderr`` can not block on a full pipe while ``stdout`` is read.
+
+        :param process: The running command.
+        :returns: The captured ``stdout`` and ``stderr``.
+        """
+        streams = {
+            process.stdout: (sys.stdout, LOG.info),
+            process.stderr: (sys.stderr, LOG.warning),
+        }
+        captures = {pipe: _Capture(self.capture) for pipe in streams}
+        partial = {pipe: b'' for pipe in streams}
+        with selectors.DefaultSelector() as selector:
+            for pipe in streams:
+                selector.register(pipe, selectors.EVENT_READ)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    pipe = key.fileobj
+                    data = os.read(key.fd, 65536)
+                    captures[pipe].write(data)
+                    if not self.verbose:
+                        if not data:
+                            selector.unregister(pipe)
+                        continue
+                    if data:
+                        *lines, partial[pipe] = \
+                            (partial[pipe] + data).split(b'\n')
+                    else:
+                        selector.unregister(pipe)
+                        lines = [partial[pipe]] if partial[pipe] else []
+                    console, log = streams[pipe]
+                    for line in lines:
+                        text = line.decode(
+                            getattr(console, 'encoding', None) or 'utf-8',
+                            errors='replace',
+                        )
+                        print(text, file=console, flush=True)
+                        log('%s: %s', self.args, text)
+        process.wait()
+        return captures[process.stdout], captures[process.stderr]
+
+    def _finish(self, start_time: float) -> None:
+        """
+        Records and logs how long the command ran.
+
+        :param start_time: When the command was started.
+        """
         self._duration = time() - start_time
         if self._return_code and self._duration:
             LOG.info(
                 '%s ran for %f (sec) with return code %i',
                 self.args,
                 self._duration,
-                self._return_code
+                self._return_code,
+                extra={
+                    'command': self.args,
+                    'duration': self._duration,
+                    'return_code': self._return_code,
+                },
             )
 
+    def _output(self, output: [str, bytes, _Capture]) -> [str, bytes]:
+        """
+        Returns output as it is, or the summary of captured output decoded
+        with the charset given to ``decode``.
+
+        :param output: ``self._stdout`` or ``self._stderr``.
+        """
+        if not isinstance(output, _Capture):
+            return output
+        summary = output.summary()
+        if self._charset:
+            return summary.decode(self._charset, errors='replace')
+        return summary
+
     @property
     def stdout(self) -> [str, bytes]:
         """
         ``stdout`` from the command.
+
+        For captured output, only the head and tail are returned; use
+        ``lines`` to read all of it.
         """
-        return self._stdout
+        return self._output(self._stdout)
 
     @property
     def stderr(self) -> [str, bytes]:
         """
         ``stderr`` from the command.
+
+        For captured output, only the head and tail are returned; use
+        ``lines`` to read all of it.
+        """
+        return self._output(self._stderr)
+
+    def lines(self, stream: str = 'stdout'):
+        """
+        Iterates over the lines of the command's whole output, decoded with
+        the charset given to ``decode`` (if any).
+
+        Captured output is read back from its temporary file one line at a
+        time.
+
+        :param stream: ``stdout`` or ``stderr``.
         """
-        return self._stderr
+        output = getattr(self, f'_{stream}')
+        if isinstance(output, (str, bytes)):
+            yield from output.splitlines(keepends=True)
+            return
+        for line in output:
+            if self._charset:
+                yield line.decode(self._charset, errors='replace')
+            else:
+                yield line
+
+    @property
+    def output_size(self) -> int:
+        """
+        Number of bytes the command wrote to ``stdout`` and ``stderr``.
+        """
+        size = 0
+        for output in (self._stdout, self._stderr):
+            if isinstance(output, _Capture):
+                size += output.size
+            elif isinstance(output, str):
+                size += len(output.encode())
+            elif isinstance(output, bytes):
+                size += len(output)
+        return size
 
     @property
     def return_code(self) -> int:
@@ -152,13 +410,38 @@ stdout: %s, stderr %s', self.args, stdout, stderr)
         """
         return self._duration
 
+    def to_dict(self) -> dict:
+        """
+        The result as a JSON serializable dictionary, with all of the output
+        base64 encoded.
+        """
+        outputs = []
+        for output in (self._stdout, self._stderr):
+            if isinstance(output, _Capture):
+                output = output.read()
+            elif not isinstance(output, bytes):
+                output = str(output).encode()
+            outputs.append(base64.b64encode(output).decode())
+        return {
+            'args': self.args,
+            'shell': self.shell,
+            'return_code': self.return_code,
+            'stdout': outputs[0],
+            'stderr': outputs[1],
+        }
+
     def decode(self, charset: str) -> None:
         """
         Decode ``self.stdout`` and ``self.stderr``.
 
         Decodes ``self._stdout`` and ``self._stderr`` with the given ``charset``.
+        Captured output is decoded lazily when it is read, replacing bytes
+        that can not be decoded (the head and tail may cut a character).
         :param charset: The character set to decode with.
         """
+        if self.capture:
+            self._charset = charset
+            return
         if not isinstance(self._stdout, str):
             try:
                 self._stdout = self._stdout.decode(charset)
@@ -175,6 +458,545 @@ stdout: %s, stderr %s', self.args, stdout, stderr)
                 raise error
 
 
+class _AsyncCLI(_CLI):
+    """
+    A ``_CLI`` that runs its command on an ``asyncio`` event loop, see
+    ``run_command_async``.
+    """
+
+    def __init__(self, args: [str, list], shell: bool = False) -> None:
+        """
+        Loads a command without running it.
+
+        :param args: The arguments (as a list or string) to run.
+        :param shell: Whether to run the command in a shell (default: False)
+        """
+        # pylint: disable=super-init-not-called
+        self.verbose = False
+        if shell and isinstance(args, list):
+            self.args = ' '.join(args)
+        else:
+            self.args = args
+        self.shell = shell
+
+    async def run(self, timeout: float = None) -> None:
+        """
+        Runs the loaded command.
+
+        A command that runs longer than ``timeout`` is killed and gets the
+        return code ``124`` (like ``timeout(1)``). If the task running the
+        command is cancelled, the command is killed before the cancellation
+        is passed on.
+
+        :param timeout: Seconds to let the command run for (default: no
+                        limit).
+        """
+        start_time = time()
+        try:
+            if self.shell:
+                process = await asyncio.create_subprocess_shell(
+                    self.args,
+                    stdout=PIPE,
+                    stderr=PIPE,
+                )
+            else:
+                process = await asyncio.create_subprocess_exec(
+                    *self.args,
+                    stdout=PIPE,
+                    stderr=PIPE,
+                )
+        except IOError as error:
+            self._stderr = error.strerror
+            self._return_code = error.errno
+            LOG.error(
+                'Could not find command for given args: %s',
+                self.args,
+                extra={'command': self.args},
+            )
+        else:
+            try:
+                self._stdout, self._stderr = await asyncio.wait_for(
+                    process.communicate(),
+                    timeout,
+                )
+                self._return_code = process.returncode
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                self._stderr = f'Timed out after {timeout} (sec)'.encode()
+                self._return_code = TIMEOUT_RETURN_CODE
+                LOG.error(
+                    '%s timed out after %s (sec)',
+                    self.args,
+                    timeout,
+                    extra={'command': self.args, 'duration': timeout},
+                )
+            except asyncio.CancelledError:
+                process.kill()
+                await process.wait()
+                raise
+        self._finish(start_time)
+
+
+class _CachedCLI(_CLI):
+    """
+    A ``_CLI`` result loaded from the command cache or a transcript, see
+    ``run_command`` and ``replay``.
+    """
+
+    def __init__(self, entry: dict) -> None:
+        """
+        Loads a stored result.
+
+        :param entry: The stored result, see ``_CLI.to_dict``.
+        """
+        # pylint: disable=super-init-not-called
+        self.verbose = False
+        self.shell = entry['shell']
+        self.args = entry['args']
+        self._stdout = base64.b64decode(entry['stdout'])
+        self._stderr = base64.b64decode(entry['stderr'])
+        self._return_code = entry['return_code']
+        self._duration = entry.get('duration', 0.0)
+
+
+class _Recorder:
+    """
+    Appends every command's result to a JSON lines transcript.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens (and truncates) the transcript.
+
+        :param path: The transcript file.
+        """
+        self.lock = threading.Lock()
+        # The transcript stays open until recording stops.
+        # pylint: disable=consider-using-with
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, result: _CLI) -> None:
+        """
+        Records a result.
+
+        :param result: The command's result.
+        """
+        entry = result.to_dict()
+        entry['duration'] = round(result.duration or 0.0, 6)
+        with self.lock:
+            self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self.file.flush()
+
+    def close(self) -> None:
+        """
+        Closes the transcript.
+        """
+        self.file.close()
+
+
+class _Replayer:
+    """
+    Answers commands with the results of a transcript.
+
+    A command that was recorded several times gets the recorded results in
+    order, and the last one once they run out.
+    """
+
+    def __init__(self, path: str, latency: bool = False) -> None:
+        """
+        Loads a transcript.
+
+        :param path: The transcript file.
+        :param latency: Whether to take as long as the recorded commands.
+        """
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.entries = {}
+        with open(path, 'r', encoding='utf-8') as transcript:
+            for line in transcript:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries.setdefault(
+                        self._key(entry['args'], entry['shell']),
+                        [],
+                    ).append(entry)
+
+    @staticmethod
+    def _key(args: [list, str], shell: bool) -> str:
+        """
+        Key of a command in the transcript.
+
+        :param args: The command's arguments.
+        :param shell: Whether the command ran in a shell.
+        """
+        return json.dumps([args, shell])
+
+    def result(self, args: [list, str], shell: bool = False) -> _CLI:
+        """
+        Returns the recorded result of a command.
+
+        Commands missing from the transcript get the return code ``127``.
+
+        :param args: The command's arguments.
+        :param shell: Whether the command runs in a shell.
+        """
+        if shell and isinstance(args, list):
+            args = ' '.join(args)
+        with self.lock:
+            entries = self.entries.get(self._key(args, shell))
+            if not entries:
+                LOG.warning('Command is not in the transcript: %s', args)
+                return _CachedCLI({
+                    'args': args,
+                    'shell': shell,
+                    'return_code': 127,
+                    'stdout': '',
+                    'stderr': base64.b64encode(
+                        b'Command is not in the transcript.'
+                    ).decode(),
+                })
+            entry = entries.pop(0) if len(entries) > 1 else entries[0]
+        return _CachedCLI(entry)
+
+    def delay(self, result: _CLI) -> float:
+        """
+        Seconds to wait before returning a replayed result.
+
+        :param result: The replayed result.
+        """
+        return result.duration if self.latency else 0.0
+
+
+def record(path: [str, None]) -> None:
+    """
+    Records the result of every command that is run to a transcript, for
+    ``replay``. Stops recording when ``path`` is ``None``.
+
+    Recording can also be started with the ``CRUCIBLE_RECORD`` environment
+    variable.
+
+    :param path: The transcript file (JSON lines).
+    """
+    if _STATE['recorder'] is not None:
+        _STATE['recorder'].close()
+        _STATE['recorder'] = None
+    if path:
+        _STATE['recorder'] = _Recorder(path)
+        atexit.register(_STATE['recorder'].close)
+
+
+def replay(path: [str, None], latency: bool = False) -> None:
+    """
+    Answers every command from a transcript made by ``record`` instead of
+    running it. Stops replaying when ``path`` is ``None``.
+
+    Replaying can also be started with the ``CRUCIBLE_REPLAY`` environment
+    variable, and ``CRUCIBLE_REPLAY_LATENCY=1`` replays the latencies.
+
+    :param path: The transcript file (JSON lines).
+    :param latency: Whether each command takes as long as it did when it was
+                    recorded.
+    """
+    _STATE['replayer'] = _Replayer(path, latency) if path else None
+
+
+def _execute(
+        args: list[str],
+        shell: bool,
+        verbose: bool,
+        capture: CapturePolicy,
+) -> _CLI:
+    """
+    Runs a command with the selected backend: a transcript being replayed,
+    the coprocess executor, or ``Popen``. The result is recorded if a
+    transcript is being recorded.
+
+    :param args: The command's arguments.
+    :param shell: Whether to run the command in a shell.
+    :param verbose: Whether to stream the command's output.
+    :param capture: The capture policy for the command's output.
+    """
+    replayer = _STATE['replayer']
+    if replayer is not None:
+        result = replayer.result(args, shell)
+        sleep(replayer.delay(result))
+    elif _STATE['executor'] == 'coprocess' and not verbose and not capture:
+        result = _CoprocessCLI(args, shell=shell)
+    elif _STATE['executor'] == 'spawn' and not shell and not verbose \
+            and not capture:
+        result = _SpawnCLI(args)
+    else:
+        result = _CLI(args, shell=shell, verbose=verbose, capture=capture)
+    if _STATE['recorder'] is not None:
+        _STATE['recorder'].write(result)
+    return result
+
+
+class _Coprocess:
+    """
+    A long-lived ``bash`` process that runs commands sent to it over a pipe.
+
+    Commands are run by ``eval`` in a subshell of the coprocess, so each
+    command costs one ``fork`` of a small shell (none extra for shell
+    commands), instead of a ``fork`` of crucible and an ``exec`` of
+    ``/bin/sh``.
+
+    The protocol over the pipes is framed by NUL bytes: crucible sends the
+    working directory and the command, and the coprocess answers with the
+    return code once the command has finished. The command's ``stdout`` and
+    ``stderr`` are left in two files in the coprocess's private directory,
+    which crucible reads before sending the next command. ``bash`` can not
+    send them over the pipe itself: its variables can not hold NUL bytes,
+    command substitution drops trailing newlines, and measuring or copying
+    the output with ``wc`` or ``cat`` would cost the forks this executor
+    saves. ``lock`` is held from sending a command until its output is read,
+    so threads sharing the coprocess never see each other's output.
+    """
+
+    def __init__(self) -> None:
+        """
+        Starts the coprocess.
+
+        :raises OSError: When ``bash`` can not be started.
+        """
+        self.directory = tempfile.mkdtemp(prefix='crucible-executor-')
+        self.lock = threading.Lock()
+        try:
+            # The coprocess lives until close() is called.
+            # pylint: disable=consider-using-with
+            self.process = Popen(
+                [
+                    'bash', '--noprofile', '--norc', '-c',
+                    _COPROCESS_SCRIPT, 'crucible-executor', self.directory,
+                ],
+                stdin=PIPE,
+                stdout=PIPE,
+                stderr=DEVNULL,
+            )
+        except OSError:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            raise
+
+    def run(self, command: str) -> (int, bytes, bytes):
+        """
+        Runs a shell command in the coprocess.
+
+        :param command: The command, as a line of shell.
+        :returns: The return code, ``stdout``, and ``stderr``.
+        :raises OSError: When the coprocess has exited.
+        """
+        with self.lock:
+            try:
+                self.process.stdin.write(
+                    os.getcwd().encode() + b'\0' + command.encode() + b'\0'
+                )
+                self.process.stdin.flush()
+            except (BrokenPipeError, ValueError) as error:
+                raise OSError('The executor coprocess has exited.') from error
+            return_code = b''
+            while True:
+                byte = self.process.stdout.read(1)
+                if not byte:
+                    raise OSError('The executor coprocess has exited.')
+                if byte == b'\0':
+                    break
+                return_code += byte
+            outputs = []
+            for stream in ('stdout', 'stderr'):
+                with open(
+                        os.path.join(self.directory, stream),
+                        'rb',
+                ) as output:
+                    outputs.append(output.read())
+        return int(return_code), outputs[0], outputs[1]
+
+    def close(self) -> None:
+        """
+        Stops the coprocess and removes its files.
+        """
+        if self.process.stdin:
+            self.process.stdin.close()
+        self.process.wait()
+        self.process.stdout.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _coprocess() -> _Coprocess:
+    """
+    Returns this invocation's coprocess, starting it on first use.
+    """
+    coprocess = _STATE['coprocess']
+    if coprocess is None or coprocess.process.poll() is not None:
+        coprocess = _Coprocess()
+        atexit.register(coprocess.close)
+        _STATE['coprocess'] = coprocess
+    return coprocess
+
+
+def set_executor(executor: str) -> None:
+    """
+    Selects how ``run_command`` runs commands.
+
+    - ``popen``: Each command is run with ``Popen`` (the default).
+    - ``coprocess``: Commands are sent to one long-lived ``bash`` process,
+      see ``_Coprocess``. Verbose and captured commands still use ``Popen``.
+    - ``spawn``: Commands are started with ``posix_spawn``, see
+      ``_SpawnCLI``. Shell, verbose and captured commands still use
+      ``Popen``.
+
+    The default can also be set with the ``CRUCIBLE_EXECUTOR`` environment
+    variable.
+
+    :param executor: One of ``EXECUTORS``.
+    :raises ValueError: When the executor is unknown.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(
+            f'Unknown executor [{executor}], use one of: {", ".join(EXECUTORS)}'
+        )
+    _STATE['executor'] = executor
+    if executor != 'coprocess' and _STATE['coprocess'] is not None:
+        _STATE['coprocess'].close()
+        _STATE['coprocess'] = None
+
+
+class _CoprocessCLI(_CLI):
+    """
+    A ``_CLI`` that runs its command in the executor coprocess, see
+    ``set_executor``.
+    """
+
+    def __init__(self, args: [str, list], shell: bool = False) -> None:
+        """
+        Runs a command in the coprocess.
+
+        Unlike ``Popen``, a command that can not be found has the return code
+        ``127`` and the shell's error in ``stderr``.
+
+        :param args: The arguments (as a list or string) to run.
+        :param shell: Whether the arguments are shell (default: False)
+        """
+        # pylint: disable=super-init-not-called
+        self.verbose = False
+        if shell and isinstance(args, list):
+            self.args = ' '.join(args)
+        else:
+            self.args = args
+        self.shell = shell
+        self._run()
+
+    def _run(self) -> None:
+        """
+        Sends the loaded command to the coprocess.
+        """
+        start_time = time()
+        if self.shell or isinstance(self.args, str):
+            command = self.args
+        else:
+            command = shlex.join(self.args)
+        try:
+            self._return_code, self._stdout, self._stderr = \
+                _coprocess().run(command)
+        except OSError as error:
+            self._stderr = str(error)
+            self._return_code = error.errno or 1
+            LOG.error('Could not run command in the executor: %s', self.args)
+        self._finish(start_time)
+
+
+class _SpawnCLI(_CLI):
+    """
+    A ``_CLI`` that starts its command with ``posix_spawn``, see
+    ``set_executor``.
+
+    ``posix_spawn`` uses ``vfork`` semantics and only sets up the standard
+    streams, instead of walking and closing every open file descriptor like
+    ``Popen``; this relies on descriptors being opened close-on-exec, which
+    Python does by default. The command gets a minimal environment with only
+    the ``SPAWN_ENVIRONMENT`` variables.
+    """
+
+    def __init__(self, args: list) -> None:
+        """
+        Runs a command.
+
+        :param args: The arguments to run.
+        """
+        # pylint: disable=super-init-not-called
+        self.verbose = False
+        self.args = args
+        self.shell = False
+        self._run()
+
+    def _run(self) -> None:
+        """
+        Spawns the loaded command and reads its output.
+        """
+        start_time = time()
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        environment = {
+            name: os.environ[name] for name in SPAWN_ENVIRONMENT
+            if name in os.environ
+        }
+        try:
+            pid = os.posix_spawnp(
+                self.args[0],
+                self.args,
+                environment,
+                file_actions=[
+                    (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+                    (os.POSIX_SPAWN_DUP2, stdout_write, 1),
+                    (os.POSIX_SPAWN_DUP2, stderr_write, 2),
+                ],
+            )
+        except OSError as error:
+            pid = None
+            self._stderr = error.strerror
+            self._return_code = error.errno
+            LOG.error(
+                'Could not find command for given args: %s',
+                self.args,
+                extra={'command': self.args},
+            )
+        finally:
+            # Only the command may hold the write ends, or the pipes never
+            # reach EOF.
+            os.close(stdout_write)
+            os.close(stderr_write)
+        if pid is None:
+            os.close(stdout_read)
+            os.close(stderr_read)
+        else:
+            self._stdout, self._stderr = self._read(stdout_read, stderr_read)
+            _, status = os.waitpid(pid, 0)
+            self._return_code = os.waitstatus_to_exitcode(status)
+        self._finish(start_time)
+
+    @staticmethod
+    def _read(stdout: int, stderr: int) -> (bytes, bytes):
+        """
+        Reads both pipes until the command closes them.
+
+        :param stdout: The read end of the ``stdout`` pipe.
+        :param stderr: The read end of the ``stderr`` pipe.
+        """
+        outputs = {stdout: [], stderr: []}
+        with selectors.DefaultSelector() as selector:
+            for descriptor in outputs:
+                selector.register(descriptor, selectors.EVENT_READ)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    data = os.read(key.fd, 65536)
+                    if data:
+                        outputs[key.fd].append(data)
+                    else:
+                        selector.unregister(key.fd)
+                        os.close(key.fd)
+        return b''.join(outputs[stdout]), b''.join(outputs[stderr])
+
+
 @contextmanager
 def chdir(directory: str, create: bool = False) -> None:
     """
@@ -212,13 +1034,207 @@ def chdir(directory: str, create: bool = False) -> None:
         os.chdir(original)
 
 
+def atomic_write(path: str, content: [str, bytes], mode: int = 0o644) -> None:
+    """
+    Writes a file atomically.
+
+    The content is written to a temporary file in the same directory, synced
+    to disk, and renamed over ``path``; readers (and a crash) only ever see
+    the old or the new file, never a partial one. An existing file's
+    permissions are kept.
+
+    :param path: The file to write.
+    :param content: The text (or bytes) to write.
+    :param mode: Permissions for the file if it does not exist yet.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        pass
+    descriptor, temp_path = tempfile.mkstemp(
+        prefix=f'.{os.path.basename(path)}.',
+        dir=directory,
+    )
+    try:
+        binary = isinstance(content, bytes)
+        with os.fdopen(
+                descriptor,
+                'wb' if binary else 'w',
+                encoding=None if binary else 'utf-8',
+        ) as temp_file:
+            temp_file.write(content)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    directory_descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(directory_descriptor)
+    finally:
+        os.close(directory_descriptor)
+
+
+def cache_file_path(prefix: str, source: str, suffix: str) -> str:
+    """
+    Returns the path of the cache file in ``RUN_DIRECTORY`` for data derived
+    from a file or directory, e.g. ``/run/crucible/ifcfg-<hash>.json``. Each
+    source gets its own file, named after a hash of its absolute path.
+
+    :param prefix: What is cached, e.g. ``ifcfg``.
+    :param source: The file or directory the data is derived from.
+    :param suffix: The file's extension, e.g. ``.json``.
+    """
+    name = hashlib.sha256(os.path.abspath(source).encode('utf-8')).hexdigest()
+    return os.path.join(RUN_DIRECTORY, f'{prefix}-{name[:16]}{suffix}')
+
+
+def read_cache_file(path: str) -> [bytes, None]:
+    """
+    Returns the content of a cache file, or ``None`` if it can not be read.
+    Checking that the content is still valid is up to the caller.
+
+    :param path: The cache file, see ``cache_file_path``.
+    """
+    try:
+        with open(path, 'rb') as cache_file:
+            return cache_file.read()
+    except OSError as error:
+        LOG.info('Could not read cache %s: %s', path, error)
+        return None
+
+
+def write_cache_file(path: str, content: [str, bytes]) -> None:
+    """
+    Writes a cache file atomically, readable only by its owner.
+
+    Failures are logged rather than raised: without a writable
+    ``RUN_DIRECTORY`` every run simply rebuilds what it would have cached.
+
+    :param path: The cache file, see ``cache_file_path``.
+    :param content: The text (or bytes) to cache.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        atomic_write(path, content, mode=0o600)
+    except OSError as error:
+        LOG.info('Could not write cache %s: %s', path, error)
+
+
+def _cache_path(key: str) -> str:
+    """
+    Path of a command's entry in the on-disk cache.
+
+    :param key: The command's cache key.
+    """
+    return os.path.join(CACHE_DIRECTORY, f'{key}.json')
+
+
+def _cache_get(key: str) -> [dict, None]:
+    """
+    Returns an unexpired cache entry from memory, or else from disk.
+
+    :param key: The command's cache key.
+    """
+    entry = _CACHE.get(key)
+    if entry is None:
+        try:
+            with open(_cache_path(key), 'r', encoding='utf-8') as cached:
+                entry = json.load(cached)
+        except (OSError, ValueError):
+            return None
+        _CACHE[key] = entry
+    if entry['expires'] < time():
+        del _CACHE[key]
+        return None
+    return entry
+
+
+def _cache_put(key: str, result: _CLI, ttl: float) -> None:
+    """
+    Caches a successful result in memory and, if possible, on disk.
+
+    :param key: The command's cache key.
+    :param result: The command's result.
+    :param ttl: Seconds the result stays valid for.
+    """
+    if result.return_code != 0:
+        return
+    entry = result.to_dict()
+    entry['expires'] = time() + ttl
+    _CACHE[key] = entry
+    try:
+        os.makedirs(CACHE_DIRECTORY, mode=0o700, exist_ok=True)
+        atomic_write(_cache_path(key), json.dumps(entry), mode=0o600)
+    except OSError as error:
+        LOG.debug('Could not write command cache: %s', error)
+
+
+def invalidate_cache() -> None:
+    """
+    Drops every cached command result, in memory and on disk.
+
+    This is called for every command that changes the network (see
+    ``MUTATING_COMMANDS``), and should be called after changing it by other
+    means.
+    """
+    _CACHE.clear()
+    try:
+        with os.scandir(CACHE_DIRECTORY) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    os.unlink(entry.path)
+    except OSError:
+        pass
+
+
+def _invalidates(args: list[str]) -> bool:
+    """
+    Whether a command changes the state that cached probes observe.
+
+    :param args: The command's arguments.
+    """
+    if not args:
+        return False
+    command = [os.path.basename(args[0])] + args[1:]
+    return any(
+        tuple(command[:len(prefix)]) == prefix
+        for prefix in MUTATING_COMMANDS
+    )
+
+
+def _record(current: trace.Span, result: _CLI) -> None:
+    """
+    Adds a command's results to its span.
+
+    :param current: The command's span (``None`` when tracing is off).
+    :param result: The command's result.
+    """
+    if current is None:
+        return
+    current.args.update(
+        args=result.args,
+        return_code=result.return_code,
+        output_bytes=result.output_size,
+    )
+
+
 def run_command(
         args: [list, str],
         in_shell: bool = False,
         silence: bool = False,
         verbose: bool = False,
         charset: str = None,
+        capture: CapturePolicy = None,
+        cache_ttl: float = None,
 ) -> _CLI:
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
     """
     Run a given command or list of commands by instantiating a ``CLI`` object.
 
@@ -232,24 +1248,176 @@ def run_command(
     :param args: List of arguments to run, can also be a string. If a string,
     :param in_shell: Whether to use a shell when invoking the command.
     :param silence: Tells this not to output the command to the log.
-    :param verbose: Tells this to output stdout to the console.
+    :param verbose: Tells this to stream stdout and stderr to the console
+                    and the log while the command runs, only the last lines
+                    of each are kept in the result.
+    :param charset: Returns the command ``stdout`` and ``stderr`` as a
+                    string instead of bytes, and decoded with the given
+                    ``charset``.
+    :param capture: Keep only the head and tail of the output in memory,
+                    and spill the rest to disk, according to this policy
+                    (default: keep all output in memory unless ``verbose``).
+    :param cache_ttl: For read-only probes, reuse a successful result of the
+                      same command for this many seconds, also across
+                      invocations (default: always run the command). Cached
+                      results are dropped when a command that changes the
+                      network runs.
+    """
+    args_string = [str(x) for x in args]
+    key = None
+    if cache_ttl and not verbose and not capture \
+            and _STATE['recorder'] is None and _STATE['replayer'] is None:
+        key = hashlib.sha256(
+            json.dumps([args_string, in_shell]).encode()
+        ).hexdigest()
+        entry = _cache_get(key)
+        if entry:
+            LOG.info('Using cached result of: %s', ' '.join(args_string))
+            result = _CachedCLI(entry)
+            if charset:
+                result.decode(charset)
+            return result
+    if not silence:
+        LOG.info(
+            'Running sub-command: %s (in shell: %s)',
+            ' '.join(args_string),
+            in_shell,
+            extra={'command': args_string},
+        )
+    with trace.span(
+            ' '.join(args_string),
+            'command',
+            phase=trace.phase(),
+    ) as current:
+        result = _execute(args_string, in_shell, verbose, capture)
+        _record(current, result)
+    if _invalidates(args_string):
+        invalidate_cache()
+    if key:
+        _cache_put(key, result, cache_ttl)
+    if charset:
+        result.decode(charset)
+    return result
+
+
+async def run_command_async(
+        args: [list, str],
+        in_shell: bool = False,
+        silence: bool = False,
+        charset: str = None,
+        timeout: float = None,
+) -> _CLI:
+    """
+    Run a given command on the running ``asyncio`` event loop, see
+    ``run_command``.
+
+    .. code-block:: python
+
+        import asyncio
+        from crucible.os import run_command_async
+
+        result = asyncio.run(run_command_async(['my', 'args'], timeout=5))
+        print(vars(result))
+
+    :param args: List of arguments to run, can also be a string. If a string,
+    :param in_shell: Whether to use a shell when invoking the command.
+    :param silence: Tells this not to output the command to the log.
     :param charset: Returns the command ``stdout`` and ``stderr`` as a
                     string instead of bytes, and decoded with the given
                     ``charset``.
+    :param timeout: Seconds to let the command run for before killing it
+                    (default: no limit).
     """
     args_string = [str(x) for x in args]
     if not silence:
         LOG.info(
             'Running sub-command: %s (in shell: %s)',
             ' '.join(args_string),
-            in_shell
+            in_shell,
+            extra={'command': args_string},
         )
-    result = _CLI(args_string, shell=in_shell, verbose=verbose)
+    with trace.span(
+            ' '.join(args_string),
+            'command',
+            phase=trace.phase(),
+    ) as current:
+        replayer = _STATE['replayer']
+        if replayer is not None:
+            result = replayer.result(args_string, in_shell)
+            await asyncio.sleep(replayer.delay(result))
+        else:
+            result = _AsyncCLI(args_string, shell=in_shell)
+            await result.run(timeout=timeout)
+        if _STATE['recorder'] is not None:
+            _STATE['recorder'].write(result)
+        _record(current, result)
+    if _invalidates(args_string):
+        invalidate_cache()
     if charset:
         result.decode(charset)
     return result
 
 
+def run_commands(
+        commands: list[list],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = None,
+        in_shell: bool = False,
+        silence: bool = False,
+        charset: str = None,
+) -> list[_CLI]:
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    """
+    Run independent commands concurrently, at most ``concurrency`` at a time.
+
+    .. code-block:: python
+
+        from crucible.os import run_commands
+
+        for result in run_commands([['ethtool', '-P', nic] for nic in nics]):
+            print(vars(result))
+
+    :param commands: The commands to run, each as for ``run_command``.
+    :param concurrency: How many commands may run at the same time.
+    :param timeout: Seconds to let each command run for before killing it
+                    (default: no limit).
+    :param in_shell: Whether to use a shell when invoking the commands.
+    :param silence: Tells this not to output the commands to the log.
+    :param charset: Returns each command's ``stdout`` and ``stderr`` as a
+                    string instead of bytes, and decoded with the given
+                    ``charset``.
+    :returns: The results, in the same order as ``commands``.
+    """
+
+    async def run_all() -> list[_CLI]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(args: [list, str]) -> _CLI:
+            async with semaphore:
+                return await run_command_async(
+                    args,
+                    in_shell=in_shell,
+                    silence=silence,
+                    charset=charset,
+                    timeout=timeout,
+                )
+
+        return await asyncio.gather(*(run_one(args) for args in commands))
+
+    if not commands:
+        return []
+    return asyncio.run(run_all())
+
+
+if os.environ.get('CRUCIBLE_RECORD'):
+    record(os.environ['CRUCIBLE_RECORD'])
+if os.environ.get('CRUCIBLE_REPLAY'):
+    replay(
+        os.environ['CRUCIBLE_REPLAY'],
+        latency=os.environ.get('CRUCIBLE_REPLAY_LATENCY', '') == '1',
+    )
+
+
 def supported_platforms() -> (bool, str):
     """
     Returns whether the running platform is officially supported.
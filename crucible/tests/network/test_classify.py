@@ -0,0 +1,194 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Tests for the ``crucible.network.classify`` module.
+"""
+# pylint: disable=protected-access
+import os
+
+import mock
+import pytest
+
+from crucible import os as crucible_os
+from crucible.network import classify
+
+META = {
+    'hsn_ids': [
+        {'vendor_id': '17DB', 'device_id': '0501'},
+        {'vendor_id': '15b3', 'device_id': '1017'},
+        {
+            'vendor_id': '15b3',
+            'device_id': '101b',
+            'subsystem_vendor_id': '1590',
+            'subsystem_device_id': '02f4',
+        },
+    ],
+    'mgmt_ids': [
+        {'vendor_id': '15b3'},
+        {'vendor_id': '8086', 'device_id': '*'},
+        {'vendor_id': '14e4', 'device_id': '16d7', 'priority': 10},
+    ],
+    'sun_ids': [
+        {'vendor_id': '14e4', 'device_id': '16d7'},
+    ],
+}
+
+DATABASE = '''hsn_ids:
+  - vendor_id: '17db'
+    device_id: '0501'
+mgmt_ids:
+  - vendor_id: '15b3'
+'''
+
+
+class TestClassifyIndex:
+    """
+    Tests for compiling and querying the classification index.
+    """
+
+    index = None
+
+    def setup_method(self) -> None:
+        """
+        Compiles the test database.
+        """
+        self.index = classify.ClassifyIndex.compile(META)
+
+    def test_exact(self) -> None:
+        """
+        Asserts exact vendor and device matches win over vendor wildcards.
+        """
+        assert self.index.classify('17db', '0501') == 'hsn'
+        assert self.index.classify('15B3', '1017\n') == 'hsn'
+        assert self.index.classify('15b3', '1013') == 'mgmt'
+
+    def test_wildcard(self) -> None:
+        """
+        Asserts vendor wildcards match any device, and unknown NICs are not
+        classified.
+        """
+        assert self.index.classify('8086', '37d2') == 'mgmt'
+        assert self.index.classify('10ec', '8168') == ''
+
+    def test_subsystem(self) -> None:
+        """
+        Asserts subsystem rules only match their subsystem.
+        """
+        assert self.index.classify('15b3', '101b', '1590', '02f4') == 'hsn'
+        assert self.index.classify('15b3', '101b', '15b3', '0007') == 'mgmt'
+
+    def test_vendor_categories(self) -> None:
+        """
+        Asserts a mgmt rule with a device ID still matches every device of
+        its vendor.
+        """
+        index = classify.ClassifyIndex.compile({
+            'mgmt_ids': [{'vendor_id': '1077', 'device_id': '8070'}],
+        })
+        assert index.rules == {('1077',): (0, 'mgmt')}
+        assert index.classify('1077', '8070') == 'mgmt'
+        assert index.classify('1077', '2261') == 'mgmt'
+
+    def test_priority(self) -> None:
+        """
+        Asserts the rule with the highest priority wins a duplicate key.
+        """
+        assert self.index.classify('14e4', '16d7') == 'mgmt'
+
+    def test_missing_vendor(self) -> None:
+        """
+        Asserts a rule without a vendor is rejected.
+        """
+        with pytest.raises(classify.ClassifyError):
+            classify.ClassifyIndex.compile({'hsn_ids': [{'device_id': '1'}]})
+
+
+class TestLoadIndex:
+    """
+    Tests for the on-disk cache of the classification index.
+    """
+
+    @pytest.fixture(autouse=True)
+    def cache_directory(self, tmp_path) -> None:
+        """
+        Clears the in-process index cache, and keeps the cache files in a
+        temporary directory.
+        :param tmp_path: The temporary directory.
+        """
+        classify._indexes.clear()
+        with mock.patch('crucible.os.RUN_DIRECTORY', str(tmp_path / 'cache')):
+            yield tmp_path / 'cache'
+
+    def test_cache(self, tmp_path) -> None:
+        """
+        Asserts the YAML is only parsed when building the cache.
+        """
+        path = str(tmp_path / 'ifname.yml')
+        with open(path, 'w', encoding='utf-8') as database:
+            database.write(DATABASE)
+        index = classify.load_index(path)
+        assert index.classify('17db', '0501') == 'hsn'
+        cache_path = crucible_os.cache_file_path('ifname', path, '.cache')
+        assert os.path.dirname(cache_path) == crucible_os.RUN_DIRECTORY
+        assert os.path.exists(cache_path)
+        classify._indexes.clear()
+        with mock.patch('crucible.network.classify.yaml.load') as mock_load:
+            cached = classify.load_index(path)
+        assert not mock_load.called
+        assert cached.rules == index.rules
+
+    def test_cache_invalidated(self, tmp_path) -> None:
+        """
+        Asserts a changed database is recompiled, and an unchanged one that
+        was touched is not.
+        """
+        path = str(tmp_path / 'ifname.yml')
+        with open(path, 'w', encoding='utf-8') as database:
+            database.write(DATABASE)
+        classify.load_index(path)
+        classify._indexes.clear()
+        os.utime(path, ns=(0, 0))
+        with mock.patch('crucible.network.classify.yaml.load') as mock_load:
+            classify.load_index(path)
+        assert not mock_load.called
+        with open(path, 'a', encoding='utf-8') as database:
+            database.write("  - vendor_id: '8086'\n")
+        assert classify.load_index(path).classify('8086', '37d2') == 'mgmt'
+
+    def test_read_only(self, tmp_path) -> None:
+        """
+        Asserts an unwritable cache location does not fail classification.
+        """
+        path = str(tmp_path / 'ifname.yml')
+        with open(path, 'w', encoding='utf-8') as database:
+            database.write(DATABASE)
+        with mock.patch(
+                'crucible.network.classify.os.replace',
+                side_effect=PermissionError('read-only'),
+        ):
+            index = classify.load_index(path)
+        assert index.classify('15b3', '1013') == 'mgmt'
+        assert not os.listdir(crucible_os.RUN_DIRECTORY)
@@ -0,0 +1,275 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for the ``crucible.network.config`` module.
+"""
+import json
+
+import mock
+import pytest
+
+from crucible.network import config
+from crucible.network import sysconfig
+
+PLAN = '''
+dns: [10.92.100.225]
+search: [nmn, hmn]
+interfaces:
+  - interface: bond0
+    members: [mgmt0, mgmt1]
+    noip: true
+  - interface: bond0.nmn0
+    members: bond0
+    vlan_id: 2
+    cidr: 10.252.1.4/17
+    default: true
+  - interface: bond0.hmn0
+    members: [bond0]
+    vlan_id: 4
+    cidr: 10.254.1.4/17
+'''
+
+
+def mock_run_commands(commands, **_) -> list:
+    """
+    Mock for ``run_commands``, every command succeeds.
+    :param commands: Commands passed to ``run_commands``.
+    """
+    return [mock.Mock(return_code=0) for _ in commands]
+
+
+@mock.patch(
+    'crucible.network.config.resolve_network_manager_type',
+    return_value=sysconfig.Wicked,
+)
+@mock.patch(
+    'crucible.network.sysconfig.run_commands',
+    side_effect=mock_run_commands,
+)
+@mock.patch('crucible.network.sysconfig.run_command', spec=True)
+class TestApply:
+    """
+    Tests for applying a plan.
+    """
+
+    def test_apply(self, mock_run, _, __, tmp_path) -> None:
+        """
+        Asserts that every interface is written, and reloaded with one
+        ``wicked ifreload``.
+        """
+        plan = tmp_path / 'plan.yaml'
+        plan.write_text(PLAN)
+        (tmp_path / 'config').write_text(
+            'NETCONFIG_DNS_STATIC_SERVERS=""\n'
+            'NETCONFIG_DNS_STATIC_SEARCHLIST=""\n'
+        )
+        with mock.patch.object(
+                sysconfig.Wicked,
+                'install_location',
+                str(tmp_path),
+        ):
+            config.apply(str(plan))
+        for name in ('bond0', 'bond0.nmn0', 'bond0.hmn0'):
+            assert (tmp_path / f'ifcfg-{name}').exists()
+        assert 'ETHERDEVICE=bond0' in \
+            (tmp_path / 'ifcfg-bond0.hmn0').read_text()
+        assert 'default 10.252.0.1 - bond0.nmn0' in \
+            (tmp_path / 'ifroute-bond0.nmn0').read_text()
+        reloads = [
+            call.args[0] for call in mock_run.call_args_list
+            if call.args[0][0] == 'wicked'
+        ]
+        assert reloads == [
+            ['wicked', 'ifreload', 'bond0', 'bond0.nmn0', 'bond0.hmn0']
+        ]
+        assert 'NETCONFIG_DNS_STATIC_SEARCHLIST="nmn hmn"' in \
+            (tmp_path / 'config').read_text()
+        netconfigs = [
+            call.args[0] for call in mock_run.call_args_list
+            if call.args[0][0] == 'netconfig'
+        ]
+        assert netconfigs == [['netconfig', 'update', '-f']]
+
+    def test_apply_converged(self, mock_run, _, __, tmp_path) -> None:
+        """
+        Asserts that applying a plan again only reloads changed interfaces.
+        """
+        plan = tmp_path / 'plan.yaml'
+        plan.write_text(
+            'interfaces: [{interface: lan0, dhcp: true},'
+            ' {interface: lan1, dhcp: true}]'
+        )
+        with mock.patch.object(
+                sysconfig.Wicked,
+                'install_location',
+                str(tmp_path),
+        ):
+            config.apply(str(plan))
+            mock_run.reset_mock()
+            config.apply(str(plan))
+            mock_run.assert_not_called()
+            plan.write_text(
+                'interfaces: [{interface: lan0, dhcp: true},'
+                ' {interface: lan1, dhcp: true, mtu: 1500}]'
+            )
+            config.apply(str(plan))
+        mock_run.assert_called_once_with(['wicked', 'ifreload', 'lan1'])
+
+    def test_apply_interface_dns(self, _, __, ___, tmp_path) -> None:
+        """
+        Asserts that an interface's own ``dns`` replaces the plan's.
+        """
+        plan = tmp_path / 'plan.yaml'
+        plan.write_text(
+            'dns: [10.92.100.225]\n'
+            'interfaces: [{interface: lan0, dhcp: true},'
+            ' {interface: lan1, dhcp: true, dns: [10.1.1.1]}]'
+        )
+        (tmp_path / 'config').write_text('NETCONFIG_DNS_STATIC_SERVERS=""\n')
+        init = sysconfig.Wicked.__init__
+        with mock.patch.object(
+                sysconfig.Wicked,
+                'install_location',
+                str(tmp_path),
+        ), mock.patch.object(
+                sysconfig.Wicked,
+                '__init__',
+                autospec=True,
+                side_effect=init,
+        ) as mock_init:
+            config.apply(str(plan), defer=True)
+        assert [call.kwargs.get('dns') for call in mock_init.mock_calls] == [
+            ['10.92.100.225'],
+            ['10.1.1.1'],
+            ['10.92.100.225'],
+        ]
+        assert 'NETCONFIG_DNS_STATIC_SERVERS="10.92.100.225"' in \
+            (tmp_path / 'config').read_text()
+
+    def test_apply_defer(self, mock_run, _, __, tmp_path) -> None:
+        """
+        Asserts that nothing is reloaded when deferring.
+        """
+        plan = tmp_path / 'plan.yaml'
+        plan.write_text('interfaces: [{interface: lan0, dhcp: true}]')
+        with mock.patch.object(
+                sysconfig.Wicked,
+                'install_location',
+                str(tmp_path),
+        ):
+            config.apply(str(plan), defer=True)
+        assert (tmp_path / 'ifcfg-lan0').exists()
+        mock_run.assert_not_called()
+
+    @pytest.mark.parametrize(
+        'content',
+        [
+            '- interface: lan0',
+            'interfaces: [{dhcp: true}]',
+            'interfaces: [{interface: lan0}]',
+            'interfaces: [{interface: bond0, noip: true}]',
+            'interfaces: [{interface: bond0, noip: true, members: null}]',
+            'interfaces: [{interface: bond0, noip: true, members: 1}]',
+            'interfaces: [{interface: lan0, dhcp: true, vlanid: 2}]',
+            'interfaces: [{interface: lan0, dhcp: true, remove: true}]',
+            'interfaces: [',
+        ]
+    )
+    def test_apply_invalid(self, mock_run, _, __, tmp_path, content) -> None:
+        """
+        Asserts that an invalid plan is refused before anything is written.
+        """
+        plan = tmp_path / 'plan.yaml'
+        plan.write_text(content)
+        with mock.patch.object(
+                sysconfig.Wicked,
+                'install_location',
+                str(tmp_path),
+        ):
+            with pytest.raises(config.NetworkError):
+                config.apply(str(plan))
+        assert not list(tmp_path.glob('ifcfg-*'))
+        mock_run.assert_not_called()
+
+
+@mock.patch.dict('crucible.network.sysconfig._indexes', clear=True)
+class TestShow:
+    """
+    Tests for showing the configured interfaces.
+    """
+
+    @pytest.fixture
+    def directory(self, tmp_path) -> None:
+        """
+        Writes the files of a bond and a VLAN on it to a temporary directory,
+        and keeps the cache in it.
+        :param tmp_path: The temporary directory.
+        """
+        (tmp_path / 'ifcfg-bond0').write_text(
+            'BOOTPROTO=static\n'
+            'BONDING_SLAVE_0=mgmt0\n'
+            'BONDING_SLAVE_1=mgmt1\n'
+        )
+        (tmp_path / 'ifcfg-bond0.nmn0').write_text(
+            'BOOTPROTO=static\n'
+            'IPADDR=10.252.1.4/17\n'
+            'ETHERDEVICE=bond0\n'
+            'VLAN_ID=2\n'
+            'MTU=1500\n'
+        )
+        with mock.patch('crucible.os.RUN_DIRECTORY', str(tmp_path / 'cache')):
+            yield tmp_path
+
+    def test_show(self, directory, capsys) -> None:
+        """
+        Asserts that the interfaces are shown as a table, with ``-`` for an
+        MTU that is not set.
+        """
+        config.show(directory=str(directory))
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].split() == [
+            'NAME', 'KIND', 'PROTO', 'IP', 'VLAN', 'MTU', 'MEMBERS',
+        ]
+        assert lines[1].split() == [
+            'bond0', 'bond', 'static', '-', '-', '-', 'mgmt0,mgmt1',
+        ]
+        assert lines[2].split() == [
+            'bond0.nmn0', 'vlan', 'static', '10.252.1.4/17', '2', '1500',
+            'bond0',
+        ]
+
+    def test_show_json(self, directory, capsys) -> None:
+        """
+        Asserts that filtered interfaces are shown as JSON, and that an
+        unreadable directory is an error.
+        """
+        config.show(directory=str(directory), as_json=True, parent='bond0')
+        shown = json.loads(capsys.readouterr().out)
+        assert [(i['name'], i['ip'], i['mtu']) for i in shown] == [
+            ('bond0.nmn0', '10.252.1.4/17', 1500),
+        ]
+        config.show(directory=str(directory), as_json=True, names=['bond0'])
+        assert json.loads(capsys.readouterr().out)[0]['mtu'] is None
+        with pytest.raises(config.NetworkError):
+            config.show(directory=str(directory / 'missing'))
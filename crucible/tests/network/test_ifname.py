@@ -29,11 +29,14 @@ Tests for the ``crucible.network.ifname`` module.
 from dataclasses import dataclass
 import os
 
+import json
 import re
 import mock
 from mock import mock_open
 
+from crucible import os as crucible_os
 from crucible.network import ifname
+from crucible.network import netlink
 
 mock_nics = {
     'em1': {
@@ -116,6 +119,14 @@ def mock_ethtool(*args, **_) -> MockCLI:
     return mock_cli
 
 
+def mock_run_commands(commands, **_) -> list[MockCLI]:
+    """
+    Mock for ``run_commands``, only handles ``ethtool``.
+    :param commands: Commands passed to ``run_commands``.
+    """
+    return [mock_ethtool(command) for command in commands]
+
+
 def mock_open_pci_id(*args, **_) -> mock.mock:
     """
     Mock for ``open(<pci_ID file>)``
@@ -128,7 +139,7 @@ def mock_open_pci_id(*args, **_) -> mock.mock:
     return mock_open(read_data=read_data)()
 
 
-@mock.patch('crucible.os._CLI', spec=True, side_effect=mock_ethtool)
+@mock.patch('crucible.network.ifname.run_commands', side_effect=mock_run_commands)
 @mock.patch('crucible.network.ifname.supported_platforms', return_value=(True, 'Linux'))
 @mock.patch('crucible.network.ifname.glob', return_value=mock_nics)
 class TestIfname:
@@ -170,6 +181,35 @@ class TestIfname:
             actual = ifname.map_nics()
             assert actual == self.nics
 
+    def test_get_nics_netlink(self, mock_glob, _, mock_cli) -> None:
+        """
+        Tests whether permanent addresses from a netlink dump are used
+        instead of calling ``ethtool`` for each NIC.
+        """
+        mock_glob.return_value = [v['file'] for _, v in mock_nics.items()]
+        links = {
+            name: netlink.Link(
+                index=index,
+                name=name,
+                flags=netlink.IFF_UP,
+                perm_address=value['mac'],
+                operstate='up',
+            ) for index, (name, value) in enumerate(mock_nics.items())
+        }
+        with mock.patch(
+                'crucible.network.ifname.open',
+                side_effect=mock_open_pci_id
+        ), mock.patch(
+            'crucible.network.ifname.netlink.dump_links',
+            return_value=links,
+        ):
+            actual = ifname.map_nics()
+        assert actual == self.nics
+        assert not mock_cli.called
+        for nic in actual:
+            assert nic.index == links[nic.name].index
+            assert nic.operstate == 'up'
+
     def test_get_renames(self, *_) -> None:
         """
         Tests whether we correctly resolve new names correctly for each NIC.
@@ -200,6 +240,69 @@ class TestIfname:
             assert nic.mac.lower() in actual
             assert nic.name in actual
 
+    def test_run_converged(self, _glob, _platform, _cli, tmp_path) -> None:
+        """
+        Tests that a node whose NICs and udev rules are already named is left
+        alone.
+        """
+        named = []
+        for nic in ifname.get_new_names(self.nics):
+            named.append(ifname.NIC(
+                name=nic.name,
+                mac=nic.mac,
+                device_id=nic.device_id,
+                vendor_id=nic.vendor_id,
+            ))
+        (tmp_path / '80-ifname.rules').write_text(
+            ifname._rendor_udev_rules(named)
+        )
+        with mock.patch(
+                'crucible.network.ifname.map_nics',
+                return_value=named,
+        ), mock.patch(
+            'crucible.network.ifname._rename'
+        ) as mock_rename, mock.patch(
+            'crucible.network.ifname.atomic_write'
+        ) as mock_write:
+            ifname.run(
+                skip_rename=False,
+                skip_udev=False,
+                merge=False,
+                overwrite=False,
+                install_location=str(tmp_path),
+            )
+        assert not mock_rename.called
+        assert not mock_write.called
+
+    def test_run_plan(self, _glob, _platform, _cli, tmp_path) -> None:
+        """
+        Tests that the plan is printed as JSON and nothing is changed.
+        """
+        with mock.patch(
+                'crucible.network.ifname.map_nics',
+                return_value=self.nics,
+        ), mock.patch(
+            'crucible.network.ifname._rename'
+        ) as mock_rename, mock.patch(
+            'crucible.network.ifname.click.echo'
+        ) as mock_echo:
+            ifname.run(
+                skip_rename=False,
+                skip_udev=False,
+                merge=False,
+                overwrite=False,
+                install_location=str(tmp_path),
+                dry_run=True,
+            )
+        assert not mock_rename.called
+        assert not os.listdir(tmp_path)
+        plan = json.loads(mock_echo.call_args.args[0])
+        assert {
+            rename['from']: rename['to'] for rename in plan['renames']
+        } == {name: value['real_name'] for name, value in mock_nics.items()}
+        assert len(plan['add_rules']) == len(mock_nics)
+        assert not plan['delete_rules']
+
     def test_newlines(self, *_) -> None:
         """
         Tests whether newlines are properly stripped which are frequently
@@ -223,3 +326,241 @@ class TestIfname:
             assert not new_lines_regex.match(nic.mac)
             assert not new_lines_regex.match(nic.device_id)
             assert not new_lines_regex.match(nic.vendor_id)
+
+
+def test_map_nics_sysfs_root(tmp_path, monkeypatch) -> None:
+    """
+    Tests that NICs are read from ``CRUCIBLE_SYSFS_ROOT`` without netlink,
+    with their MAC addresses from a replayed ``ethtool``.
+    """
+    device = tmp_path / 'bus/pci/drivers/mlx5_core/0000:41:00.0'
+    (device / 'net/eth0').mkdir(parents=True)
+    (device / 'uevent').write_text(
+        'PCI_ID=15B3:1017\nPCI_SUBSYS_ID=15B3:0007\n'
+    )
+    transcript = tmp_path / 'transcript.jsonl'
+    crucible_os.record(str(transcript))
+    try:
+        crucible_os.run_command(
+            ['echo', 'Permanent address: b8:59:9f:00:00:01'],
+        )
+    finally:
+        crucible_os.record(None)
+    entry = json.loads(transcript.read_text())
+    entry['args'] = ['ethtool', '-P', 'eth0']
+    transcript.write_text(json.dumps(entry))
+    monkeypatch.setenv('CRUCIBLE_SYSFS_ROOT', str(tmp_path))
+    crucible_os.replay(str(transcript))
+    try:
+        with mock.patch(
+                'crucible.network.ifname.netlink.dump_links'
+        ) as mock_dump:
+            nics = ifname.map_nics()
+    finally:
+        crucible_os.replay(None)
+    assert not mock_dump.called
+    assert len(nics) == 1
+    nic = nics[0]
+    assert (nic.name, nic.mac.lower()) == ('eth0', 'b8:59:9f:00:00:01')
+    assert (nic.vendor_id, nic.device_id) == ('15B3', '1017')
+    assert nic.subsystem_device_id == '0007'
+
+
+class TestNameNewNics:
+    """
+    Tests for naming NICs that appear after the initial naming.
+    """
+
+    def test_prefix_indexes_reserved(self) -> None:
+        """
+        Asserts reserved names are skipped.
+        """
+        prefixes = ifname.PrefixIndexes({'lan0', 'lan2', 'hsn0'})
+        assert [prefixes.lan, prefixes.lan, prefixes.hsn] == \
+            ['lan1', 'lan3', 'hsn1']
+
+    def test_name_new_nics(self, tmp_path) -> None:
+        """
+        Asserts only NICs without a rule are named, continuing after the
+        names already in use, and their rules are appended.
+        """
+        existing = [
+            ifname.NIC(name='mgmt0', mac='b8:59:9f:fe:49:d5',
+                       vendor_id='15b3', device_id='1013'),
+            ifname.NIC(name='lan0', mac='a4:bf:01:38:f1:40',
+                       vendor_id='8086', device_id='37d2'),
+        ]
+        (tmp_path / '80-ifname.rules').write_text(
+            ifname._rendor_udev_rules(existing)
+        )
+        new = ifname.NIC(name='eth2', mac='b8:59:9f:fe:50:00',
+                         vendor_id='15b3', device_id='1013')
+        with mock.patch(
+                'crucible.network.ifname.map_nics',
+                return_value=existing + [new],
+        ), mock.patch(
+            'crucible.network.ifname._rename'
+        ) as mock_rename:
+            ifname.name_new_nics(str(tmp_path))
+        assert mock_rename.call_args.args[0] == [new]
+        assert new.old_name == 'eth2'
+        assert new.name == 'mgmt1'
+        rules = (tmp_path / '80-ifname.rules').read_text()
+        for nic in existing + [new]:
+            assert f'NAME="{nic.name}"' in rules
+
+
+class TestRename:
+    """
+    Tests for renaming NICs.
+    """
+
+    def test_rename_steps_chain(self) -> None:
+        """
+        Asserts that chained renames are ordered so no name is reused while
+        it is still taken.
+        """
+        steps = ifname._rename_steps(
+            {'eth0', 'eth1'},
+            [('eth0', 'eth1'), ('eth1', 'eth2')],
+        )
+        assert steps == [('eth1', 'eth2'), ('eth0', 'eth1')]
+
+    def test_rename_steps_swap(self) -> None:
+        """
+        Asserts that a swap is resolved through a temporary name.
+        """
+        steps = ifname._rename_steps(
+            {'eth0', 'eth1'},
+            [('eth0', 'eth1'), ('eth1', 'eth0')],
+        )
+        assert steps == [
+            ('eth0', 'crutmp0'),
+            ('eth1', 'eth0'),
+            ('crutmp0', 'eth1'),
+        ]
+
+    def test_rename_steps_blocked(self) -> None:
+        """
+        Asserts that a rename to a name held by a NIC that is not being
+        renamed is dropped.
+        """
+        steps = ifname._rename_steps(
+            {'eth0', 'eth1', 'lan0'},
+            [('eth0', 'lan0'), ('eth1', 'mgmt0')],
+        )
+        assert steps == [('eth1', 'mgmt0')]
+
+    def test_rename_steps_blocked_chain(self) -> None:
+        """
+        Asserts that a chain ending at a name held by a NIC that is not being
+        renamed is dropped whole, without moving any NIC to a temporary
+        name, while a cycle next to it is still broken.
+        """
+        steps = ifname._rename_steps(
+            {'a', 'b', 'c', 'eth0', 'eth1'},
+            [('a', 'b'), ('b', 'c'), ('eth0', 'eth1'), ('eth1', 'eth0')],
+        )
+        assert steps == [
+            ('eth0', 'crutmp0'),
+            ('eth1', 'eth0'),
+            ('crutmp0', 'eth1'),
+        ]
+
+    @mock.patch('crucible.network.ifname.netlink.Netlink')
+    def test_rename_netlink(self, mock_netlink) -> None:
+        """
+        Asserts that only NICs needing a new name are brought down, renamed,
+        and brought back up by index.
+        """
+        sock = mock_netlink.return_value.__enter__.return_value
+        sock.links.return_value = [
+            netlink.Link(index=2, name='em1', flags=netlink.IFF_UP),
+            netlink.Link(index=3, name='em2', flags=0),
+            netlink.Link(index=4, name='lan0', flags=netlink.IFF_UP),
+        ]
+        nics = []
+        for old_name, new_name in [
+            ('em1', 'lan1'), ('em2', 'lan2'), ('lan0', 'lan0')
+        ]:
+            nic = ifname.NIC(name=old_name, mac='')
+            nic.name = new_name
+            nics.append(nic)
+        ifname._rename(nics)
+        assert sock.set_link.mock_calls == [
+            mock.call(2, up=False),
+            mock.call(2, name='lan1'),
+            mock.call(3, name='lan2'),
+            mock.call(2, up=True),
+        ]
+
+    @mock.patch('crucible.network.ifname.netlink.Netlink')
+    def test_rename_netlink_blocked(self, mock_netlink) -> None:
+        """
+        Asserts that links whose rename is blocked by another NIC's name are
+        left up.
+        """
+        sock = mock_netlink.return_value.__enter__.return_value
+        sock.links.return_value = [
+            netlink.Link(index=2, name='em1', flags=netlink.IFF_UP),
+            netlink.Link(index=3, name='em2', flags=netlink.IFF_UP),
+            netlink.Link(index=4, name='em3', flags=netlink.IFF_UP),
+            netlink.Link(index=5, name='lan0', flags=netlink.IFF_UP),
+        ]
+        nics = []
+        for old_name, new_name in [
+            ('em1', 'lan0'), ('em2', 'em1'), ('em3', 'lan3')
+        ]:
+            nic = ifname.NIC(name=old_name, mac='')
+            nic.name = new_name
+            nics.append(nic)
+        ifname._rename_netlink(nics)
+        assert sock.set_link.mock_calls == [
+            mock.call(4, up=False),
+            mock.call(4, name='lan3'),
+            mock.call(4, up=True),
+        ]
+
+    @mock.patch('crucible.network.ifname.run_commands')
+    @mock.patch('crucible.network.ifname.run_command')
+    def test_rename_ip(self, mock_run_command, mock_set_links) -> None:
+        """
+        Asserts that NICs are brought down and up together, and that a NIC
+        that could not be brought down is not renamed.
+        """
+        links = MockCLI()
+        links.stdout = '\n'.join([
+            '2: em1: <BROADCAST,UP,LOWER_UP> mtu 1500',
+            '3: em2: <BROADCAST,UP,LOWER_UP> mtu 1500',
+            '4: em3: <BROADCAST> mtu 1500',
+        ])
+        links.decode = mock.Mock()
+        renamed = MockCLI()
+        renamed.return_code = 0
+        mock_run_command.side_effect = [links, renamed, renamed]
+        down, failed, up = MockCLI(), MockCLI(), MockCLI()
+        down.return_code = up.return_code = 0
+        failed.return_code = 1
+        mock_set_links.side_effect = [[down, failed], [up]]
+        nics = []
+        for old_name, new_name in [
+            ('em1', 'lan0'), ('em2', 'lan1'), ('em3', 'lan2')
+        ]:
+            nic = ifname.NIC(name=old_name, mac='')
+            nic.name = new_name
+            nics.append(nic)
+        ifname._rename_ip(nics)
+        # The link listing is never served from the command cache.
+        assert mock_run_command.mock_calls[0] == \
+            mock.call(['ip', '-o', 'link', 'show'])
+        assert mock_set_links.mock_calls == [
+            mock.call([
+                ['ip', 'link', 'set', 'em1', 'down'],
+                ['ip', 'link', 'set', 'em2', 'down'],
+            ]),
+            mock.call([['ip', 'link', 'set', 'lan0', 'up']]),
+        ]
+        assert mock_run_command.mock_calls[1:] == [
+            mock.call(['ip', 'link', 'set', 'em1', 'name', 'lan0']),
+            mock.call(['ip', 'link', 'set', 'em3', 'name', 'lan2']),
+        ]
@@ -0,0 +1,190 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for the ``crucible.network.inventory`` module.
+"""
+import json
+import os
+
+import mock
+import pytest
+
+from crucible.network import inventory
+
+
+def write_json(path, nics) -> None:
+    """
+    Writes a JSON inventory.
+
+    :param path: Path to write to.
+    :param nics: NIC entries.
+    """
+    with open(path, 'w', encoding='utf-8') as inventory_file:
+        json.dump(nics, inventory_file)
+
+
+class TestInventory:
+    """
+    Tests for offline udev rule generation.
+    """
+
+    def test_read_inventory_csv(self, tmp_path) -> None:
+        """
+        Assert CSV inventories are read, and a ``pci_id`` is split into the
+        vendor and device IDs.
+        """
+        path = tmp_path / 'ncn-m001.csv'
+        path.write_text(
+            'name,mac,pci_id,pci_path\n'
+            'eth0,b8:59:9f:00:00:01,15b3:1015,0000:41:00.0\n',
+            encoding='utf-8',
+        )
+        nics = inventory.read_inventory(str(path))
+        assert len(nics) == 1
+        assert nics[0].name == 'eth0'
+        assert nics[0].vendor_id == '15b3'
+        assert nics[0].device_id == '1015'
+
+    def test_read_inventory_csv_short_row(self, tmp_path) -> None:
+        """
+        Assert a CSV row missing its trailing columns reads them as empty.
+        """
+        path = tmp_path / 'ncn-m001.csv'
+        path.write_text(
+            'name,mac,vendor_id,device_id\n'
+            'eth0,b8:59:9f:00:00:01,15b3\n',
+            encoding='utf-8',
+        )
+        nics = inventory.read_inventory(str(path))
+        assert nics[0].vendor_id == '15b3'
+        assert nics[0].device_id == ''
+
+    def test_read_inventory_invalid(self, tmp_path) -> None:
+        """
+        Assert unreadable inventories raise an ``InventoryError``.
+        """
+        path = tmp_path / 'ncn-m001.json'
+        path.write_text('{"nics": [{"name": "eth0"}]}', encoding='utf-8')
+        with pytest.raises(inventory.InventoryError):
+            inventory.read_inventory(str(path))
+        path.write_text('not json', encoding='utf-8')
+        with pytest.raises(inventory.InventoryError):
+            inventory.read_inventory(str(path))
+        for nics in (
+                '["eth0"]',
+                '[null]',
+                '[{"name": "eth0", "pci_id": 1}]',
+                '[{"name": "eth0", "mac": "b8:59:9f:00:00:01", '
+                '"vendor_id": "15b3", "device_id": 4119}]',
+        ):
+            path.write_text(nics, encoding='utf-8')
+            with pytest.raises(inventory.InventoryError):
+                inventory.read_inventory(str(path))
+
+    def test_generate_unwritable(self, tmp_path) -> None:
+        """
+        Assert a rules file that can not be written is reported as the
+        node's error.
+        """
+        path = tmp_path / 'ncn-w001.json'
+        write_json(path, [
+            {'name': 'eth0', 'mac': 'b8:59:9f:00:00:01',
+             'vendor_id': '15b3', 'device_id': '1015'},
+        ])
+        summary = inventory.generate(str(path), str(tmp_path / 'missing'))
+        assert summary['error'].startswith('Could not write')
+
+    @mock.patch(
+        'crucible.network.inventory.ifname.get_new_names',
+        side_effect=AttributeError('strip'),
+    )
+    def test_generate_failure(self, _, tmp_path) -> None:
+        """
+        Assert any failure naming a node's NICs is reported as the node's
+        error instead of being raised.
+        """
+        path = tmp_path / 'ncn-w001.json'
+        write_json(path, [
+            {'name': 'eth0', 'mac': 'b8:59:9f:00:00:01',
+             'vendor_id': '15b3', 'device_id': '1015'},
+        ])
+        summary = inventory.generate(str(path), str(tmp_path))
+        assert summary['error'].startswith('Could not generate rules')
+        assert not (tmp_path / 'ncn-w001.rules').exists()
+
+    def test_generate_collision(self, tmp_path) -> None:
+        """
+        Assert NICs sharing a MAC are reported as a collision, and only one
+        rule is written for the MAC.
+        """
+        path = tmp_path / 'ncn-w001.json'
+        write_json(path, [
+            {'name': 'eth0', 'mac': 'b8:59:9f:00:00:01',
+             'vendor_id': '15b3', 'device_id': '1015'},
+            {'name': 'eth1', 'mac': 'b8:59:9f:00:00:01',
+             'vendor_id': '15b3', 'device_id': '1015'},
+        ])
+        summary = inventory.generate(str(path), str(tmp_path))
+        assert summary['nics'] == 2
+        assert len(summary['collisions']) == 1
+        rules = (tmp_path / 'ncn-w001.rules').read_text(encoding='utf-8')
+        assert rules.count('b8:59:9f:00:00:01') == 1
+
+    def test_run(self, tmp_path) -> None:
+        """
+        Assert a rule file is written for every node, and bad inventories
+        are reported without stopping the run.
+        """
+        source = tmp_path / 'inventory'
+        output = tmp_path / 'rules'
+        source.mkdir()
+        for node in range(1, 6):
+            write_json(source / f'ncn-w00{node}.json', {'nics': [
+                {'name': 'eth0', 'mac': f'b8:59:9f:00:00:0{node}',
+                 'vendor_id': '15b3', 'device_id': '1015'},
+                {'name': 'eth1', 'mac': f'b8:59:9f:00:01:0{node}',
+                 'vendor_id': '17db', 'device_id': '0501'},
+            ]})
+        (source / 'ncn-w006.json').write_text('[', encoding='utf-8')
+        write_json(source / 'ncn-w007.json', [
+            {'name': 'eth0', 'mac': 'b8:59:9f:00:00:07',
+             'vendor_id': '15b3', 'device_id': 4119},
+        ])
+        (source / 'README').write_text('ignored', encoding='utf-8')
+        summary = inventory.run(str(source), str(output), workers=2)
+        assert summary['nodes'] == 5
+        assert summary['nics'] == 10
+        assert not summary['collisions']
+        assert sorted(summary['errors']) == ['ncn-w006', 'ncn-w007']
+        assert sorted(os.listdir(output)) == [
+            'ncn-w001.rules',
+            'ncn-w002.rules',
+            'ncn-w003.rules',
+            'ncn-w004.rules',
+            'ncn-w005.rules',
+            inventory.SUMMARY_FILE,
+        ]
+        rules = (output / 'ncn-w001.rules').read_text(encoding='utf-8')
+        assert 'NAME="mgmt0"' in rules
+        assert 'NAME="hsn0"' in rules
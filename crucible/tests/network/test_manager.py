@@ -0,0 +1,117 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for the ``crucible.network.manager`` module.
+"""
+import mock
+import pytest
+
+from crucible.network import manager
+
+
+def interfaces(*options) -> list[manager.Interface]:
+    """
+    Returns interfaces for the given options.
+    :param options: Keyword arguments for each ``Interface``.
+    """
+    return [manager.Interface(noip=True, **option) for option in options]
+
+
+class TestDependencyOrder:
+    """
+    Tests for ordering interfaces by their dependencies.
+    """
+
+    def test_topology(self) -> None:
+        """
+        Asserts members come before bonds, bonds before VLANs, and VLANs
+        before bridges, whatever order they were given in.
+        """
+        ordered = manager.dependency_order(interfaces(
+            {'interface': 'virbr0', 'members': 'bond0.cmn0'},
+            {'interface': 'bond0.cmn0', 'members': 'bond0', 'vlan_id': 7},
+            {'interface': 'bond0.nmn0', 'members': 'bond0', 'vlan_id': 2},
+            {'interface': 'bond0', 'members': 'mgmt0,mgmt1'},
+            {'interface': 'mgmt1'},
+            {'interface': 'lan0'},
+            {'interface': 'mgmt0'},
+        ))
+        assert [interface.name for interface in ordered] == [
+            'mgmt1',
+            'lan0',
+            'mgmt0',
+            'bond0',
+            'bond0.cmn0',
+            'bond0.nmn0',
+            'virbr0',
+        ]
+
+    def test_cycle(self) -> None:
+        """
+        Asserts interfaces that depend on each other are refused.
+        """
+        with pytest.raises(manager.InterfaceError):
+            manager.dependency_order(interfaces(
+                {'interface': 'bond0', 'members': 'bond1'},
+                {'interface': 'bond1', 'members': 'bond0'},
+            ))
+
+
+class TestReloader:
+    """
+    Tests for reloading interfaces together.
+    """
+
+    def test_reload(self) -> None:
+        """
+        Asserts every added interface is reloaded with one call, in order,
+        and only once.
+        """
+        network_manager = mock.Mock(spec=manager.SystemNetwork)
+        reloader = manager.Reloader(network_manager)
+        bond, vlan, nic = interfaces(
+            {'interface': 'bond0', 'members': 'mgmt0'},
+            {'interface': 'bond0.nmn0', 'members': 'bond0', 'vlan_id': 2},
+            {'interface': 'mgmt0'},
+        )
+        for interface in (vlan, bond, nic, bond):
+            reloader.add(interface)
+        assert reloader.reload() == ['mgmt0', 'bond0', 'bond0.nmn0']
+        network_manager.reload_interfaces.assert_called_once_with(
+            ['mgmt0', 'bond0', 'bond0.nmn0']
+        )
+
+    def test_reload_nothing(self) -> None:
+        """
+        Asserts nothing is reloaded when no interface changed, or after the
+        changed interfaces were reloaded.
+        """
+        network_manager = mock.Mock(spec=manager.SystemNetwork)
+        reloader = manager.Reloader(network_manager)
+        assert not reloader.reload()
+        network_manager.reload_interfaces.assert_not_called()
+        reloader.add(manager.Interface(interface='lan0', dhcp=True))
+        assert reloader.reload() == ['lan0']
+        assert not reloader.reload()
+        network_manager.reload_interfaces.assert_called_once_with(['lan0'])
@@ -0,0 +1,189 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Tests for the ``crucible.network.netlink`` module.
+"""
+# pylint: disable=protected-access
+import platform
+import socket
+import struct
+
+import mock
+import pytest
+
+from crucible.network import netlink
+
+
+def rtattr(attr_type: int, payload: bytes) -> bytes:
+    """
+    Packs a padded ``rtattr``.
+
+    :param attr_type: The attribute type.
+    :param payload: The attribute payload.
+    """
+    length = netlink._RTATTR.size + len(payload)
+    padding = b'\0' * (netlink._align(length) - length)
+    return netlink._RTATTR.pack(length, attr_type) + payload + padding
+
+
+def newlink(index: int, name: str, flags: int, perm: bytes) -> bytes:
+    """
+    Packs a ``RTM_NEWLINK`` message as the kernel would send it.
+
+    :param index: Interface index.
+    :param name: Interface name.
+    :param flags: ``IFF_*`` flags.
+    :param perm: Permanent hardware address.
+    """
+    payload = netlink._IFINFOMSG.pack(socket.AF_UNSPEC, 1, index, flags, 0)
+    payload += rtattr(netlink.IFLA_IFNAME, name.encode() + b'\0')
+    payload += rtattr(netlink.IFLA_ADDRESS, b'\x02\0\0\0\0\x01')
+    payload += rtattr(netlink.IFLA_OPERSTATE, bytes([6]))
+    payload += rtattr(netlink.IFLA_PERM_ADDRESS, perm)
+    header = netlink._NLMSGHDR.pack(
+        netlink._NLMSGHDR.size + len(payload),
+        netlink.RTM_NEWLINK,
+        netlink.NLM_F_MULTI,
+        1,
+        0,
+    )
+    return header + payload
+
+
+class TestNetlink:
+    """
+    Tests for the netlink parsers and socket.
+    """
+
+    def test_parse_messages(self) -> None:
+        """
+        Asserts a buffer with several messages is split and each link is
+        parsed with its permanent address and state.
+        """
+        data = newlink(2, 'em1', netlink.IFF_UP, b'\xa4\xbf\x01\x38\xf1\x40')
+        data += newlink(3, 'em2', 0, b'\xa4\xbf\x01\x38\xf1\x41')
+        data += netlink._NLMSGHDR.pack(20, netlink.NLMSG_DONE, 0, 1, 0)
+        data += struct.pack('=i', 0)
+        messages = netlink.parse_messages(data)
+        assert [message[0] for message in messages] == [
+            netlink.RTM_NEWLINK,
+            netlink.RTM_NEWLINK,
+            netlink.NLMSG_DONE,
+        ]
+        links = [netlink.parse_link(message[3]) for message in messages[:2]]
+        assert links[0].index == 2
+        assert links[0].name == 'em1'
+        assert links[0].is_up
+        assert links[0].operstate == 'up'
+        assert links[0].perm_address == 'a4:bf:01:38:f1:40'
+        assert links[1].name == 'em2'
+        assert not links[1].is_up
+
+    def test_parse_truncated(self) -> None:
+        """
+        Asserts a truncated buffer does not raise.
+        """
+        data = newlink(2, 'em1', 0, b'\0' * 6)
+        assert len(netlink.parse_messages(data[:-4])) == 1
+        assert not netlink.parse_messages(data[:8])
+
+    @pytest.mark.skipif(platform.system() != 'Linux', reason='Linux only')
+    def test_dump_links(self) -> None:
+        """
+        Asserts the loopback device is found in a live dump.
+        """
+        links = netlink.dump_links()
+        assert 'lo' in links
+        assert links['lo'].index > 0
+
+    def test_set_link(self) -> None:
+        """
+        Asserts a rename and a state change are packed into a single
+        ``RTM_SETLINK`` request that waits for an acknowledgement.
+        """
+        with mock.patch('crucible.network.netlink.socket.socket') as sock:
+            ack = netlink._NLMSGHDR.pack(36, netlink.NLMSG_ERROR, 0, 1, 0)
+            ack += struct.pack('=i', 0) + b'\0' * 16
+            sock.return_value.recv.return_value = ack
+            with netlink.Netlink() as netlink_socket:
+                netlink_socket.set_link(7, name='mgmt0', up=True)
+            request = sock.return_value.send.call_args.args[0]
+        messages = netlink.parse_messages(request)
+        assert len(messages) == 1
+        msg_type, flags, _, payload = messages[0]
+        assert msg_type == netlink.RTM_SETLINK
+        assert flags & netlink.NLM_F_ACK
+        _, _, index, if_flags, change = netlink._IFINFOMSG.unpack_from(
+            payload
+        )
+        assert (index, if_flags, change) == (7, netlink.IFF_UP, netlink.IFF_UP)
+        attributes = netlink.parse_attributes(payload, netlink._IFINFOMSG.size)
+        assert attributes[netlink.IFLA_IFNAME] == b'mgmt0\0'
+
+
+class TestUeventMonitor:
+    """
+    Tests for the uevent listener.
+    """
+
+    def test_parse_uevent(self) -> None:
+        """
+        Asserts kernel uevents are parsed and udevd re-broadcasts ignored.
+        """
+        event = netlink.parse_uevent(
+            b'add@/devices/pci0000:00/0000:00:03.0/net/eth2\0ACTION=add\0'
+            b'DEVPATH=/devices/pci0000:00/0000:00:03.0/net/eth2\0'
+            b'SUBSYSTEM=net\0INTERFACE=eth2\0IFINDEX=5\0SEQNUM=2101\0'
+        )
+        assert event['ACTION'] == 'add'
+        assert event['SUBSYSTEM'] == 'net'
+        assert event['INTERFACE'] == 'eth2'
+        assert not netlink.parse_uevent(b'libudev\0\xfe\xed\xca\xfe')
+
+    def test_collect_debounce(self) -> None:
+        """
+        Asserts a burst of matching events is collected together, and events
+        that do not match are skipped.
+        """
+        events = [
+            {'ACTION': 'add', 'SUBSYSTEM': 'pci'},
+            {'ACTION': 'add', 'SUBSYSTEM': 'net', 'INTERFACE': 'eth2'},
+            {'ACTION': 'add', 'SUBSYSTEM': 'net', 'INTERFACE': 'eth3'},
+            None,
+        ]
+        with mock.patch('crucible.network.netlink.socket.socket'):
+            monitor = netlink.UeventMonitor()
+        with mock.patch.object(
+                monitor,
+                'receive',
+                side_effect=events,
+        ) as mock_receive:
+            collected = monitor.collect(
+                lambda event: event.get('SUBSYSTEM') == 'net',
+                debounce=0,
+            )
+        assert [event['INTERFACE'] for event in collected] == ['eth2', 'eth3']
+        assert mock_receive.mock_calls[0] == mock.call(None)
@@ -0,0 +1,74 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for the ``crucible.network.networkmanager`` module.
+"""
+import mock
+
+from crucible.network import networkmanager
+
+
+class TestNetworkManager:
+    """
+    Tests for the NetworkManager network manager.
+    """
+
+    def test_connection_file(self) -> None:
+        """
+        Asserts that connections are keyfiles in the install location.
+        """
+        assert networkmanager.NetworkManager().connection_file('bond0') == \
+            '/etc/NetworkManager/system-connections/bond0.nmconnection'
+
+    @mock.patch('crucible.network.networkmanager.run_commands')
+    @mock.patch('crucible.network.networkmanager.run_command')
+    def test_reload_interfaces(self, mock_run, mock_run_commands, tmp_path):
+        """
+        Asserts that only the interfaces' connection files are loaded, not
+        every connection on the host, before each is brought up in order.
+        """
+        mock_run_commands.return_value = [
+            mock.Mock(return_code=0), mock.Mock(return_code=0),
+        ]
+        (tmp_path / 'bond0.nmconnection').write_text('[connection]\n')
+        with mock.patch.object(
+                networkmanager.NetworkManager,
+                'install_location',
+                str(tmp_path)
+        ):
+            networkmanager.NetworkManager().reload_interfaces(
+                ['bond0', 'bond0.nmn0']
+            )
+        assert mock_run.mock_calls == [
+            mock.call([
+                'nmcli', 'connection', 'load',
+                str(tmp_path / 'bond0.nmconnection'),
+            ]),
+            mock.call(['nmcli', 'connection', 'up', 'bond0']),
+            mock.call(['nmcli', 'connection', 'up', 'bond0.nmn0']),
+        ]
+        mock_run_commands.assert_called_once_with([
+            ['ip', 'l', 'show', 'bond0'],
+            ['ip', 'l', 'show', 'bond0.nmn0'],
+        ])
@@ -0,0 +1,85 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Tests for the ``crucible.network.render`` module.
+"""
+# pylint: disable=protected-access
+import jinja2
+import mock
+
+from crucible.network import render
+from crucible.network.manager import Interface
+
+
+class TestRender:
+    """
+    Tests for the template registry.
+    """
+
+    def test_environment_shared(self) -> None:
+        """
+        Asserts templates are loaded once per process.
+        """
+        assert render.environment() is render.environment()
+        first = render.get_template('sysconfig/ifcfg.j2')
+        assert render.get_template('sysconfig/ifcfg.j2') is first
+
+    def test_filters(self) -> None:
+        """
+        Asserts the ``j2ipaddr`` filters are available to templates.
+        """
+        interface = Interface(interface='lan0', cidr='192.168.1.2/24')
+        content = render.render('sysconfig/ifcfg.j2', interface=interface)
+        assert 'IPADDR=192.168.1.2\n' in content
+        assert 'PREFIXLEN=24\n' in content
+
+    def test_compile_templates(self, tmp_path) -> None:
+        """
+        Asserts precompiled templates render the same as the sources.
+        """
+        render.compile_templates(str(tmp_path))
+        env = render._new_environment(jinja2.ModuleLoader(str(tmp_path)))
+        interface = Interface(
+            interface='bond0',
+            cidr='10.1.1.2/16',
+            members='mgmt0,mgmt1',
+        )
+        for name in ['sysconfig/ifcfg.j2', 'sysconfig/ifroute.j2']:
+            assert env.get_template(name).render(interface=interface) == \
+                render.render(name, interface=interface)
+
+    def test_no_bytecode_cache(self, tmp_path) -> None:
+        """
+        Asserts an unwritable cache directory disables the bytecode cache.
+        """
+        with mock.patch(
+                'crucible.network.render.BYTECODE_CACHE_DIRECTORY',
+                str(tmp_path / 'cache'),
+        ), mock.patch(
+            'crucible.network.render.os.access',
+            return_value=False,
+        ):
+            assert render._bytecode_cache() is None
@@ -29,8 +29,9 @@ Tests for the ``crucible.network.ifname`` module.
 import os
 
 import mock
-from mock import mock_open
+import pytest
 
+from crucible.network import manager
 from crucible.network import sysconfig
 
 
@@ -53,6 +54,75 @@ class TestSysconfig:
         assert str(self.network_manager) == self.network_manager.name
 
 
+class TestSysconfigFile:
+    """
+    Tests for editing sysconfig files.
+    """
+
+    def test_update(self, tmp_path) -> None:
+        """
+        Asserts values are read unquoted, and written quoted.
+        """
+        path = tmp_path / 'config'
+        path.write_text(
+            "# A comment\n"
+            "SINGLE='a b'\n"
+            'ESCAPED="say \\"hi\\""\n'
+            'BARE=yes'
+        )
+        config = sysconfig.SysconfigFile(str(path))
+        assert config['SINGLE'] == 'a b'
+        assert config['ESCAPED'] == 'say "hi"'
+        assert config['BARE'] == 'yes'
+        assert not config.update({'SINGLE': 'a b', 'BARE': 'yes'})
+        assert config.update({'ESCAPED': '$HOME', 'NEW': 1})
+        config.write()
+        assert path.read_text() == (
+            "# A comment\n"
+            "SINGLE='a b'\n"
+            'ESCAPED="\\$HOME"\n'
+            'BARE=yes\n'
+            'NEW="1"\n'
+        )
+        with pytest.raises(ValueError):
+            config.update({'NOT A KEY': ''})
+
+    def test_update_comment(self, tmp_path) -> None:
+        """
+        Asserts a comment after a value is ignored when reading, and kept
+        when the value is changed.
+        """
+        path = tmp_path / 'config'
+        path.write_text(
+            'QUOTED="a # b" # Quoted.\n'
+            'BARE=yes # Bare.\n'
+        )
+        config = sysconfig.SysconfigFile(str(path))
+        assert config['QUOTED'] == 'a # b'
+        assert config['BARE'] == 'yes'
+        assert config.update({'QUOTED': 'c', 'BARE': 'no'})
+        config.write()
+        assert path.read_text() == (
+            'QUOTED="c" # Quoted.\n'
+            'BARE="no" # Bare.\n'
+        )
+
+    def test_items(self, tmp_path) -> None:
+        """
+        Asserts every key is returned with its unquoted value.
+        """
+        path = tmp_path / 'ifcfg-bond0'
+        path.write_text(
+            "BONDING_MODULE_OPTS='mode=802.3ad miimon=100'\n"
+            '# BONDING_SLAVE_1=mgmt1\n'
+            'BONDING_SLAVE_0="mgmt0"\n'
+        )
+        assert sysconfig.SysconfigFile(str(path)).items() == {
+            'BONDING_MODULE_OPTS': 'mode=802.3ad miimon=100',
+            'BONDING_SLAVE_0': 'mgmt0',
+        }
+
+
 class TestWicked(TestSysconfig):
     """
     Tests for the wicked network manager.
@@ -71,6 +141,19 @@ NETCONFIG_DNS_STATIC_SEARCHLIST="foo bar"
         """
         self.network_manager = sysconfig.Wicked()
 
+    @pytest.fixture
+    def install_location(self, tmp_path) -> None:
+        """
+        Writes configuration files to a temporary directory.
+        :param tmp_path: The temporary directory.
+        """
+        with mock.patch.object(
+                sysconfig.Wicked,
+                'install_location',
+                str(tmp_path)
+        ):
+            yield tmp_path
+
     @mock.patch('crucible.network.sysconfig.os.unlink', spec=True)
     def test_remove_config(self, mock_unlink) -> None:
         """
@@ -89,110 +172,346 @@ NETCONFIG_DNS_STATIC_SEARCHLIST="foo bar"
             f'ifroute-{self.network_manager.interface.name}'
         )
 
-    # FIXME: Check file content.
-    # TODO: Check call to ``netconfig update -f``
-    def test_update_dns(self) -> None:
+    @mock.patch('crucible.network.sysconfig.run_commands', spec=True)
+    @mock.patch('crucible.network.sysconfig.run_command', spec=True)
+    def test_reload_interfaces(self, mock_run, mock_run_commands) -> None:
+        """
+        Asserts interfaces are reloaded with one ``wicked ifreload``, and
+        wickedd-nanny is restarted at most once.
+        """
+        names = ['mgmt0', 'bond0', 'bond0.nmn0']
+        mock_run_commands.return_value = [
+            mock.Mock(return_code=code) for code in (0, 1, 1)
+        ]
+        self.network_manager.reload_interfaces(names)
+        assert [call.args[0] for call in mock_run.call_args_list] == [
+            ['wicked', 'ifreload'] + names,
+            ['systemctl', 'restart', 'wickedd-nanny'],
+        ]
+
+    @mock.patch('crucible.network.sysconfig.run_command', spec=True)
+    def test_update_dns(self, mock_run, install_location) -> None:
         """
         Asserts that DNS servers are written to file, and system call to
         update ``/etc/resolv.conf`` was made.
         """
-        self.network_manager.dns = '8.8.8.8,8.8.4.4'
-        with mock.patch(
-                'crucible.network.sysconfig.open',
-                mock_open(read_data=self.mock_config_no_values)
-        ) as mock_config:
-            self.network_manager.update_dns()
-            assert mock_config
-        with mock.patch(
-                'crucible.network.sysconfig.open',
-                mock_open(read_data=self.mock_config_with_values)
-        ) as mock_config:
+        config = install_location / 'config'
+        for content in (self.mock_config_no_values,
+                        self.mock_config_with_values):
+            config.write_text(content)
+            self.network_manager.dns = '8.8.8.8,8.8.4.4'
             self.network_manager.update_dns()
-            assert mock_config
+            assert 'NETCONFIG_DNS_STATIC_SERVERS="8.8.8.8 8.8.4.4"\n' in \
+                config.read_text()
+        mock_run.assert_called_with(['netconfig', 'update', '-f'])
 
-
-    # FIXME: Check file content.
-    # TODO: Check call to ``netconfig update -f``
-    def test_update_search(self) -> None:
+    @mock.patch('crucible.network.sysconfig.run_command', spec=True)
+    def test_update_search(self, mock_run, install_location) -> None:
         """
         Asserts that search domains are written to file, and system call to
         update ``/etc/resolv.conf`` was made.
         """
-        self.network_manager.search = 'baz bax'
-        with mock.patch(
-                'crucible.network.sysconfig.open',
-                mock_open(read_data=self.mock_config_no_values)
-        ) as mock_config:
+        config = install_location / 'config'
+        for content in (self.mock_config_no_values,
+                        self.mock_config_with_values):
+            config.write_text(content)
+            self.network_manager.search = 'baz,bax'
             self.network_manager.update_search()
-            assert mock_config
-        with mock.patch(
-                'crucible.network.sysconfig.open',
-                mock_open(read_data=self.mock_config_with_values)
-        ) as mock_config:
-            self.network_manager.update_search()
-            assert mock_config
+            assert 'NETCONFIG_DNS_STATIC_SEARCHLIST="baz bax"\n' in \
+                config.read_text()
+        mock_run.assert_called_with(['netconfig', 'update', '-f'])
 
-    def test_write_config_dhcp(self) -> None:
+    @mock.patch('crucible.network.sysconfig.run_command', spec=True)
+    def test_update_system(self, mock_run, install_location) -> None:
         """
-        Asserts that an ifcfg file with DHCP is written.
+        Asserts that DNS servers, search domains, and other keys are written
+        in one pass with one ``netconfig update``, keeping comments, and that
+        nothing is done when nothing changed.
         """
-        with mock.patch(
-                'crucible.network.sysconfig.open', mock_open()
-        ):
-            self.network_manager.interface.name = 'mgmt0'
-            self.network_manager.interface.dhcp = True
-            self.network_manager.write_config()
-            # TODO: Test written files.
+        config = install_location / 'config'
+        config.write_text(
+            '## Type: string\n'
+            'NETCONFIG_DNS_POLICY="auto"\n'
+            '\n' + self.mock_config_with_values
+        )
+        self.network_manager.dns = '8.8.8.8'
+        self.network_manager.search = 'nmn,hmn'
+        assert self.network_manager.update_system(
+            NETCONFIG_DNS_POLICY='STATIC',
+            NETCONFIG_NTP_POLICY='',
+        )
+        assert config.read_text() == (
+            '## Type: string\n'
+            'NETCONFIG_DNS_POLICY="STATIC"\n'
+            '\n'
+            'NETCONFIG_DNS_STATIC_SERVERS="8.8.8.8"\n'
+            'NETCONFIG_DNS_STATIC_SEARCHLIST="nmn hmn"\n'
+            'NETCONFIG_NTP_POLICY=""\n'
+        )
+        mock_run.assert_called_once_with(['netconfig', 'update', '-f'])
+        mock_run.reset_mock()
+        with mock.patch('crucible.network.sysconfig.atomic_write') as write:
+            assert not self.network_manager.update_system(
+                NETCONFIG_DNS_POLICY='STATIC'
+            )
+            write.assert_not_called()
+        mock_run.assert_not_called()
+
+    @mock.patch('crucible.network.sysconfig.run_command', spec=True)
+    def test_update_only_given(self, _, install_location) -> None:
+        """
+        Asserts that only the given settings are written: DNS servers
+        without search domains leave the search list alone, and vice versa.
+        """
+        config = install_location / 'config'
+        config.write_text(self.mock_config_with_values)
+        self.network_manager.dns = '8.8.8.8'
+        self.network_manager.search = 'nmn'
+        self.network_manager.update_dns()
+        assert 'NETCONFIG_DNS_STATIC_SEARCHLIST="foo bar"\n' in \
+            config.read_text()
+        self.network_manager.update_search()
+        assert 'NETCONFIG_DNS_STATIC_SEARCHLIST="nmn"\n' in config.read_text()
+        config.write_text(self.mock_config_with_values)
+        only_dns = sysconfig.Wicked(dns='1.1.1.1')
+        assert only_dns.update_system()
+        assert config.read_text() == (
+            'NETCONFIG_DNS_STATIC_SERVERS="1.1.1.1"\n'
+            'NETCONFIG_DNS_STATIC_SEARCHLIST="foo bar"\n'
+        )
 
-    def test_write_config_static(self) -> None:
+    def test_write_config_dhcp(self, install_location) -> None:
         """
         Asserts that an ifcfg file with DHCP is written.
         """
-        with mock.patch(
-                'crucible.network.sysconfig.open', mock_open()
-        ):
-            self.network_manager.interface.name = 'lan0'
-            self.network_manager.interface.ipaddr = '192.168.1.2/24'
-            self.network_manager.interface.is_default_route = True
-            self.network_manager.write_config()
-            # TODO: Test written files.
+        self.network_manager.interface.name = 'mgmt0'
+        self.network_manager.interface.dhcp = True
+        assert self.network_manager.write_config() == manager.CREATED
+        assert 'BOOTPROTO=dhcp' in \
+            (install_location / 'ifcfg-mgmt0').read_text()
 
-    def test_write_config_bond(self) -> None:
+    def test_write_config_static(self, install_location) -> None:
+        """
+        Asserts that an ifcfg and ifroute file with a static IP are written.
+        """
+        self.network_manager.interface.name = 'lan0'
+        self.network_manager.interface.ipaddr = '192.168.1.2/24'
+        self.network_manager.interface.is_default_route = True
+        assert self.network_manager.write_config() == manager.CREATED
+        assert 'IPADDR=192.168.1.2' in \
+            (install_location / 'ifcfg-lan0').read_text()
+        assert 'default 192.168.1.1 - lan0' in \
+            (install_location / 'ifroute-lan0').read_text()
+
+    def test_write_config_bond(self, install_location) -> None:
         """
         Asserts that an ifcfg file with bond is written.
         """
-        with mock.patch(
-                'crucible.network.sysconfig.open', mock_open()
-        ):
-            self.network_manager.interface.name = 'bond0'
-            self.network_manager.interface.ipaddr = '192.168.1.2/24'
-            self.network_manager.interface.members = ['mgmt0', 'mgmt1']
-            self.network_manager.write_config()
-            # TODO: Test written files.
+        self.network_manager.interface.name = 'bond0'
+        self.network_manager.interface.ipaddr = '192.168.1.2/24'
+        self.network_manager.interface.members = ['mgmt0', 'mgmt1']
+        self.network_manager.write_config()
+        content = (install_location / 'ifcfg-bond0').read_text()
+        assert 'BONDING_SLAVE_0=mgmt0' in content
+        assert 'BONDING_SLAVE_1=mgmt1' in content
 
-    def test_write_config_bridge(self) -> None:
+    def test_write_config_bridge(self, install_location) -> None:
         """
         Asserts that an ifcfg file for a bridge is written.
         """
-        with mock.patch(
-                'crucible.network.sysconfig.open', mock_open()
-        ):
-            self.network_manager.interface.name = 'virbr0'
-            self.network_manager.interface.ipaddr = '192.168.1.2/24'
-            self.network_manager.interface.members = ['bond0']
-            self.network_manager.write_config()
-            # TODO: Test written files.
+        self.network_manager.interface.name = 'virbr0'
+        self.network_manager.interface.ipaddr = '192.168.1.2/24'
+        self.network_manager.interface.members = ['bond0']
+        self.network_manager.write_config()
+        assert 'BRIDGE_PORTS=bond0' in \
+            (install_location / 'ifcfg-virbr0').read_text()
 
-    def test_write_config_vlan(self) -> None:
+    def test_write_config_vlan(self, install_location) -> None:
         """
         Asserts that an ifcfg file for a VLAN is written.
         """
+        self.network_manager.interface.name = 'bond0.nmn0'
+        self.network_manager.interface.ipaddr = '192.168.1.2/24'
+        self.network_manager.interface.vlan_id = 2
+        self.network_manager.interface.members = ['bond0']
+        self.network_manager.write_config()
+        content = (install_location / 'ifcfg-bond0.nmn0').read_text()
+        assert 'ETHERDEVICE=bond0' in content
+        assert 'VLAN_ID=2' in content
+
+    def test_write_config_unchanged(self, install_location) -> None:
+        """
+        Asserts that unchanged files are not written again, and changed files
+        are replaced (after asking).
+        """
+        self.network_manager.interface.name = 'lan0'
+        self.network_manager.interface.dhcp = True
+        assert self.network_manager.write_config() == manager.CREATED
+        ifcfg = install_location / 'ifcfg-lan0'
+        modified = ifcfg.stat().st_mtime_ns
+        with mock.patch('crucible.network.sysconfig.atomic_write') as write:
+            assert self.network_manager.write_config() == manager.UNCHANGED
+            write.assert_not_called()
+        assert ifcfg.stat().st_mtime_ns == modified
+        self.network_manager.interface.mtu = 1500
         with mock.patch(
-                'crucible.network.sysconfig.open', mock_open()
+                'crucible.network.sysconfig.click.prompt',
+                return_value='q'
         ):
-            self.network_manager.interface.name = 'bond0.nmn0'
-            self.network_manager.interface.ipaddr = '192.168.1.2/24'
-            self.network_manager.interface.vlan_id = 2
-            self.network_manager.interface.members = ['bond0']
-            self.network_manager.write_config()
-            # TODO: Test written files.
+            with pytest.raises(SystemExit):
+                self.network_manager.write_config()
+        assert 'MTU=9000' in ifcfg.read_text()
+        assert self.network_manager.write_config(overwrite=True) == \
+            manager.UPDATED
+        assert 'MTU=1500' in ifcfg.read_text()
+        assert not list(install_location.glob('.ifcfg-lan0.*'))
+
+
+class TestReadInterfaces:
+    """
+    Tests for reading the interfaces of ifcfg and ifroute files.
+    """
+
+    @pytest.fixture
+    def directory(self, tmp_path) -> None:
+        """
+        Writes the files of a bond, its NICs, and a VLAN on it to a temporary
+        directory, and keeps the cache in it.
+        :param tmp_path: The temporary directory.
+        """
+        directory = tmp_path / 'network'
+        directory.mkdir()
+        with mock.patch.object(
+                sysconfig.Wicked,
+                'install_location',
+                str(directory)
+        ), mock.patch(
+            'crucible.os.RUN_DIRECTORY',
+            str(tmp_path / 'cache')
+        ), mock.patch.dict(sysconfig._indexes, clear=True):
+            for options in (
+                    {'interface': 'mgmt0', 'noip': True},
+                    {'interface': 'mgmt1', 'noip': True},
+                    {
+                        'interface': 'bond0', 'noip': True,
+                        'members': 'mgmt0,mgmt1',
+                    },
+                    {
+                        'interface': 'bond0.nmn0', 'cidr': '10.252.1.4/17',
+                        'members': 'bond0', 'vlan_id': 2, 'mtu': 1500,
+                        'default': True, 'gateway': '10.252.0.1',
+                    },
+            ):
+                sysconfig.Wicked(**options).write_config()
+            (directory / 'ifcfg-mgmt0.rpmsave').write_text('BOOTPROTO=dhcp')
+            (directory / 'ifcfg-lo').write_text('BOOTPROTO=static')
+            (directory / 'config').write_text('NETCONFIG_DNS_POLICY=auto')
+            yield directory
+
+    def test_read_interfaces(self, directory) -> None:
+        """
+        Asserts that the files written by ``Wicked`` are read back, skipping
+        backups and ``lo``.
+        """
+        index = sysconfig.read_interfaces(str(directory))
+        assert [interface.name for interface in index] == [
+            'bond0', 'bond0.nmn0', 'mgmt0', 'mgmt1',
+        ]
+        assert sysconfig.describe(index.by_name['bond0']) == {
+            'name': 'bond0',
+            'kind': 'bond',
+            'bootproto': 'static',
+            'ip': None,
+            'members': ['mgmt0', 'mgmt1'],
+            'vlan_id': 0,
+            'mtu': 9000,
+            'default': False,
+            'gateway': None,
+        }
+        assert index.by_name['bond0'].bond_opts == manager.default_bond_opts
+        assert sysconfig.describe(index.by_name['bond0.nmn0']) == {
+            'name': 'bond0.nmn0',
+            'kind': 'vlan',
+            'bootproto': 'static',
+            'ip': '10.252.1.4/17',
+            'members': ['bond0'],
+            'vlan_id': 2,
+            'mtu': 1500,
+            'default': True,
+            'gateway': '10.252.0.1',
+        }
+
+    def test_find(self, directory) -> None:
+        """
+        Asserts that interfaces are found by name, parent, VLAN ID, and IP.
+        """
+        index = sysconfig.read_interfaces(str(directory))
+        assert [i.name for i in index.by_parent['mgmt1']] == ['bond0']
+        assert [i.name for i in index.by_vlan_id[2]] == ['bond0.nmn0']
+        assert [i.name for i in index.by_ip['10.252.1.4']] == ['bond0.nmn0']
+        assert [i.name for i in index.find(parent='bond0', vlan_id=2)] == \
+            ['bond0.nmn0']
+        assert [i.name for i in index.find(names=['mgmt1', 'nope'])] == \
+            ['mgmt1']
+        assert not index.find(parent='bond0', vlan_id=3)
+        assert len(index.find()) == len(index) == 4
+
+    def test_cache(self, directory) -> None:
+        """
+        Asserts that the files are only read again once the directory
+        changes, and that the cache outlives the process's memory.
+        """
+        first = sysconfig.read_interfaces(str(directory))
+        with mock.patch(
+                'crucible.network.sysconfig._read_directory',
+                wraps=sysconfig._read_directory,
+        ) as read_directory:
+            assert sysconfig.read_interfaces(str(directory)) is first
+            sysconfig._indexes.clear()
+            assert [i.name for i in sysconfig.read_interfaces(
+                str(directory)
+            )] == [i.name for i in first]
+            read_directory.assert_not_called()
+            (directory / 'ifcfg-mgmt2').write_text('BOOTPROTO=dhcp\n')
+            index = sysconfig.read_interfaces(str(directory))
+            read_directory.assert_called_once()
+        assert index.by_name['mgmt2'].dhcp
+
+    def test_cache_edited_in_place(self, directory) -> None:
+        """
+        Asserts that a file edited in place is read again, even though the
+        directory's modification time did not change.
+        """
+        assert sysconfig.read_interfaces(
+            str(directory)
+        ).by_name['mgmt0'].mtu == 9000
+        modified = os.stat(directory).st_mtime_ns
+        ifcfg = directory / 'ifcfg-mgmt0'
+        with open(ifcfg, 'r+', encoding='utf-8') as ifcfg_file:
+            content = ifcfg_file.read().replace('MTU=9000', 'MTU=1500')
+            ifcfg_file.seek(0)
+            ifcfg_file.write(content)
+            ifcfg_file.truncate()
+        assert os.stat(directory).st_mtime_ns == modified
+        sysconfig._indexes.clear()
+        assert sysconfig.read_interfaces(
+            str(directory)
+        ).by_name['mgmt0'].mtu == 1500
+
+    def test_cache_per_directory(self, directory, tmp_path) -> None:
+        """
+        Asserts that each directory has its own cache file.
+        """
+        other = tmp_path / 'other'
+        other.mkdir()
+        (other / 'ifcfg-lan0').write_text('BOOTPROTO=dhcp\n')
+        sysconfig.read_interfaces(str(directory))
+        sysconfig.read_interfaces(str(other))
+        assert len(os.listdir(tmp_path / 'cache')) == 2
+        sysconfig._indexes.clear()
+        with mock.patch(
+                'crucible.network.sysconfig._read_directory',
+        ) as read_directory:
+            assert len(sysconfig.read_interfaces(str(directory))) == 4
+            assert len(sysconfig.read_interfaces(str(other))) == 1
+        read_directory.assert_not_called()
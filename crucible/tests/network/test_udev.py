@@ -0,0 +1,185 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+"""
+Tests for the ``crucible.network.udev`` module.
+"""
+import os
+
+import mock
+
+from crucible.network import ifname
+from crucible.network import udev
+
+RULE = 'SUBSYSTEM=="net", ACTION=="add", DRIVERS=="?*", ' \
+       'ATTR{{address}}=="{mac}", ATTR{{type}}=="1", NAME="{name}"'
+
+HEADER = '# Made by crucible Python.'
+
+
+def rules(*pairs: tuple[str, str]) -> str:
+    """
+    Renders a rule file for ``(mac, name)`` pairs.
+
+    :param pairs: MACs and names.
+    """
+    lines = [HEADER] + [RULE.format(mac=mac, name=name) for mac, name in pairs]
+    return '\n'.join(lines)
+
+
+class TestRuleSet:
+    """
+    Tests for parsing and merging udev rules.
+    """
+
+    def test_parse(self) -> None:
+        """
+        Asserts rules are indexed by MAC and name, and other lines are kept.
+        """
+        rule_set = udev.RuleSet.parse(
+            rules(('A4:BF:01:38:F1:40', 'lan0'), ('b8:59:9f:fe:49:d5', 'mgmt0'))
+            + '\n\nSUBSYSTEM=="net", KERNEL=="ib*", NAME:="ib0"\n'
+        )
+        assert len(rule_set) == 2
+        assert rule_set.by_mac['a4:bf:01:38:f1:40'].name == 'lan0'
+        assert rule_set.by_name['mgmt0'].mac == 'b8:59:9f:fe:49:d5'
+        assert list(rule_set.other) == [
+            HEADER,
+            'SUBSYSTEM=="net", KERNEL=="ib*", NAME:="ib0"',
+        ]
+
+    def test_merge_collisions(self) -> None:
+        """
+        Asserts new rules replace old rules with the same MAC or name.
+        """
+        old = udev.RuleSet.parse(rules(
+            ('aa:00:00:00:00:01', 'lan0'),
+            ('aa:00:00:00:00:02', 'lan1'),
+            ('aa:00:00:00:00:03', 'mgmt0'),
+        ))
+        new = udev.RuleSet.parse(rules(
+            ('aa:00:00:00:00:01', 'mgmt0'),
+            ('aa:00:00:00:00:04', 'lan1'),
+        ))
+        collisions = old.merge(new)
+        assert sorted(
+            (replaced.name, rule.name) for replaced, rule in collisions
+        ) == [('lan0', 'mgmt0'), ('lan1', 'lan1'), ('mgmt0', 'mgmt0')]
+        assert {rule.mac: rule.name for rule in old} == {
+            'aa:00:00:00:00:01': 'mgmt0',
+            'aa:00:00:00:00:04': 'lan1',
+        }
+        assert old.issuperset(new)
+        assert old.render().count('NAME=') == 2
+
+
+class TestPlan:
+    """
+    Tests for planning udev rule changes.
+    """
+
+    def test_converged(self) -> None:
+        """
+        Asserts identical rules plan no changes.
+        """
+        existing = udev.RuleSet.parse(rules(('aa:00:00:00:00:01', 'lan0')))
+        desired = udev.RuleSet.parse(rules(('aa:00:00:00:00:01', 'lan0')))
+        assert not udev.plan_rules(udev.Plan(), desired, existing)
+
+    def test_merge(self) -> None:
+        """
+        Asserts only colliding rules are deleted when merging, and every
+        undesired rule is deleted when overwriting.
+        """
+        existing = udev.RuleSet.parse(rules(
+            ('aa:00:00:00:00:01', 'lan0'),
+            ('aa:00:00:00:00:02', 'lan1'),
+        ))
+        desired = udev.RuleSet.parse(rules(
+            ('aa:00:00:00:00:01', 'mgmt0'),
+        ))
+        plan = udev.plan_rules(udev.Plan(), desired, existing)
+        assert [rule.name for rule in plan.add_rules] == ['mgmt0']
+        assert [rule.name for rule in plan.delete_rules] == ['lan0']
+        plan = udev.plan_rules(udev.Plan(), desired, existing, overwrite=True)
+        assert [rule.name for rule in plan.delete_rules] == ['lan0', 'lan1']
+        assert plan.to_dict()['add_rules'] == [
+            RULE.format(mac='aa:00:00:00:00:01', name='mgmt0')
+        ]
+
+
+class TestWriteUdevRules:
+    """
+    Tests for writing the udev rule file.
+    """
+
+    def test_write(self, tmp_path) -> None:
+        """
+        Asserts a new file is written.
+        """
+        ifname.write_udev_rules(
+            rules(('aa:00:00:00:00:01', 'lan0')),
+            install_location=str(tmp_path),
+        )
+        with open(tmp_path / udev.RULES_FILE, 'r', encoding='utf-8') as file:
+            assert file.read() == rules(('aa:00:00:00:00:01', 'lan0')) + '\n'
+        assert os.listdir(tmp_path) == [udev.RULES_FILE]
+
+    def test_unchanged(self, tmp_path) -> None:
+        """
+        Asserts existing rules are not rewritten (or prompted for) when
+        nothing changed.
+        """
+        content = rules(('aa:00:00:00:00:01', 'lan0'))
+        (tmp_path / udev.RULES_FILE).write_text(content)
+        with mock.patch('crucible.network.ifname.atomic_write') as mock_write:
+            ifname.write_udev_rules(content, install_location=str(tmp_path))
+            ifname.write_udev_rules(
+                rules(('aa:00:00:00:00:01', 'lan0')),
+                install_location=str(tmp_path),
+                merge=True,
+            )
+        assert not mock_write.called
+
+    def test_merge(self, tmp_path) -> None:
+        """
+        Asserts merging replaces a conflicting rule without prompting.
+        """
+        (tmp_path / udev.RULES_FILE).write_text(rules(
+            ('aa:00:00:00:00:01', 'lan0'),
+            ('aa:00:00:00:00:02', 'lan1'),
+        ))
+        ifname.write_udev_rules(
+            rules(('aa:00:00:00:00:02', 'mgmt0')),
+            install_location=str(tmp_path),
+            merge=True,
+        )
+        written = udev.RuleSet.parse(
+            (tmp_path / udev.RULES_FILE).read_text()
+        )
+        assert {rule.mac: rule.name for rule in written} == {
+            'aa:00:00:00:00:01': 'lan0',
+            'aa:00:00:00:00:02': 'mgmt0',
+        }
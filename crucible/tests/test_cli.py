@@ -26,11 +26,28 @@ Tests the ``crucible`` command line.
 """
 # pylint: disable=attribute-defined-outside-init
 from importlib import metadata
+import json
+import subprocess
+import sys
 
 import mock
 from click.testing import CliRunner
 
+from crucible import trace
 from crucible.cli import crucible
+from crucible.network import config
+
+# Modules only sub-commands need, which importing the CLI must not import.
+LAZY_MODULES = (
+    'asyncio',
+    'crucible.os',
+    'j2ipaddr',
+    'jinja2',
+    'netaddr',
+    'yaml',
+)
+# Microseconds importing the CLI may take, per ``python -X importtime``.
+IMPORT_BUDGET = 150000
 
 
 class TestCLI:
@@ -72,6 +89,32 @@ class TestCLI:
         assert version in result.stdout
         assert result.exit_code == 0
 
+    def test_import_budget(self) -> None:
+        """
+        Assert that importing the CLI only imports what ``--help`` needs, and
+        fits in ``IMPORT_BUDGET``.
+        """
+        result = subprocess.run(
+            [
+                sys.executable,
+                '-X',
+                'importtime',
+                '-c',
+                'import crucible.cli',
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+        assert not set(LAZY_MODULES).intersection(times)
+        assert times['crucible.cli'] < IMPORT_BUDGET
+
     def test_install_no_disks(self) -> None:
         """
         Tests that the ``install`` command fails if no disks are given.
@@ -345,6 +388,81 @@ class TestCLINetwork:
         )
         assert result.exit_code == 0
 
+    @mock.patch('crucible.cli.config.system', spec=True)
+    def test_network_system_set(self, mock_system) -> None:
+        """
+        Assert that ``--set`` passes other settings to ``config.system``.
+        """
+        result = self.runner.invoke(
+            crucible,
+            [
+                'network',
+                'system',
+                '--set',
+                'NETCONFIG_DNS_POLICY=auto',
+                '--set',
+                'NETCONFIG_NTP_POLICY=',
+            ]
+        )
+        assert result.exit_code == 0
+        assert mock_system.call_args.kwargs['settings'] == {
+            'NETCONFIG_DNS_POLICY': 'auto',
+            'NETCONFIG_NTP_POLICY': '',
+        }
+        result = self.runner.invoke(
+            crucible,
+            ['network', 'system', '--set', 'NETCONFIG_DNS_POLICY']
+        )
+        assert result.exit_code == 1
+
+    @mock.patch('crucible.cli.config.apply', spec=True)
+    def test_network_apply(self, mock_apply, tmp_path) -> None:
+        """
+        Assert that ``apply`` applies the given plan, and exits with the
+        error of an invalid plan.
+        """
+        plan = tmp_path / 'plan.yaml'
+        plan.write_text('interfaces: []')
+        result = self.runner.invoke(crucible, ['network', 'apply'])
+        assert result.exit_code == 2
+        result = self.runner.invoke(
+            crucible,
+            ['network', 'apply', '-f', str(plan), '--defer']
+        )
+        assert result.exit_code == 0
+        mock_apply.assert_called_once_with(str(plan), defer=True)
+        mock_apply.side_effect = config.NetworkError('Invalid plan.')
+        result = self.runner.invoke(
+            crucible,
+            ['network', 'apply', '--file', str(plan)]
+        )
+        assert result.exit_code == 1
+        assert 'Invalid plan.' in result.output
+
+    @mock.patch('crucible.cli.config.show', spec=True)
+    def test_network_show(self, mock_show) -> None:
+        """
+        Assert that ``show`` passes its filters, and exits with the error of
+        an unreadable directory.
+        """
+        result = self.runner.invoke(
+            crucible,
+            ['network', 'show', 'bond0.nmn0', '--vlan-id', '2', '--json']
+        )
+        assert result.exit_code == 0
+        mock_show.assert_called_once_with(
+            names=('bond0.nmn0',),
+            parent=None,
+            vlan_id=2,
+            ip=None,
+            as_json=True,
+            directory=None,
+        )
+        mock_show.side_effect = config.NetworkError('Could not read.')
+        result = self.runner.invoke(crucible, ['network', 'show'])
+        assert result.exit_code == 1
+        assert 'Could not read.' in result.output
+
     @mock.patch('crucible.cli.ifname.run', spec=True)
     def test_network_ifname(self, _) -> None:
         """
@@ -358,3 +476,76 @@ class TestCLINetwork:
             ]
         )
         assert result.exit_code == 0
+
+    @mock.patch('crucible.cli.inventory.run', spec=True)
+    def test_network_ifname_inventory(self, mock_run) -> None:
+        """
+        Assert that ``ifname`` hands ``--from-inventory`` to the inventory
+        generator.
+        """
+        result = self.runner.invoke(
+            crucible,
+            [
+                'network',
+                'udev',
+                '--from-inventory',
+                '.',
+                '--output',
+                'rules',
+            ]
+        )
+        assert result.exit_code == 0
+        mock_run.assert_called_once_with('.', 'rules', workers=None)
+
+    @mock.patch('crucible.cli.ifname.run', spec=True)
+    def test_trace(self, _, tmp_path) -> None:
+        """
+        Assert that ``--trace`` writes a span for the invoked command.
+        """
+        path = tmp_path / 'trace.json'
+        try:
+            result = self.runner.invoke(
+                crucible,
+                [
+                    '--trace',
+                    str(path),
+                    'network',
+                    'udev',
+                ]
+            )
+        finally:
+            trace.disable()
+        assert result.exit_code == 0
+        events = json.loads(path.read_text())['traceEvents']
+        assert [event['name'] for event in events] == ['network udev']
+
+    @mock.patch('crucible.cli.ifname.run', spec=True)
+    @mock.patch('crucible.cli.set_level', spec=True)
+    def test_log_level(self, mock_set_level, _) -> None:
+        """
+        Assert that ``--log-level`` sets the level of every logger.
+        """
+        result = self.runner.invoke(
+            crucible,
+            ['--log-level', 'DEBUG', 'network', 'udev']
+        )
+        assert result.exit_code == 0
+        mock_set_level.assert_called_once_with('debug')
+        result = self.runner.invoke(
+            crucible,
+            ['--log-level', 'loud', 'network', 'udev']
+        )
+        assert result.exit_code != 0
+
+    @mock.patch('crucible.cli.ifname.run', spec=True)
+    @mock.patch('crucible.cli.set_format', spec=True)
+    def test_log_format(self, mock_set_format, _) -> None:
+        """
+        Assert that ``--log-format`` sets the format of the log.
+        """
+        result = self.runner.invoke(
+            crucible,
+            ['--log-format', 'json', 'network', 'udev']
+        )
+        assert result.exit_code == 0
+        mock_set_format.assert_called_once_with('json')
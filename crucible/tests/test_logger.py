@@ -0,0 +1,241 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for the ``logger`` module.
+"""
+import json
+import logging
+import os
+import uuid
+
+import mock
+import pytest
+
+from crucible import logger
+from crucible.logger import Logger
+
+
+class TestLogger:
+    """
+    Tests for the shared logging pipeline.
+    """
+
+    def teardown_method(self, _) -> None:
+        """
+        Restores the default level.
+        :param _:
+        """
+        logger.set_level(logging.INFO)
+        logger.set_format('text')
+
+    def test_shared_handler(self) -> None:
+        """
+        Assert every ``Logger`` uses the same queue handler.
+        """
+        first = Logger('first')
+        second = Logger('second')
+        assert first.handlers == second.handlers
+        assert len(first.handlers) == 1
+
+    def test_set_level(self) -> None:
+        """
+        Assert ``set_level`` applies to existing loggers.
+        """
+        log = Logger('level')
+        assert not log.isEnabledFor(logging.DEBUG)
+        logger.set_level('debug')
+        assert log.isEnabledFor(logging.DEBUG)
+        assert Logger('later').isEnabledFor(logging.DEBUG)
+        with pytest.raises(ValueError):
+            logger.set_level('loud')
+
+    def test_write(self) -> None:
+        """
+        Assert records are formatted and written by the listener.
+        """
+        log = Logger('write')
+        log.info('Renamed %s to %s.', 'eth0', 'mgmt0')
+        logger.flush()
+        sink = logger._PIPELINE['sink']  # pylint: disable=protected-access
+        with open(sink.baseFilename, 'r', encoding='utf-8') as log_file:
+            assert 'Renamed eth0 to mgmt0.' in log_file.read()
+
+    def test_log_file(self, tmp_path) -> None:
+        """
+        Assert the log falls back to the working directory when its
+        directory can not be used.
+        """
+        directory = tmp_path / 'log'
+        with mock.patch.dict(
+                os.environ,
+                {'CRUCIBLE_LOG_DIRECTORY': str(directory)}
+        ):
+            # pylint: disable=protected-access
+            assert logger._log_file() == str(directory / logger.LOG_FILE)
+            with mock.patch('crucible.logger.os.makedirs', side_effect=OSError):
+                assert logger._log_file() == logger.LOG_FILE
+
+    def test_rotate_by_age(self, tmp_path) -> None:
+        """
+        Assert the log rotates once it is older than its maximum age.
+        """
+        path = tmp_path / 'crucible.log'
+        # pylint: disable=protected-access
+        handler = logger._RotatingHandler(
+            str(path),
+            60,
+            maxBytes=0,
+            backupCount=1,
+        )
+        record = logging.makeLogRecord({'msg': 'hello'})
+        handler.emit(record)
+        assert not (tmp_path / 'crucible.log.1').exists()
+        handler.rollover_at = 0
+        handler.emit(record)
+        handler.close()
+        assert (tmp_path / 'crucible.log.1').exists()
+
+    def test_json_format(self) -> None:
+        """
+        Assert records are formatted as JSON with their context.
+        """
+        # pylint: disable=protected-access
+        formatter = logger._JSONFormatter()
+        record = logging.makeLogRecord({
+            'name': 'crucible.os',
+            'levelno': logging.ERROR,
+            'levelname': 'ERROR',
+            'msg': '%s failed',
+            'args': ('ip',),
+            'command': ['ip', 'link'],
+            'return_code': 1,
+        })
+        entry = json.loads(formatter.format(record))
+        assert entry['level'] == 'ERROR'
+        assert entry['message'] == 'ip failed'
+        assert entry['command'] == ['ip', 'link']
+        assert entry['return_code'] == 1
+        assert 'nic' not in entry
+
+    def test_ring(self) -> None:
+        """
+        Assert the ring is only written on errors, and a summary on close.
+        """
+        target = mock.Mock(spec=logging.Handler)
+        # pylint: disable=protected-access
+        ring = logger._RingHandler(target, 2)
+        for message in ('one', 'two', 'three'):
+            ring.handle(logging.makeLogRecord({
+                'msg': message,
+                'levelno': logging.INFO,
+                'levelname': 'INFO',
+            }))
+        target.handle.assert_not_called()
+        ring.handle(logging.makeLogRecord({
+            'msg': 'four',
+            'levelno': logging.ERROR,
+            'levelname': 'ERROR',
+        }))
+        assert [
+            call.args[0].msg for call in target.handle.call_args_list
+        ] == ['three', 'four']
+        target.reset_mock()
+        ring.handle(logging.makeLogRecord({
+            'msg': 'five',
+            'levelno': logging.INFO,
+            'levelname': 'INFO',
+        }))
+        ring.close()
+        summary, = [call.args[0] for call in target.handle.call_args_list]
+        assert summary.counts == {'INFO': 4, 'ERROR': 1}
+        target.close.assert_called_once()
+        ring.close()
+        target.close.assert_called_once()
+
+    def test_set_format(self) -> None:
+        """
+        Assert ``set_format`` switches the log to JSON lines.
+        """
+        logger.set_format('json')
+        log = Logger('json')
+        log.info('Quiet.')
+        log.error('Loud.', extra={'nic': 'eth0'})
+        logger.flush()
+        sink = logger._PIPELINE['sink']  # pylint: disable=protected-access
+        with open(
+                sink.target.baseFilename,
+                'r',
+                encoding='utf-8'
+        ) as log_file:
+            entries = [json.loads(line) for line in log_file][-2:]
+        assert [entry['message'] for entry in entries] == ['Quiet.', 'Loud.']
+        assert entries[1]['nic'] == 'eth0'
+        with pytest.raises(ValueError):
+            logger.set_format('xml')
+
+    def test_lazy_listener(self, tmp_path) -> None:
+        """
+        Assert creating a ``Logger`` does not start the listener, the first
+        record does.
+        """
+        with mock.patch.dict(
+                os.environ,
+                {'CRUCIBLE_LOG_DIRECTORY': str(tmp_path)}
+        ), mock.patch.dict(
+            logger._PIPELINE,  # pylint: disable=protected-access
+            clear=True,
+        ), mock.patch('crucible.logger.atexit.register'):
+            log = Logger('lazy')
+            # pylint: disable=protected-access
+            assert 'listener' not in logger._PIPELINE
+            log.info('Started.')
+            assert logger._PIPELINE['listener']._thread.is_alive()
+            logger._shutdown()
+            assert 'listener' not in logger._PIPELINE
+        assert 'Started.' in (tmp_path / logger.LOG_FILE).read_text()
+
+    def test_fork(self) -> None:
+        """
+        Assert a forked child writes its own records, and that the child's
+        exit does not touch the parent's listener.
+        """
+        log = Logger('fork')
+        marker = uuid.uuid4().hex
+        log.info('Before fork %s.', marker)
+        pid = os.fork()
+        if not pid:
+            try:
+                log.info('In child %s.', os.getpid())
+                logger._shutdown()  # pylint: disable=protected-access
+            finally:
+                os._exit(0)  # pylint: disable=protected-access
+        os.waitpid(pid, 0)
+        log.info('After fork %s.', marker)
+        logger.flush()
+        sink = logger._PIPELINE['sink']  # pylint: disable=protected-access
+        with open(sink.baseFilename, 'r', encoding='utf-8') as log_file:
+            content = log_file.read()
+        assert f'In child {pid}.' in content
+        assert content.count(f'Before fork {marker}.') == 1
+        assert f'After fork {marker}.' in content
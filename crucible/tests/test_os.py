@@ -26,11 +26,22 @@ Tests for the ``os`` module.
 """
 from os import getcwd
 from subprocess import Popen
+import concurrent.futures
+import os
+import time
 
 import pytest
 import mock
 
+from crucible import os as crucible_os
+from crucible.os import atomic_write
+from crucible.os import record
+from crucible.os import replay
 from crucible.os import run_command
+from crucible.os import run_commands
+from crucible.os import set_executor
+from crucible.os import CapturePolicy
+from crucible.os import TIMEOUT_RETURN_CODE
 from crucible.os import chdir
 
 
@@ -112,3 +123,254 @@ class TestCLI:
         with chdir('/'):
             assert getcwd() == '/'
         assert getcwd() == original
+
+    def test_atomic_write(self, tmp_path) -> None:
+        """
+        Assert that a file is replaced with the new content, keeping its
+        permissions, and that a failed write leaves the original file.
+        """
+        path = tmp_path / 'file'
+        path.write_text('old')
+        path.chmod(0o600)
+        atomic_write(str(path), 'new')
+        assert path.read_text() == 'new'
+        assert path.stat().st_mode & 0o777 == 0o600
+        with mock.patch('crucible.os.os.replace', side_effect=OSError):
+            with pytest.raises(OSError):
+                atomic_write(str(path), 'newer')
+        assert path.read_text() == 'new'
+        assert [child.name for child in tmp_path.iterdir()] == ['file']
+
+    def test_cache_file(self, tmp_path) -> None:
+        """
+        Assert that each source has its own cache file in ``RUN_DIRECTORY``,
+        that cache files round trip, and that failing to write one is not an
+        error.
+        """
+        with mock.patch('crucible.os.RUN_DIRECTORY', str(tmp_path / 'run')):
+            path = crucible_os.cache_file_path('ifcfg', '/etc/a', '.json')
+            assert os.path.dirname(path) == str(tmp_path / 'run')
+            assert os.path.basename(path).startswith('ifcfg-')
+            assert path.endswith('.json')
+            assert path != \
+                crucible_os.cache_file_path('ifcfg', '/etc/b', '.json')
+            assert crucible_os.read_cache_file(path) is None
+            crucible_os.write_cache_file(path, b'\x00cached')
+            assert crucible_os.read_cache_file(path) == b'\x00cached'
+            assert os.stat(path).st_mode & 0o777 == 0o600
+            with mock.patch('crucible.os.os.replace', side_effect=OSError):
+                crucible_os.write_cache_file(path, 'newer')
+            assert crucible_os.read_cache_file(path) == b'\x00cached'
+
+    def test_run_commands(self) -> None:
+        """
+        Assert that commands run concurrently, their results are returned in
+        order, and missing commands are reported like ``run_command``.
+        """
+        start_time = time.monotonic()
+        results = run_commands(
+            [['sh', '-c', f'sleep 0.3; echo {index}'] for index in range(4)],
+            concurrency=4,
+            charset='utf-8',
+        )
+        assert time.monotonic() - start_time < 1.0
+        assert [result.stdout.strip() for result in results] == [
+            '0', '1', '2', '3'
+        ]
+        assert all(result.return_code == 0 for result in results)
+        bad_result, = run_commands([['foo!!!']])
+        assert bad_result.return_code
+        assert bad_result.stderr
+        shell_result, = run_commands([['echo', '$HOME']], in_shell=True)
+        assert shell_result.stdout.strip() != b'$HOME'
+        assert not run_commands([])
+
+    def test_run_commands_timeout(self) -> None:
+        """
+        Assert that a command running past its timeout is killed.
+        """
+        start_time = time.monotonic()
+        result, = run_commands([['sleep', '5']], timeout=0.2)
+        assert time.monotonic() - start_time < 2.0
+        assert result.return_code == TIMEOUT_RETURN_CODE
+        assert result.stderr
+
+    def test_run_command_verbose(self, capsys) -> None:
+        """
+        Assert that verbose commands stream both pipes without blocking on a
+        full ``stderr`` pipe, and capture all of each stream.
+        """
+        script = (
+            'import sys\n'
+            'sys.stderr.write("e" * 1048576 + "\\n")\n'
+            'for line in range(2000):\n'
+            '    print(line)\n'
+            'sys.stdout.write("partial")\n'
+        )
+        result = run_command(['python3', '-c', script], verbose=True)
+        assert result.return_code == 0
+        lines = list(result.lines())
+        assert len(lines) == 2001
+        assert lines[0] == b'0\n'
+        assert lines[-1] == b'partial'
+        assert len(result.stderr) < 1048577
+        assert sum(len(line) for line in result.lines('stderr')) == 1048577
+        captured = capsys.readouterr()
+        assert captured.out.startswith('0\n1\n')
+        assert captured.out.endswith('1999\npartial\n')
+
+    def test_run_command_capture(self) -> None:
+        """
+        Assert that captured output keeps only its head and tail in memory,
+        spills to disk, and is decoded lazily.
+        """
+        policy = CapturePolicy(head=16, tail=16, spill=1024)
+        script = 'for line in range(10000):\n    print(f"line {line}")\n'
+        result = run_command(
+            ['python3', '-c', script],
+            charset='utf-8',
+            capture=policy,
+        )
+        assert result.return_code == 0
+        assert result.stdout.startswith('line 0\nline 1\n')
+        assert result.stdout.endswith('line 9999\n')
+        assert '[...' in result.stdout
+        assert len(result.stdout) < 100
+        lines = list(result.lines())
+        assert len(lines) == 10000
+        assert lines[5000] == 'line 5000\n'
+        small = run_command(['echo', 'small'], capture=policy)
+        assert small.stdout == b'small\n'
+        assert not small.stderr
+
+    def test_run_command_cache(self, tmp_path) -> None:
+        """
+        Assert that cached probes are reused from memory and disk until they
+        expire or a command that changes the network runs.
+        """
+        counter = tmp_path / 'counter'
+        probe = ['sh', '-c', f'echo x >> {counter}; wc -l < {counter}']
+        with mock.patch('crucible.os.CACHE_DIRECTORY', str(tmp_path / 'c')):
+            first = run_command(probe, cache_ttl=60, charset='utf-8')
+            second = run_command(probe, cache_ttl=60, charset='utf-8')
+            assert first.stdout == second.stdout == '1\n'
+            with mock.patch.dict('crucible.os._CACHE', clear=True):
+                assert run_command(probe, cache_ttl=60).stdout == b'1\n'
+            assert len(list((tmp_path / 'c').iterdir())) == 1
+            with mock.patch('crucible.os.Popen') as mock_popen:
+                mock_popen.return_value.__enter__.return_value \
+                    .communicate.return_value = (b'', b'')
+                mock_popen.return_value.__enter__.return_value \
+                    .returncode = 0
+                run_command(['/usr/bin/wicked', 'ifreload', 'eth0'])
+            assert not list((tmp_path / 'c').iterdir())
+            assert run_command(probe, cache_ttl=60).stdout == b'2\n'
+            assert run_command(probe).stdout == b'3\n'
+            with mock.patch('crucible.os.time', return_value=time.time() + 61):
+                assert run_command(probe, cache_ttl=60).stdout == b'4\n'
+        crucible_os.invalidate_cache()
+
+    def test_run_command_coprocess(self, tmp_path) -> None:
+        """
+        Assert that the coprocess executor runs argv and shell commands in
+        the current directory, and reports failures by return code.
+        """
+        set_executor('coprocess')
+        try:
+            result = run_command(['echo', 'a  b'], charset='utf-8')
+            assert (result.return_code, result.stdout) == (0, 'a  b\n')
+            result = run_command(['echo out; echo err >&2; exit 3'],
+                                 in_shell=True)
+            assert result.return_code == 3
+            assert (result.stdout, result.stderr) == (b'out\n', b'err\n')
+            assert run_command(['foo!!!']).return_code == 127
+            with chdir(str(tmp_path)):
+                assert run_command(['pwd']).stdout.strip() == \
+                    str(tmp_path).encode()
+        finally:
+            set_executor('popen')
+        with pytest.raises(ValueError):
+            set_executor('fork')
+
+    def test_run_command_coprocess_output(self) -> None:
+        """
+        Assert that the coprocess returns output byte for byte, including NUL
+        bytes and trailing newlines, and that threads sharing it each get
+        their own command's output.
+        """
+        set_executor('coprocess')
+        try:
+            result = run_command(["printf 'a\\0b\\n\\n'; printf 'e\\0' >&2"],
+                                 in_shell=True)
+            assert (result.stdout, result.stderr) == (b'a\0b\n\n', b'e\0')
+            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(
+                    lambda index: run_command(
+                        [f'sleep 0.0{index % 3}; echo {index}; '
+                         f'echo {index} >&2'],
+                        in_shell=True,
+                    ),
+                    range(32),
+                ))
+            assert [(result.stdout, result.stderr) for result in results] == [
+                (f'{index}\n'.encode(), f'{index}\n'.encode())
+                for index in range(32)
+            ]
+        finally:
+            set_executor('popen')
+
+    def test_record_replay(self, tmp_path) -> None:
+        """
+        Assert that recorded results are replayed in order without running
+        the commands, optionally with their recorded latency.
+        """
+        transcript = str(tmp_path / 'transcript.jsonl')
+        counter = tmp_path / 'counter'
+        probe = ['sh', '-c', f'echo x >> {counter}; wc -l < {counter}']
+        record(transcript)
+        try:
+            run_command(probe)
+            run_command(probe)
+            run_command(['sleep 0.2; echo slept >&2; exit 4'], in_shell=True)
+            run_commands([['echo', 'async']])
+        finally:
+            record(None)
+        replay(transcript)
+        try:
+            assert run_command(probe).stdout == b'1\n'
+            assert run_command(probe).stdout == b'2\n'
+            assert run_command(probe).stdout == b'2\n'
+            result, = run_commands([['echo', 'async']])
+            assert result.stdout == b'async\n'
+            assert run_command(['echo', 'new']).return_code == 127
+            replay(transcript, latency=True)
+            start_time = time.monotonic()
+            result = run_command(['sleep 0.2; echo slept >&2; exit 4'],
+                                 in_shell=True, charset='utf-8')
+            assert time.monotonic() - start_time >= 0.2
+            assert (result.return_code, result.stderr) == (4, 'slept\n')
+        finally:
+            replay(None)
+        assert counter.read_text().count('x') == 2
+
+    def test_run_command_spawn(self, monkeypatch) -> None:
+        """
+        Assert that the spawn executor runs commands with a minimal
+        environment, and falls back to ``Popen`` for shell commands.
+        """
+        monkeypatch.setenv('CRUCIBLE_TEST_VARIABLE', 'leaked')
+        set_executor('spawn')
+        try:
+            result = run_command(['env'], charset='utf-8')
+            assert result.return_code == 0
+            assert 'PATH=' in result.stdout
+            assert 'CRUCIBLE_TEST_VARIABLE' not in result.stdout
+            result = run_command(['sh', '-c', 'echo err >&2; exit 3'])
+            assert (result.return_code, result.stderr) == (3, b'err\n')
+            result = run_command(['foo!!!'])
+            assert result.return_code and result.stderr
+            result = run_command(['echo $CRUCIBLE_TEST_VARIABLE'],
+                                 in_shell=True)
+            assert result.stdout == b'leaked\n'
+        finally:
+            set_executor('popen')
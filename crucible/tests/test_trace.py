@@ -0,0 +1,78 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Tests for the ``trace`` module.
+"""
+import json
+
+from crucible import trace
+from crucible.os import run_command
+
+
+class TestTrace:
+    """
+    Tests for recording and exporting spans.
+    """
+
+    def teardown_method(self, _) -> None:
+        """
+        Turns tracing back off.
+        :param _:
+        """
+        trace.disable()
+
+    def test_disabled(self) -> None:
+        """
+        Assert nothing is recorded unless tracing is enabled.
+        """
+        with trace.span('phase') as current:
+            assert current is None
+            run_command(['true'])
+        assert not trace.spans()
+
+    def test_nesting(self, tmp_path) -> None:
+        """
+        Assert commands nest under the open spans and are exported as Chrome
+        trace events.
+        """
+        trace.enable()
+        with trace.span('network interface', 'cli') as cli:
+            with trace.span('write_config') as phase:
+                run_command(['echo', 'hello'])
+        command, = [s for s in trace.spans() if s.category == 'command']
+        assert command.name == 'echo hello'
+        assert command.parent == phase.span_id
+        assert phase.parent == cli.span_id
+        assert command.args['return_code'] == 0
+        assert command.args['output_bytes'] == 6
+        assert command.args['phase'] == 'network interface > write_config'
+        assert cli.duration >= phase.duration >= command.duration
+        path = tmp_path / 'trace.json'
+        trace.export(str(path))
+        events = json.loads(path.read_text())['traceEvents']
+        assert [event['name'] for event in events] == [
+            'echo hello', 'write_config', 'network interface'
+        ]
+        assert all(event['ph'] == 'X' for event in events)
+        assert min(event['ts'] for event in events) == 0
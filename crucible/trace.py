@@ -0,0 +1,194 @@
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Span based tracing.
+
+Spans record how long a piece of work took, and nest under the span that was
+open when they started (e.g. ``network interface`` > ``write_config`` >
+``nmcli connection add``). Tracing is off unless ``enable`` is called, e.g.
+by ``crucible --trace <file>``, and finished spans can be exported as a
+Chrome trace (viewable with ``chrome://tracing`` or Perfetto).
+
+.. code-block:: python
+
+    from crucible import trace
+
+    trace.enable()
+    with trace.span('write_config', interface='bond0') as current:
+        ...
+        current.args['files'] = 2
+    trace.export('trace.json')
+"""
+import contextvars
+import dataclasses
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_RECORDING = threading.Event()
+_SPANS = []
+_IDS = itertools.count(1)
+_STACK = contextvars.ContextVar('crucible_trace_stack', default=())
+
+
+@dataclasses.dataclass
+class Span:
+    # pylint: disable=too-many-instance-attributes
+    """
+    A timed piece of work.
+    """
+
+    name: str
+    category: str
+    start: int
+    parent: int = 0
+    span_id: int = 0
+    duration: int = 0
+    thread: int = 0
+    args: dict = dataclasses.field(default_factory=dict)
+
+    def to_event(self) -> dict:
+        """
+        The span as a Chrome trace complete (``X``) event, in microseconds.
+        """
+        return {
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': self.start / 1000,
+            'dur': self.duration / 1000,
+            'pid': os.getpid(),
+            'tid': self.thread,
+            'args': dict(self.args, span_id=self.span_id, parent=self.parent),
+        }
+
+
+def enable() -> None:
+    """
+    Starts recording spans, dropping any recorded before.
+    """
+    _SPANS.clear()
+    _RECORDING.set()
+
+
+def disable() -> None:
+    """
+    Stops recording spans, and drops the recorded spans.
+    """
+    _RECORDING.clear()
+    _SPANS.clear()
+
+
+def enabled() -> bool:
+    """
+    Whether spans are being recorded.
+    """
+    return _RECORDING.is_set()
+
+
+def spans() -> list[Span]:
+    """
+    The finished spans, in the order they finished.
+    """
+    return list(_SPANS)
+
+
+def phase() -> str:
+    """
+    The names of the open spans, outermost first, e.g.
+    ``network interface > write_config``.
+    """
+    return ' > '.join(current.name for current in _STACK.get())
+
+
+@contextmanager
+def span(name: str, category: str = 'crucible', **args):
+    """
+    Records a span around the ``with`` block.
+
+    Yields the ``Span``, whose ``args`` can be added to before the block
+    ends; yields ``None`` when tracing is off.
+
+    :param name: Name of the span.
+    :param category: Category of the span (e.g. ``cli``, ``command``).
+    :param args: Details to record with the span.
+    """
+    if not _RECORDING.is_set():
+        yield None
+        return
+    stack = _STACK.get()
+    current = Span(
+        name=name,
+        category=category,
+        start=time.perf_counter_ns(),
+        parent=stack[-1].span_id if stack else 0,
+        span_id=next(_IDS),
+        thread=threading.get_native_id(),
+        args=args,
+    )
+    token = _STACK.set(stack + (current,))
+    try:
+        yield current
+    finally:
+        _STACK.reset(token)
+        current.duration = time.perf_counter_ns() - current.start
+        _SPANS.append(current)
+
+
+def traced(function):
+    """
+    Decorator recording a span for every call of a function, named after it.
+
+    :param function: The function to trace.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with span(function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def export(path: str) -> None:
+    """
+    Writes the finished spans to a Chrome trace file.
+
+    :param path: The file to write.
+    """
+    events = [finished.to_event() for finished in _SPANS]
+    if events:
+        origin = min(event['ts'] for event in events)
+        for event in events:
+            event['ts'] -= origin
+    with open(path, 'w', encoding='utf-8') as trace_file:
+        json.dump(
+            {'traceEvents': events, 'displayTimeUnit': 'ms'},
+            trace_file,
+            indent=1,
+        )
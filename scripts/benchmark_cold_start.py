@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Measures the cold start of the ``crucible`` entry point, e.g. on a live image
+whose root is a read-only squashfs.
+
+Every run is made with ``PYTHONDONTWRITEBYTECODE=1``, as on a read-only
+root, so a module without a valid ``.pyc`` is compiled on every run. The
+modules that were compiled from source are listed, these are missing from
+(or stale in) the bytecode built by ``make bytecode``.
+
+    python3 scripts/benchmark_cold_start.py [--rounds 10] [--drop-caches]
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import time
+
+COMPILED = re.compile(r'^# code object from (\S+\.py)$')
+
+
+def run(command: list, environment: dict) -> subprocess.CompletedProcess:
+    """
+    Runs the command, discarding ``stdout``.
+
+    :param command: The command to run.
+    :param environment: The environment to run it in.
+    """
+    return subprocess.run(
+        command,
+        check=True,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+def drop_caches() -> None:
+    """
+    Drops the page cache, so files are read from the image again (root only).
+    """
+    os.sync()
+    with open('/proc/sys/vm/drop_caches', 'w', encoding='utf-8') as caches:
+        caches.write('3\n')
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the median, and any compiled modules.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entry-point', default=shutil.which('crucible'))
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument(
+        '--drop-caches',
+        action='store_true',
+        help='Drop the page cache before every run.',
+    )
+    parser.add_argument('args', nargs='*', default=['--help'])
+    options = parser.parse_args()
+    command = [options.entry_point] + options.args
+    environment = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    durations = []
+    for _ in range(options.rounds):
+        if options.drop_caches:
+            drop_caches()
+        start_time = time.perf_counter()
+        run(command, environment)
+        durations.append(time.perf_counter() - start_time)
+    result = run(command, dict(environment, PYTHONVERBOSE='1'))
+    compiled = [
+        match.group(1) for match in map(COMPILED.match,
+                                        result.stderr.splitlines())
+        if match
+    ]
+    print(f'{" ".join(command)}')
+    print(f'median: {statistics.median(durations) * 1000:.1f} (ms) '
+          f'min: {min(durations) * 1000:.1f} (ms) '
+          f'rounds: {options.rounds}')
+    print(f'modules compiled from source: {len(compiled)}')
+    for path in compiled:
+        print(f'    {path}')
+
+
+if __name__ == '__main__':
+    main()
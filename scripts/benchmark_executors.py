@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Compares the ``run_command`` executors on sequences of small commands.
+
+    python3 scripts/benchmark_executors.py [--commands 100] [--rounds 5]
+"""
+import argparse
+import statistics
+import time
+
+from crucible import os as crucible_os
+
+SEQUENCES = {
+    'argv': (['true'], False),
+    'shell': (['test', '-d', '/'], True),
+}
+
+
+def bench(executor: str, args: list, in_shell: bool, commands: int) -> float:
+    """
+    Returns the seconds taken to run a command ``commands`` times.
+
+    :param executor: The executor to use.
+    :param args: The command.
+    :param in_shell: Whether to run the command in a shell.
+    :param commands: How many times to run the command.
+    """
+    crucible_os.set_executor(executor)
+    start_time = time.perf_counter()
+    for _ in range(commands):
+        crucible_os.run_command(args, in_shell=in_shell, silence=True)
+    return time.perf_counter() - start_time
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the median of each executor.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commands', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=5)
+    options = parser.parse_args()
+    print(f'{"sequence":<8} {"executor":<10} {"median (s)":>10} '
+          f'{"per command (ms)":>17}')
+    for name, (args, in_shell) in SEQUENCES.items():
+        for executor in crucible_os.EXECUTORS:
+            # Warm up, e.g. starting the coprocess.
+            bench(executor, args, in_shell, 1)
+            median = statistics.median(
+                bench(executor, args, in_shell, options.commands)
+                for _ in range(options.rounds)
+            )
+            print(f'{name:<8} {executor:<10} {median:>10.3f} '
+                  f'{median / options.commands * 1000:>17.2f}')
+    crucible_os.set_executor('popen')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Measures how long importing ``crucible.cli`` takes with
+``python -X importtime``, and the slowest modules it imports.
+
+    python3 scripts/benchmark_import.py [--rounds 10] [--top 15]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+def importtime(module: str) -> dict:
+    """
+    Returns the cumulative import time (in microseconds) of every module
+    imported by importing ``module`` in a new interpreter.
+
+    :param module: The module to import.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the median of each module.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module', default='crucible.cli')
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    options = parser.parse_args()
+    rounds = [importtime(options.module) for _ in range(options.rounds)]
+    medians = {
+        name: statistics.median(times.get(name, 0) for times in rounds)
+        for name in rounds[0]
+    }
+    print(f'{"module":<50} {"cumulative (ms)":>16}')
+    for name, median in sorted(
+            medians.items(),
+            key=lambda item: item[1],
+            reverse=True,
+    )[:options.top]:
+        print(f'{name:<50} {median / 1000:>16.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Compares reloading a 10 interface topology (2 NICs, a bond, 6 VLANs, and a
+bridge) one interface at a time against one coordinated reload, with fake
+``wicked``, ``systemctl``, and ``ip`` commands that sleep like the real ones.
+
+    python3 scripts/benchmark_reload.py [--ifreload 1.0] [--per-interface 0.2]
+                                        [--nanny 2.0] [--missing 2]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from crucible.network import manager
+from crucible.network import sysconfig
+
+TOPOLOGY = (
+    {'interface': 'mgmt0'},
+    {'interface': 'mgmt1'},
+    {'interface': 'bond0', 'members': 'mgmt0,mgmt1'},
+    {'interface': 'bond0.nmn0', 'members': 'bond0', 'vlan_id': 2},
+    {'interface': 'bond0.hmn0', 'members': 'bond0', 'vlan_id': 4},
+    {'interface': 'bond0.cmn0', 'members': 'bond0', 'vlan_id': 7},
+    {'interface': 'bond0.can0', 'members': 'bond0', 'vlan_id': 6},
+    {'interface': 'bond0.chn0', 'members': 'bond0', 'vlan_id': 5},
+    {'interface': 'bond0.mtl0', 'members': 'bond0', 'vlan_id': 1},
+    {'interface': 'br0', 'members': 'bond0.cmn0'},
+)
+
+# Each fake sleeps, and ``ip`` fails for the links in FAKE_MISSING.
+FAKES = {
+    'wicked': 'sleep $(awk "BEGIN { print $FAKE_IFRELOAD + '
+              '$FAKE_PER_INTERFACE * ($# - 1) }")',
+    'systemctl': 'sleep "$FAKE_NANNY"',
+    'ip': 'case ",$FAKE_MISSING," in *",$3,"*) exit 1 ;; esac',
+}
+
+
+def fake_commands(directory: str) -> None:
+    """
+    Writes the fake commands to a directory.
+
+    :param directory: The directory to write them to.
+    """
+    for name, body in FAKES.items():
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as fake:
+            fake.write(f'#!/bin/sh\n{body}\n')
+        os.chmod(path, 0o755)
+
+
+def one_at_a_time(wickeds: list) -> float:
+    """
+    Returns the seconds taken to reload each interface by itself, as
+    ``crucible network interface`` does.
+
+    :param wickeds: A ``Wicked`` for each interface.
+    """
+    start_time = time.perf_counter()
+    for wicked in wickeds:
+        wicked.reload_interface()
+    return time.perf_counter() - start_time
+
+
+def coordinated(wickeds: list) -> float:
+    """
+    Returns the seconds taken to reload every interface at once, as
+    ``crucible network apply`` does.
+
+    :param wickeds: A ``Wicked`` for each interface.
+    """
+    start_time = time.perf_counter()
+    reloader = manager.Reloader(wickeds[0])
+    for wicked in wickeds:
+        reloader.add(wicked.interface)
+    reloader.reload()
+    return time.perf_counter() - start_time
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the time taken by each approach.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ifreload', type=float, default=1.0,
+                        help='Seconds a wicked ifreload takes.')
+    parser.add_argument('--per-interface', type=float, default=0.2,
+                        help='Seconds each interface adds to an ifreload.')
+    parser.add_argument('--nanny', type=float, default=2.0,
+                        help='Seconds restarting wickedd-nanny takes.')
+    parser.add_argument('--missing', type=int, default=2,
+                        help='How many links do not come up.')
+    options = parser.parse_args()
+    wickeds = [
+        sysconfig.Wicked(noip=True, **interface) for interface in TOPOLOGY
+    ]
+    missing = [interface['interface'] for interface in TOPOLOGY][
+        -options.missing:
+    ] if options.missing else []
+    with tempfile.TemporaryDirectory() as directory:
+        fake_commands(directory)
+        os.environ.update(
+            PATH=f'{directory}:{os.environ["PATH"]}',
+            FAKE_IFRELOAD=str(options.ifreload),
+            FAKE_PER_INTERFACE=str(options.per_interface),
+            FAKE_NANNY=str(options.nanny),
+            FAKE_MISSING=','.join(missing),
+        )
+        print(f'{"approach":<14} {"seconds":>8}')
+        print(f'{"one at a time":<14} {one_at_a_time(wickeds):>8.2f}')
+        print(f'{"coordinated":<14} {coordinated(wickeds):>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Compares reading every ``ifcfg``/``ifroute`` file of a directory against the
+cache in a new process (keyed by the modification times and sizes of the
+files) and in the same process, for a node with many VLANs on a bond.
+
+    python3 scripts/benchmark_show.py [--vlans 64] [--repeat 20]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from unittest import mock
+
+from crucible import os as crucible_os
+from crucible.network import sysconfig
+
+
+def write_files(directory: str, vlans: int) -> None:
+    """
+    Writes the files of two NICs, a bond, and VLANs on the bond.
+
+    :param directory: The directory to write them to.
+    :param vlans: How many VLANs to write.
+    """
+    topology = [
+        {'interface': 'mgmt0', 'noip': True},
+        {'interface': 'mgmt1', 'noip': True},
+        {'interface': 'bond0', 'noip': True, 'members': 'mgmt0,mgmt1'},
+    ]
+    topology.extend(
+        {
+            'interface': f'bond0.vlan{vlan_id}',
+            'cidr': f'10.{vlan_id}.0.4/16',
+            'members': 'bond0',
+            'vlan_id': vlan_id,
+        }
+        for vlan_id in range(1, vlans + 1)
+    )
+    with mock.patch.object(sysconfig.Wicked, 'install_location', directory), \
+            contextlib.redirect_stdout(io.StringIO()):
+        for interface in topology:
+            sysconfig.Wicked(**interface).write_config()
+
+
+def timed(directory: str, repeat: int, forget: bool, uncached: bool) -> float:
+    """
+    Returns the average milliseconds taken to read the interfaces.
+
+    :param directory: The directory of the files.
+    :param repeat: How many times to read them.
+    :param forget: Drop the in-memory cache before each read.
+    :param uncached: Drop the cache file before each read.
+    """
+    # pylint: disable=protected-access
+    cache_path = crucible_os.cache_file_path('ifcfg', directory, '.json')
+    total = 0.0
+    for _ in range(repeat):
+        if forget:
+            sysconfig._indexes.clear()
+        if uncached and os.path.exists(cache_path):
+            os.unlink(cache_path)
+        start_time = time.perf_counter()
+        sysconfig.read_interfaces(directory)
+        total += time.perf_counter() - start_time
+    return total / repeat * 1000
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the time taken by each approach.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--vlans', type=int, default=64,
+                        help='How many VLANs to configure on the bond.')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='How many times to read the interfaces.')
+    options = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        network = os.path.join(directory, 'network')
+        os.mkdir(network)
+        write_files(network, options.vlans)
+        crucible_os.RUN_DIRECTORY = os.path.join(directory, 'cache')
+        print(f'{"approach":<12} {"ms":>8}')
+        for name, forget, uncached in (
+                ('parse', True, True),
+                ('cache file', True, False),
+                ('in memory', False, False),
+        ):
+            elapsed = timed(network, options.repeat, forget, uncached)
+            print(f'{name:<12} {elapsed:>8.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+#
+#  MIT License
+#
+#  (C) Copyright 2024 Hewlett Packard Enterprise Development LP
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a
+#  copy of this software and associated documentation files (the "Software"),
+#  to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+#  and/or sell copies of the Software, and to permit persons to whom the
+#  Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included
+#  in all copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+#  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+#  OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+#  OTHER DEALINGS IN THE SOFTWARE.
+#
+"""
+Compares the ``popen`` and ``spawn`` executors with 1, 10, and 1000 open
+file descriptors, as when crucible runs inside a large parent process.
+
+    python3 scripts/benchmark_spawn.py [--commands 200] [--rounds 5]
+"""
+import argparse
+import os
+import resource
+import statistics
+import time
+
+from crucible import os as crucible_os
+
+OPEN_DESCRIPTORS = (1, 10, 1000)
+
+
+def bench(executor: str, commands: int) -> float:
+    """
+    Returns the seconds taken to run ``true`` ``commands`` times.
+
+    :param executor: The executor to use.
+    :param commands: How many times to run the command.
+    """
+    crucible_os.set_executor(executor)
+    start_time = time.perf_counter()
+    for _ in range(commands):
+        crucible_os.run_command(['true'], silence=True)
+    return time.perf_counter() - start_time
+
+
+def main() -> None:
+    """
+    Runs the benchmark and prints the median of each executor.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commands', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=5)
+    options = parser.parse_args()
+    _, limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(
+        resource.RLIMIT_NOFILE,
+        (min(limit, max(OPEN_DESCRIPTORS) + 64), limit),
+    )
+    print(f'{"open fds":>8} {"executor":<9} {"per command (ms)":>17}')
+    descriptors = []
+    for count in OPEN_DESCRIPTORS:
+        while len(descriptors) < count:
+            descriptors.append(os.open(os.devnull, os.O_RDONLY))
+        for executor in ('popen', 'spawn'):
+            bench(executor, 1)
+            median = statistics.median(
+                bench(executor, options.commands)
+                for _ in range(options.rounds)
+            )
+            print(f'{count:>8} {executor:<9} '
+                  f'{median / options.commands * 1000:>17.3f}')
+    for descriptor in descriptors:
+        os.close(descriptor)
+    crucible_os.set_executor('popen')
+
+
+if __name__ == '__main__':
+    main()